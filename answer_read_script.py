@@ -15,6 +15,7 @@ from datetime import datetime
 import json
 import re
 import os
+import report_index
 
 # ========= CONFIG ========= #
 DB_NAME = "jkinda_stocks"
@@ -49,9 +50,8 @@ def generate_company_report(company_name, json_list):
     # File path
     file_path = os.path.join(folder_path, f"{company_name}.json")
 
-    # Save merged JSON to file
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(merged_json, f, indent=4, ensure_ascii=False)
+    # Save merged JSON to file, plus the field index used by /company-report/?fields=
+    report_index.write_report(file_path, merged_json)
 
     print(f"Report generated at: {file_path}")
 
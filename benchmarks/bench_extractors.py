@@ -0,0 +1,70 @@
+"""
+Benchmark: extractor backends (pypdf2, tesseract, docling) on the same documents, in pages/sec,
+plus output size per backend.
+
+Usage:
+    python benchmarks/bench_extractors.py files/VBL-2023.pdf files/other.pdf
+    python benchmarks/bench_extractors.py --backends pypdf2,docling --workers 1 files/*.pdf
+
+Runs against a throw-away extraction cache, so every backend does its real work.
+Backends that cannot run here (tesseract binary or docling missing) are reported and skipped.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import extractors  # noqa: E402
+import page_extraction  # noqa: E402
+from extraction_cache import ExtractionCache  # noqa: E402
+
+
+def fresh_cache(cache_dir: str, name: str) -> ExtractionCache:
+    # Both the page iterators (pypdf2, tesseract) and the docling backend must see it
+    cache = ExtractionCache(path=os.path.join(cache_dir, f"{name}.sqlite3"))
+    page_extraction.set_extraction_cache(cache)
+    return cache
+
+
+def main():
+    cache_dir = tempfile.mkdtemp()
+    # Register the backends against a throw-away cache, never the persistent cache/extraction.sqlite3
+    fresh_cache(cache_dir, "setup")
+    page_extraction.register_extractors()
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("paths", nargs="+", help="PDF files")
+    parser.add_argument("--backends", default=",".join(extractors.extractor_names()))
+    parser.add_argument("--workers", type=int, default=None, help="Extraction workers (defaults to PDF_EXTRACT_WORKERS)")
+    args = parser.parse_args()
+
+    documents = [(path, None) for path in args.paths]
+    print(f"📄 {len(documents)} documents, {sum(page_extraction.count_pdf_pages(p) for p in args.paths)} pages\n")
+    print(f"{'backend':<12}{'pages':>8}{'seconds':>10}{'pages/sec':>12}{'chars':>12}{'empty pages':>13}")
+
+    for name in args.backends.split(","):
+        try:
+            backend = extractors.get_extractor(name)
+        except ValueError as e:
+            print(f"{name:<12}skipped: {e}")
+            continue
+        cache = fresh_cache(cache_dir, name)
+        if isinstance(backend, extractors.DoclingExtractor):
+            backend.cache = cache
+            backend.get_converter()  # model loading is a one-off, not per document
+
+        started = time.perf_counter()
+        pages = [text for document in backend.convert(documents, args.workers) for text in document]
+        seconds = time.perf_counter() - started
+        stats = cache.stats()
+        # Every page must have gone through the fresh cache, or this measured cache hits elsewhere
+        assert stats["hits"] == 0 and stats["misses"] >= len(pages), f"{name} bypassed the benchmark cache: {stats}"
+        print(f"{name:<12}{len(pages):>8}{seconds:>10.2f}{len(pages) / seconds:>12.1f}"
+              f"{sum(len(p) for p in pages):>12}{sum(1 for p in pages if not p.strip()):>13}")
+
+
+if __name__ == "__main__":
+    main()
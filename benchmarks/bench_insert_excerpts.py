@@ -0,0 +1,78 @@
+"""
+Benchmark: loading excerpts with COPY vs execute_values vs one INSERT per row, in rows/sec.
+
+Usage:
+    python benchmarks/bench_insert_excerpts.py                        # synthetic files, 20 x 500 excerpts
+    python benchmarks/bench_insert_excerpts.py output/content --company VBL-2023
+
+Needs the local Postgres from insert_data_in_table.DB_CONFIG. Rows go into a temporary table
+shaped like financial_excerpts, which disappears with the connection; nothing real is touched.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rag-report_gen"))
+import insert_data_in_table as loader  # noqa: E402
+
+SYNTHETIC_FILES = 20
+SYNTHETIC_EXCERPTS = 500
+BENCH_TABLE = "bench_financial_excerpts"
+WORDS = ("revenue profit margin segment capacity demand export dealer brand cost tax cash debt asset "
+         "liability board audit risk policy growth").split()
+
+
+def synthetic_content(root):
+    rng = random.Random(7)
+    company_dir = os.path.join(root, "synthetic")
+    os.makedirs(company_dir)
+    for n in range(1, SYNTHETIC_FILES + 1):
+        with open(os.path.join(company_dir, f"synthetic{n}.txt"), "w", encoding="utf-8") as f:
+            for _ in range(SYNTHETIC_EXCERPTS):
+                lines = [" ".join(rng.choice(WORDS) for _ in range(14)) for _ in range(rng.randint(10, 40))]
+                f.write(f"\n{loader.DELIMITER}\n" + "\n".join(lines) + "\n")
+    return ["synthetic"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="COPY vs execute_values vs per-row INSERT")
+    parser.add_argument("input_dir", nargs="?", help="Directory with one sub-directory per company (default: synthetic files)")
+    parser.add_argument("--company", action="append")
+    args = parser.parse_args()
+
+    if args.input_dir:
+        input_dir, companies = args.input_dir, args.company
+    else:
+        input_dir = tempfile.mkdtemp()
+        companies = synthetic_content(input_dir)
+    files = loader.list_text_files(input_dir, companies)
+
+    conn = loader.get_connection()
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE TEMP TABLE {BENCH_TABLE} (id SERIAL PRIMARY KEY, filename TEXT, excerpt TEXT)")
+    conn.commit()
+    # Same columns and unique key as the real table, so the ON CONFLICT cost is measured too
+    loader.ensure_schema(conn, BENCH_TABLE)
+
+    results = []
+    for method in ("rows", "values", "copy"):
+        with conn.cursor() as cur:
+            cur.execute(f"TRUNCATE {BENCH_TABLE}")
+        conn.commit()
+        started = time.perf_counter()
+        total = loader.load_files(conn, files, method, table=BENCH_TABLE)
+        results.append((method, total, time.perf_counter() - started))
+    conn.close()
+
+    print(f"\n📄 {len(files)} files\n")
+    print(f"{'method':<10}{'rows':>10}{'seconds':>10}{'rows/sec':>12}")
+    for method, total, seconds in results:
+        print(f"{method:<10}{total:>10}{seconds:>10.2f}{total / seconds:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
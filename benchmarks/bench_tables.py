@@ -0,0 +1,89 @@
+"""
+Benchmark: table extraction (tables.py) vs plain PyPDF2 text extraction, in pages/sec.
+
+Usage:
+    python benchmarks/bench_tables.py files/VBL-2023.pdf
+    python benchmarks/bench_tables.py            # synthetic statement pages (needs reportlab)
+
+Runs on the raw reader, without the extraction cache, and prints the first table found as CSV.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from PyPDF2 import PdfReader
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tables  # noqa: E402
+
+SYNTHETIC_PAGES = 40
+LABELS = ["Revenue from operations", "Other income", "Cost of materials consumed", "Employee benefits expense",
+          "Finance costs", "Depreciation and amortisation", "Profit before tax", "Tax expense", "Net profit"]
+
+
+def synthetic_report(path):
+    """
+    Statement pages: a heading, a 4-column table of 18 rows and a few paragraphs of prose.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    rng = random.Random(42)
+    fmt = lambda v: f"({abs(v):,.2f})" if v < 0 else f"{v:,.2f}"
+    pdf = canvas.Canvas(path, pagesize=A4)
+    for page in range(SYNTHETIC_PAGES):
+        pdf.setFont("Helvetica-Bold", 14)
+        pdf.drawString(50, 800, f"Standalone Statement of Profit and Loss (page {page + 1})")
+        pdf.setFont("Helvetica", 10)
+        y = 760
+        for header, x in (("Note", 330), ("FY 2024", 430), ("FY 2023", 530)):
+            pdf.drawRightString(x, y, header)
+        pdf.drawString(50, y, "Particulars")
+        for _ in range(18):
+            y -= 16
+            pdf.drawString(50, y, rng.choice(LABELS))
+            pdf.drawRightString(330, y, str(rng.randint(1, 40)))
+            pdf.drawRightString(430, y, fmt(rng.uniform(-500, 20000)))
+            pdf.drawRightString(530, y, fmt(rng.uniform(-500, 20000)))
+        y -= 40
+        for _ in range(12):
+            pdf.drawString(50, y, "The company continued to invest in capacity expansion and distribution during the year.")
+            y -= 14
+        pdf.showPage()
+    pdf.save()
+
+
+def timed(fn, reader):
+    started = time.perf_counter()
+    output = [fn(page) for page in reader.pages]
+    return output, len(reader.pages) / (time.perf_counter() - started)
+
+
+def main():
+    if len(sys.argv) > 1:
+        path, label = sys.argv[1], sys.argv[1]
+    else:
+        path = os.path.join(tempfile.mkdtemp(), "synthetic_report.pdf")
+        synthetic_report(path)
+        label = f"synthetic, {SYNTHETIC_PAGES} statement pages"
+
+    # Fresh readers, so neither run benefits from pages the other already parsed
+    _, text_rate = timed(lambda page: page.extract_text(), PdfReader(path))
+    found, table_rate = timed(tables.extract_page_tables, PdfReader(path))
+
+    all_tables = [rows for page_tables in found for rows in page_tables]
+    pages_with_tables = sum(1 for page_tables in found if page_tables)
+    print(f"📄 {len(found)} pages ({label})\n")
+    print(f"{'stage':<22}{'pages/sec':>12}")
+    print(f"{'extract_text':<22}{text_rate:>12.1f}")
+    print(f"{'tables':<22}{table_rate:>12.1f}")
+    print(f"\n{len(all_tables)} tables on {pages_with_tables} pages, {sum(len(t) for t in all_tables)} rows")
+    if all_tables:
+        print("\nFirst table:\n" + tables.table_csv(all_tables[0]))
+
+
+if __name__ == "__main__":
+    main()
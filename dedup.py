@@ -0,0 +1,328 @@
+"""
+Boilerplate removal for extracted page text, before it is written to output/content.
+
+Annual reports repeat running headers/footers on every page, and disclaimers or whole statutory
+pages across parts and across years. Two passes:
+- Header/footer lines: lines at the top or bottom of a page that recur verbatim on most pages of a
+  part are stripped. Only page-number lines ("12", "Page 12 of 80") have their digits ignored, and
+  other lines need some words to qualify, so content rows that merely differ in numbers are kept.
+  A line is remembered for the scope (and stripped from later parts) once it was found in
+  BOILERPLATE_MIN_PARTS different parts
+- Near-duplicate pages: MinHash signatures over word shingles, with LSH banding to find
+  candidates; a page whose estimated Jaccard similarity to an earlier page reaches
+  DUPLICATE_THRESHOLD is dropped (its text becomes empty, page numbering is kept)
+
+Signatures live in SQLite (cache/dedup.sqlite3) per scope, e.g. a company name to dedup
+across filings. Pages are keyed by (source hash, page index), so re-scanning a document does
+not flag it as a duplicate of itself, and the first occurrence of a page always wins.
+
+CLI, for text files already in output/content (rewritten in place):
+    python dedup.py output/content/VBL-2023 --scope vbl
+    python dedup.py --clear-scope vbl      # forget the scope's pages and boilerplate lines
+"""
+
+import argparse
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from collections import Counter
+
+import numpy as np
+
+DEDUP_PATH = os.path.join("cache", "dedup.sqlite3")
+DELIMITER = "---||---"
+
+# Lines at each end of a page that may be header/footer
+EDGE_LINES = 3
+# An edge line is boilerplate when it is on this fraction of a part's pages (and at least BOILERPLATE_MIN_PAGES)
+BOILERPLATE_MIN_RATIO = 0.5
+BOILERPLATE_MIN_PAGES = 3
+# Other than page numbers, a boilerplate line needs this many characters and words of 3+ letters
+BOILERPLATE_MIN_CHARS = 8
+BOILERPLATE_MIN_WORDS = 2
+# Parts a line must be found in before it is stripped from every part of the scope
+BOILERPLATE_MIN_PARTS = 2
+
+SHINGLE_WORDS = 5
+NUM_PERM = 64
+BANDS = 16
+DUPLICATE_THRESHOLD = 0.85
+# Pages shorter than this are left alone; there is too little text to call them duplicates
+MIN_WORDS = 40
+
+MERSENNE_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)
+PERM_A = _rng.integers(1, MERSENNE_PRIME, NUM_PERM, dtype=np.uint64)
+PERM_B = _rng.integers(0, MERSENNE_PRIME, NUM_PERM, dtype=np.uint64)
+
+WORD_RE = re.compile(r"\w+")
+DIGITS_RE = re.compile(r"\d+")
+LETTER_WORD_RE = re.compile(r"[^\W\d_]{3,}")
+PAGE_NUMBER_RE = re.compile(r"^(page\s*)?\d+(\s*(of|/)\s*\d+)?$", re.IGNORECASE)
+
+
+def normalize_line(line: str) -> str:
+    """
+    Whitespace-collapsed line; digits are folded to # only for page-number lines.
+    """
+    line = " ".join(line.split())
+    if PAGE_NUMBER_RE.match(line):
+        return DIGITS_RE.sub("#", line.lower())
+    return line
+
+
+def is_boilerplate_candidate(line: str) -> bool:
+    # Page numbers, or lines with real words; a bare figure row like "1,234 5,678" never qualifies
+    line = " ".join(line.split())
+    if PAGE_NUMBER_RE.match(line):
+        return True
+    return len(line) >= BOILERPLATE_MIN_CHARS and len(LETTER_WORD_RE.findall(line)) >= BOILERPLATE_MIN_WORDS
+
+
+def edge_lines(lines: list[str]) -> list[str]:
+    content = [line for line in lines if line.strip()]
+    return content[:EDGE_LINES] + content[-EDGE_LINES:]
+
+
+def find_boilerplate(pages: list[str]) -> set[str]:
+    """
+    Normalized header/footer lines repeated across the pages of one part.
+    """
+    counts = Counter()
+    for page in pages:
+        counts.update({normalize_line(line) for line in edge_lines(page.splitlines()) if is_boilerplate_candidate(line)})
+    min_count = max(BOILERPLATE_MIN_PAGES, math.ceil(len(pages) * BOILERPLATE_MIN_RATIO))
+    return {line for line, count in counts.items() if count >= min_count}
+
+
+def strip_boilerplate(page: str, boilerplate: set[str]) -> tuple[str, int]:
+    """
+    Remove boilerplate lines from the top and bottom of a page; returns (text, lines removed).
+    Lines in the middle of the page are kept even if they match, e.g. a "Total" row.
+    """
+    lines = page.splitlines()
+    start, end, removed = 0, len(lines), 0
+    for _ in range(EDGE_LINES):
+        while start < end and not lines[start].strip():
+            start += 1
+        if start < end and normalize_line(lines[start]) in boilerplate:
+            start += 1
+            removed += 1
+    for _ in range(EDGE_LINES):
+        while end > start and not lines[end - 1].strip():
+            end -= 1
+        if end > start and normalize_line(lines[end - 1]) in boilerplate:
+            end -= 1
+            removed += 1
+    if not removed:
+        return page, 0
+    return "\n".join(lines[start:end]), removed
+
+
+def minhash(text: str) -> np.ndarray | None:
+    """
+    MinHash signature (NUM_PERM uint32) of the page's word shingles; None for short pages.
+    """
+    words = WORD_RE.findall(text.lower())
+    if len(words) < MIN_WORDS:
+        return None
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    # a * h + b stays below 2**63: a < 2**31, h < 2**32
+    return ((PERM_A[:, None] * hashes[None, :] + PERM_B[:, None]) % MERSENNE_PRIME).min(axis=1).astype(np.uint32)
+
+
+def band_keys(signature: np.ndarray) -> list[int]:
+    rows = NUM_PERM // BANDS
+    return [
+        int.from_bytes(hashlib.blake2b(signature[b * rows:(b + 1) * rows].tobytes(), digest_size=7).digest(), "big")
+        for b in range(BANDS)
+    ]
+
+
+class DedupIndex:
+    """
+    Page signatures and learnt boilerplate lines, per scope.
+    """
+    def __init__(self, path: str = DEDUP_PATH):
+        self.path = path
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                scope TEXT NOT NULL,
+                source TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                signature BLOB NOT NULL,
+                UNIQUE (scope, source, page)
+            );
+            CREATE TABLE IF NOT EXISTS bands (
+                scope TEXT NOT NULL,
+                band INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                page_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS bands_lookup ON bands (scope, band, bucket);
+            CREATE TABLE IF NOT EXISTS boilerplate_lines (
+                scope TEXT NOT NULL,
+                line TEXT NOT NULL,
+                part TEXT NOT NULL,
+                PRIMARY KEY (scope, line, part)
+            );
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, as in extraction_cache.ExtractionCache
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self.local.conn = conn
+        return conn
+
+    def boilerplate(self, scope: str) -> set[str]:
+        """
+        Lines found as boilerplate in at least BOILERPLATE_MIN_PARTS parts of the scope.
+        """
+        rows = self._conn().execute(
+            "SELECT line FROM boilerplate_lines WHERE scope = ? GROUP BY line HAVING COUNT(*) >= ?",
+            (scope, BOILERPLATE_MIN_PARTS)).fetchall()
+        return {line for (line,) in rows}
+
+    def add_boilerplate(self, scope: str, part: str, lines: set[str]):
+        self._conn().executemany("INSERT OR IGNORE INTO boilerplate_lines VALUES (?, ?, ?)",
+                                 [(scope, line, part) for line in lines])
+
+    def clear(self, scope: str) -> int:
+        """
+        Forget everything recorded for a scope; returns the number of pages removed.
+        """
+        conn = self._conn()
+        with self.lock:
+            conn.execute("BEGIN")
+            conn.execute("DELETE FROM bands WHERE scope = ?", (scope,))
+            conn.execute("DELETE FROM boilerplate_lines WHERE scope = ?", (scope,))
+            removed = conn.execute("DELETE FROM pages WHERE scope = ?", (scope,)).rowcount
+            conn.execute("COMMIT")
+        return removed
+
+    def check(self, scope: str, source: str, page: int, signature: np.ndarray) -> tuple[str, int] | None:
+        """
+        Record a page and return (source, page) of an earlier near-duplicate, or None.
+        """
+        conn = self._conn()
+        keys = band_keys(signature)
+        with self.lock:
+            conn.execute("BEGIN")
+            row = conn.execute("SELECT id, signature FROM pages WHERE scope = ? AND source = ? AND page = ?",
+                               (scope, source, page)).fetchone()
+            if row is None:
+                page_id = conn.execute("INSERT INTO pages (scope, source, page, signature) VALUES (?, ?, ?, ?)",
+                                       (scope, source, page, signature.tobytes())).lastrowid
+                conn.executemany("INSERT INTO bands VALUES (?, ?, ?, ?)",
+                                 [(scope, band, key, page_id) for band, key in enumerate(keys)])
+            else:
+                page_id = row[0]
+                if row[1] != signature.tobytes():
+                    conn.execute("UPDATE pages SET signature = ? WHERE id = ?", (signature.tobytes(), page_id))
+                    conn.execute("DELETE FROM bands WHERE page_id = ?", (page_id,))
+                    conn.executemany("INSERT INTO bands VALUES (?, ?, ?, ?)",
+                                     [(scope, band, key, page_id) for band, key in enumerate(keys)])
+            # Only pages recorded before this one count, so the first occurrence is the one kept
+            candidates = conn.execute(
+                "SELECT DISTINCT p.id, p.source, p.page, p.signature FROM bands b JOIN pages p ON p.id = b.page_id "
+                "WHERE b.scope = ? AND p.id < ? AND (" + " OR ".join(["(b.band = ? AND b.bucket = ?)"] * BANDS) + ") "
+                "ORDER BY p.id",
+                (scope, page_id, *[v for pair in enumerate(keys) for v in pair]),
+            ).fetchall()
+            conn.execute("COMMIT")
+
+        for _, other_source, other_page, other_signature in candidates:
+            similarity = float(np.mean(np.frombuffer(other_signature, dtype=np.uint32) == signature))
+            if similarity >= DUPLICATE_THRESHOLD:
+                return other_source, other_page
+        return None
+
+
+class Deduplicator:
+    def __init__(self, scope: str, index: DedupIndex | None = None):
+        self.scope = scope
+        self.index = index or DedupIndex()
+
+    def process(self, source: str, pages: list[str], first_page: int = 0) -> tuple[list[str], dict]:
+        """
+        Deduplicate the pages of one part; source and first_page + i identify page i
+        (e.g. source document hash and page offset, so split parts share keys).
+        Returns (pages, stats); dropped pages come back as "".
+        """
+        # Lines found in this part are stripped here, but only reused once another part has them too
+        found = find_boilerplate(pages)
+        if found:
+            self.index.add_boilerplate(self.scope, f"{source}:{first_page}", found)
+        boilerplate = self.index.boilerplate(self.scope) | found
+
+        stats = {"chars_before": sum(len(page) for page in pages), "lines_removed": 0,
+                 "pages_dropped": 0, "duplicates": {}}
+        result = []
+        for i, page in enumerate(pages):
+            page, removed = strip_boilerplate(page, boilerplate)
+            stats["lines_removed"] += removed
+            signature = minhash(page)
+            original = signature is not None and self.index.check(self.scope, source, first_page + i, signature)
+            if original:
+                stats["pages_dropped"] += 1
+                stats["duplicates"][i] = f"{original[0]}:{original[1]}"
+                page = ""
+            result.append(page)
+
+        stats["chars_after"] = sum(len(page) for page in result)
+        stats["chars_removed"] = stats["chars_before"] - stats["chars_after"]
+        return result, stats
+
+
+def merge_stats(total: dict, stats: dict):
+    for key in ("chars_before", "chars_after", "chars_removed", "lines_removed", "pages_dropped"):
+        total[key] = total.get(key, 0) + stats[key]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Strip repeated headers/footers and near-duplicate pages from scanned text files.")
+    parser.add_argument("directory", nargs="?", help="Directory with <name>N.txt files, e.g. output/content/VBL-2023")
+    parser.add_argument("--scope", help="Dedup scope, e.g. a company name to dedup across filings (defaults to the directory name)")
+    parser.add_argument("--clear-scope", metavar="SCOPE", help="Forget the pages and boilerplate lines recorded for a scope")
+    args = parser.parse_args()
+
+    if args.clear_scope:
+        removed = DedupIndex().clear(args.clear_scope)
+        print(f"🗑️ Cleared scope {args.clear_scope} ({removed} pages)")
+        if not args.directory:
+            return
+    if not args.directory:
+        parser.error("directory is required unless --clear-scope is given")
+
+    scope = args.scope or os.path.basename(os.path.normpath(args.directory))
+    deduplicator = Deduplicator(scope)
+    total = {}
+    names = sorted((f for f in os.listdir(args.directory) if f.endswith(".txt")),
+                   key=lambda f: [int(t) if t.isdigit() else t for t in re.split(r"(\d+)", f)])
+    for name in names:
+        path = os.path.join(args.directory, name)
+        with open(path, "r", encoding="utf-8") as f:
+            pages = [section.strip() for section in f.read().split(DELIMITER)[1:]]
+        pages, stats = deduplicator.process(f"{scope}/{name}", pages)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write("".join(f"\n{DELIMITER}\n{page}\n" for page in pages))
+        os.replace(path + ".tmp", path)
+        merge_stats(total, stats)
+        print(f"📄 {name}: -{stats['chars_removed']} chars, {stats['pages_dropped']} pages dropped")
+    print(f"🧹 {total}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Client for embedding_server.py, usable wherever the scripts had a SentenceTransformer.
+
+- EmbeddingClient(model).encode(texts, batch_size=..., normalize_embeddings=...) returns the same numpy
+  arrays as SentenceTransformer.encode (a single string gives one vector), so callers only swap the
+  constructor; options the server cannot apply are rejected with TypeError, never silently dropped
+- Creating a client is instant; the model lives (warm) in the server
+- If the server is not running, the model is loaded in-process instead, once, with a warning
+  (EMBEDDING_SERVER_URL=local skips the server altogether)
+
+EMBEDDING_SERVER_URL defaults to http://127.0.0.1:8001.
+"""
+
+import os
+import threading
+
+import httpx
+import numpy as np
+
+SERVER_URL = os.getenv("EMBEDDING_SERVER_URL", "http://127.0.0.1:8001")
+TIMEOUT = float(os.getenv("EMBEDDING_SERVER_TIMEOUT", "300"))
+# Texts per HTTP request; the server re-batches across clients anyway
+REQUEST_SIZE = 256
+# SentenceTransformer.encode's default, for in-process encoding
+LOCAL_BATCH_SIZE = 32
+
+_local_models = {}
+_local_lock = threading.Lock()
+
+
+def load_local_model(model_name: str):
+    from sentence_transformers import SentenceTransformer
+
+    with _local_lock:
+        if model_name not in _local_models:
+            _local_models[model_name] = SentenceTransformer(model_name)
+        return _local_models[model_name]
+
+
+class EmbeddingClient:
+    def __init__(self, model_name: str, server_url: str = SERVER_URL, request_size: int = REQUEST_SIZE):
+        self.model_name = model_name
+        self.server_url = server_url.rstrip("/")
+        self.request_size = request_size
+        self.local = None
+        self._tokenizer = None
+        self.http = None if self.server_url == "local" else httpx.Client(base_url=self.server_url, timeout=TIMEOUT)
+
+    @property
+    def tokenizer(self):
+        # Only the tokenizer, for token-based chunking; much lighter than the model
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        return self._tokenizer
+
+    def use_local(self, reason: str):
+        if self.local is None:
+            print(f"⚠️ Not using the embedding server ({reason}), loading {self.model_name} in this process")
+            self.local = load_local_model(self.model_name)
+        if self.http is not None:
+            self.http.close()
+            self.http = None
+
+    def encode_remote(self, texts: list[str], batch_size: int | None = None,
+                      normalize_embeddings: bool = False) -> np.ndarray:
+        response = self.http.post("/encode", json={"model": self.model_name, "texts": texts, "batch_size": batch_size,
+                                                   "normalize_embeddings": normalize_embeddings})
+        response.raise_for_status()
+        rows, dim = map(int, response.headers["X-Embedding-Shape"].split(","))
+        return np.frombuffer(response.content, dtype=np.float32).reshape(rows, dim)
+
+    def encode(self, texts, batch_size: int | None = None, convert_to_numpy: bool = True,
+               show_progress_bar: bool = False, normalize_embeddings: bool = False):
+        """
+        Same call and result as SentenceTransformer.encode for batch_size and normalize_embeddings
+        (both applied by the server); results are always numpy arrays. Any other keyword is a TypeError.
+        batch_size=None leaves the forward-pass size to the server (EMBEDDING_ENCODE_BATCH_SIZE).
+        """
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        if self.http is not None:
+            try:
+                parts = [self.encode_remote(texts[start:start + self.request_size], batch_size, normalize_embeddings)
+                         for start in range(0, len(texts), self.request_size)]
+                vectors = np.concatenate(parts) if parts else np.zeros((0, 0), dtype=np.float32)
+                return vectors[0] if single else vectors
+            except httpx.TransportError as e:
+                self.use_local(str(e) or type(e).__name__)
+        elif self.local is None:
+            self.use_local("EMBEDDING_SERVER_URL=local")
+        vectors = self.local.encode(texts, batch_size=batch_size or LOCAL_BATCH_SIZE, convert_to_numpy=True,
+                                    show_progress_bar=show_progress_bar, normalize_embeddings=normalize_embeddings)
+        return vectors[0] if single else vectors
+
+    def close(self):
+        if self.http is not None:
+            self.http.close()
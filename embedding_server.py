@@ -0,0 +1,251 @@
+"""
+Long-lived embedding service, so the RAG scripts do not each load a SentenceTransformer per run.
+
+- Models are loaded once and stay warm (EMBEDDING_PRELOAD at startup, others on first use)
+- Concurrent /encode requests for a model are coalesced into micro-batches: a worker thread per
+  model takes everything queued within EMBEDDING_BATCH_WAIT_MS (up to EMBEDDING_MAX_BATCH texts)
+  and encodes it in one model.encode call
+- Embeddings are cached in memory by (model, sha256 of the text), least recently used dropped
+  after EMBEDDING_CACHE_MAX_ENTRIES; fully cached requests never wait for a batch
+- Vectors go back as raw float32 bytes (shape in X-Embedding-Shape), not JSON lists of floats
+- Requests may pass SentenceTransformer.encode's batch_size (forward-pass size, the smallest one in a
+  micro-batch wins) and normalize_embeddings (applied per request; the cache holds raw vectors)
+
+Usage:
+    python embedding_server.py                       # http://127.0.0.1:8001
+    EMBEDDING_PRELOAD=intfloat/e5-large-v2,all-MiniLM-L6-v2 python embedding_server.py
+Clients: embedding_client.EmbeddingClient
+"""
+
+import asyncio
+import hashlib
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, Field
+
+DEFAULT_MODEL = os.getenv("EMBEDDING_DEFAULT_MODEL", "intfloat/e5-large-v2")
+PRELOAD_MODELS = [m.strip() for m in os.getenv("EMBEDDING_PRELOAD", DEFAULT_MODEL).split(",") if m.strip()]
+HOST = os.getenv("EMBEDDING_SERVER_HOST", "127.0.0.1")
+PORT = int(os.getenv("EMBEDDING_SERVER_PORT", "8001"))
+# Texts per micro-batch, and how long the first request of a batch waits for company
+MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "256"))
+BATCH_WAIT = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5")) / 1000
+# Texts per forward pass inside model.encode
+ENCODE_BATCH_SIZE = int(os.getenv("EMBEDDING_ENCODE_BATCH_SIZE", "64"))
+# ~80 MB of 1024-dim vectors
+CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "20000"))
+
+
+class EmbeddingCache:
+    """
+    LRU of float32 vectors keyed by (model, text digest).
+    """
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            vector = self.entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key, vector):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = vector
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"entries": len(self.entries), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
+
+
+def text_key(model_name: str, text: str):
+    return model_name, hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    # Unit L2 norm per row, as SentenceTransformer.encode(normalize_embeddings=True)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32, copy=False)
+
+
+class EncodeJob:
+    __slots__ = ("texts", "rows", "missing", "batch_size", "future")
+
+    def __init__(self, texts, rows, missing, batch_size=None):
+        self.texts = texts
+        self.rows = rows          # cached vectors, None where still to encode
+        self.missing = missing    # indices of texts to encode
+        self.batch_size = batch_size
+        self.future = Future()
+
+
+class MicroBatcher:
+    """
+    One warm model plus the worker thread that serves its queued requests in batches.
+    """
+    def __init__(self, model_name: str, cache: EmbeddingCache):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.cache = cache
+        started = time.perf_counter()
+        self.model = SentenceTransformer(model_name)
+        self.load_seconds = time.perf_counter() - started
+        self.jobs = queue.Queue()
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.encoded = 0
+        self.encode_seconds = 0.0
+        threading.Thread(target=self.serve, name=f"embed-{model_name}", daemon=True).start()
+        print(f"🔹 Loaded {model_name} in {self.load_seconds:.1f}s")
+
+    def submit(self, texts: list[str], batch_size: int | None = None) -> Future:
+        keys = [text_key(self.model_name, text) for text in texts]
+        rows = [self.cache.get(key) for key in keys]
+        missing = [i for i, row in enumerate(rows) if row is None]
+        self.requests += 1
+        self.texts += len(texts)
+        job = EncodeJob(texts, rows, missing, batch_size)
+        if missing:
+            self.jobs.put(job)
+        else:
+            job.future.set_result(np.stack(rows) if rows else np.zeros((0, 0), dtype=np.float32))
+        return job.future
+
+    def collect(self) -> list[EncodeJob]:
+        # Block for the first job, then take whatever else arrives within BATCH_WAIT
+        batch = [self.jobs.get()]
+        size = len(batch[0].missing)
+        deadline = time.perf_counter() + BATCH_WAIT
+        while size < MAX_BATCH:
+            remaining = deadline - time.perf_counter()
+            try:
+                job = self.jobs.get(timeout=remaining) if remaining > 0 else self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(job)
+            size += len(job.missing)
+        return batch
+
+    def serve(self):
+        while True:
+            batch = self.collect()
+            # Texts repeated across (or within) requests are encoded once
+            unique = list(dict.fromkeys(job.texts[i] for job in batch for i in job.missing))
+            # Only memory and speed depend on it, so the most cautious request decides
+            batch_size = min(job.batch_size or ENCODE_BATCH_SIZE for job in batch)
+            try:
+                started = time.perf_counter()
+                vectors = self.model.encode(unique, batch_size=batch_size, convert_to_numpy=True,
+                                            show_progress_bar=False).astype(np.float32, copy=False)
+                self.encode_seconds += time.perf_counter() - started
+            except Exception as e:
+                for job in batch:
+                    job.future.set_exception(e)
+                continue
+            self.batches += 1
+            self.encoded += len(unique)
+            by_text = dict(zip(unique, vectors))
+            for text, vector in by_text.items():
+                self.cache.put(text_key(self.model_name, text), vector)
+            for job in batch:
+                for i in job.missing:
+                    job.rows[i] = by_text[job.texts[i]]
+                job.future.set_result(np.stack(job.rows))
+
+    def stats(self) -> dict:
+        return {
+            "load_seconds": round(self.load_seconds, 2),
+            "requests": self.requests,
+            "texts": self.texts,
+            "batches": self.batches,
+            "encoded": self.encoded,
+            "mean_batch": round(self.encoded / self.batches, 1) if self.batches else None,
+            "encode_seconds": round(self.encode_seconds, 3),
+            "encoded_per_sec": round(self.encoded / self.encode_seconds, 1) if self.encode_seconds else None,
+        }
+
+
+cache = EmbeddingCache()
+batchers = {}
+batchers_lock = threading.Lock()
+
+
+def get_batcher(model_name: str) -> MicroBatcher:
+    with batchers_lock:
+        if model_name not in batchers:
+            batchers[model_name] = MicroBatcher(model_name, cache)
+        return batchers[model_name]
+
+
+@asynccontextmanager
+async def lifespan(app):
+    for model_name in PRELOAD_MODELS:
+        await run_in_threadpool(get_batcher, model_name)
+    yield
+
+
+app = FastAPI(title="Embedding server", version="1.0", lifespan=lifespan)
+
+
+class EncodeRequest(BaseModel):
+    texts: list[str]
+    model: str | None = None
+    batch_size: int | None = Field(None, ge=1)
+    normalize_embeddings: bool = False
+
+
+@app.post("/encode")
+async def encode(request: EncodeRequest):
+    """
+    Embeddings for request.texts, in order, as float32 bytes; X-Embedding-Shape is "rows,dim".
+    Prefixes such as "passage: " / "query: " are part of the text, so callers add them.
+    """
+    model_name = request.model or DEFAULT_MODEL
+    try:
+        batcher = await run_in_threadpool(get_batcher, model_name)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Cannot load model {model_name}: {e}")
+    vectors = await asyncio.wrap_future(batcher.submit(request.texts, request.batch_size))
+    if request.normalize_embeddings and len(vectors):
+        vectors = normalize(vectors)
+    return Response(content=vectors.tobytes(), media_type="application/octet-stream",
+                    headers={"X-Embedding-Shape": f"{vectors.shape[0]},{vectors.shape[1]}"})
+
+
+@app.get("/health")
+def health():
+    return JSONResponse(content={
+        "default_model": DEFAULT_MODEL,
+        "models": {name: batcher.stats() for name, batcher in list(batchers.items())},
+        "cache": cache.stats(),
+    })
+
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=HOST, port=PORT)
@@ -0,0 +1,197 @@
+"""
+Content-addressed cache for extracted page text.
+
+- Entries are keyed by (file content hash, page index, extractor version),
+  so the same report downloaded from different URLs or re-split differently still hits
+- Split parts are registered as aliases of (source hash, page offset)
+- Stored in SQLite with size-bounded LRU eviction and hit/miss counters
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = os.path.join("cache", "extraction.sqlite3")
+CACHE_MAX_BYTES = int(os.getenv("EXTRACT_CACHE_MAX_MB", "512")) * 1024 * 1024
+# Evict down to this fraction of the limit, so we do not evict on every write
+EVICT_TO_RATIO = 0.9
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+_hash_memo = {}
+_hash_memo_lock = threading.Lock()
+
+
+def file_sha256(file_path: str) -> str:
+    """
+    Hash a file in chunks, memoised on (path, size, mtime) so hot files are hashed once.
+    """
+    stat = os.stat(file_path)
+    memo_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _hash_memo_lock:
+        if memo_key in _hash_memo:
+            return _hash_memo[memo_key]
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    with _hash_memo_lock:
+        if len(_hash_memo) > 4096:
+            _hash_memo.clear()
+        _hash_memo[memo_key] = digest.hexdigest()
+    return _hash_memo[memo_key]
+
+
+def remember_sha256(file_path: str, digest: str):
+    """
+    Seed the hash memo for a file we just wrote, so it is not read back only to be hashed.
+    """
+    stat = os.stat(file_path)
+    with _hash_memo_lock:
+        _hash_memo[(os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)] = digest
+
+
+class ExtractionCache:
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS pages (
+                file_hash TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                version TEXT NOT NULL,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (file_hash, page, version)
+            );
+            CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access);
+            CREATE TABLE IF NOT EXISTS aliases (
+                part_hash TEXT PRIMARY KEY,
+                source_hash TEXT NOT NULL,
+                page_offset INTEGER NOT NULL
+            );
+        """)
+        self.total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite connections are not shareable across threads
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def resolve(self, file_hash: str) -> tuple[str, int]:
+        """
+        Map a split part to (source hash, page offset); other files map to themselves.
+        """
+        row = self._conn().execute(
+            "SELECT source_hash, page_offset FROM aliases WHERE part_hash = ?", (file_hash,)
+        ).fetchone()
+        return (row[0], row[1]) if row else (file_hash, 0)
+
+    def add_alias(self, part_hash: str, source_hash: str, page_offset: int):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO aliases (part_hash, source_hash, page_offset) VALUES (?, ?, ?)",
+            (part_hash, source_hash, page_offset),
+        )
+
+    def get_range(self, file_hash: str, version: str, start: int, end: int) -> dict[int, str]:
+        """
+        Cached text for pages [start, end); missing pages are simply absent from the result.
+        """
+        conn = self._conn()
+        rows = conn.execute(
+            "SELECT page, text FROM pages WHERE file_hash = ? AND version = ? AND page >= ? AND page < ?",
+            (file_hash, version, start, end),
+        ).fetchall()
+        if rows:
+            conn.execute(
+                "UPDATE pages SET last_access = ? WHERE file_hash = ? AND version = ? AND page >= ? AND page < ?",
+                (time.time(), file_hash, version, start, end),
+            )
+        with self.lock:
+            self.hits += len(rows)
+            self.misses += (end - start) - len(rows)
+        return dict(rows)
+
+    def get(self, file_hash: str, version: str, page: int) -> str | None:
+        return self.get_range(file_hash, version, page, page + 1).get(page)
+
+    def put_range(self, file_hash: str, version: str, start: int, texts: list[str]):
+        """
+        Store text for consecutive pages starting at `start`.
+        """
+        now = time.time()
+        rows = [
+            (file_hash, start + i, version, text, len(text.encode("utf-8")), now)
+            for i, text in enumerate(texts)
+        ]
+        conn = self._conn()
+        with self.lock:
+            conn.execute("BEGIN")
+            old_size = conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM pages WHERE file_hash = ? AND version = ? AND page >= ? AND page < ?",
+                (file_hash, version, start, start + len(texts)),
+            ).fetchone()[0]
+            conn.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+            self.total_bytes += sum(row[4] for row in rows) - old_size
+            if self.total_bytes > self.max_bytes:
+                self._evict(conn)
+
+    def put(self, file_hash: str, version: str, page: int, text: str):
+        self.put_range(file_hash, version, page, [text])
+
+    def _evict(self, conn: sqlite3.Connection):
+        """
+        Drop least recently used pages until we are back under EVICT_TO_RATIO of the limit.
+        Caller holds self.lock.
+        """
+        # Another process may share the file; start from the real total
+        self.total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        target = self.max_bytes * EVICT_TO_RATIO
+        while self.total_bytes > target:
+            victims = conn.execute(
+                "SELECT file_hash, page, version, size FROM pages ORDER BY last_access LIMIT 500"
+            ).fetchall()
+            if not victims:
+                break
+            conn.execute("BEGIN")
+            for file_hash, page, version, size in victims:
+                conn.execute(
+                    "DELETE FROM pages WHERE file_hash = ? AND page = ? AND version = ?",
+                    (file_hash, page, version),
+                )
+                self.total_bytes -= size
+                self.evictions += 1
+                if self.total_bytes <= target:
+                    break
+            conn.execute("COMMIT")
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+            }
@@ -0,0 +1,167 @@
+"""
+Pluggable page text extractors, selectable per request with `extractor=`.
+
+An extractor turns documents, given as (file path, page range or None), into page texts:
+    for pages in extractor.convert([(path, None), (source, (20, 30))], workers): ...
+    for text in extractor.iter_pages(path, workers): ...
+- Backends register under a name; main.py registers "pypdf2" (text layer) and "tesseract" (OCR),
+  which stream page by page, and "docling"
+- "docling" wraps docling's DocumentConverter (the test.py experiment). The converter is built once
+  and reused across requests, and documents go through convert_all batch_size at a time
+- docling is imported lazily, so the API runs without it; the backend reports itself unavailable
+"""
+
+import os
+import sys
+import threading
+
+from PyPDF2 import PdfReader
+
+import metrics
+
+# Documents handed to docling's convert_all at once
+DOCLING_BATCH_SIZE = int(os.getenv("DOCLING_BATCH_SIZE", "8"))
+# Docling's own OCR is slow and the text layer is usually there; DOCLING_OCR=1 turns it on
+DOCLING_OCR = os.getenv("DOCLING_OCR", "0") == "1"
+
+
+class Extractor:
+    name = ""
+    # Reported per page, e.g. in NDJSON records and page_methods
+    method = ""
+    # Documents worth handing to convert() together; 1 means the backend streams pages instead
+    batch_size = 1
+
+    def available(self) -> bool:
+        return True
+
+    def iter_pages(self, file_path: str, workers: int | None = None, page_range: tuple[int, int] | None = None):
+        """
+        Yield page text in page order; page_range=(start, end) limits it to pages [start, end).
+        """
+        for pages in self.convert([(file_path, page_range)], workers):
+            yield from pages
+
+    def convert(self, documents: list[tuple[str, tuple[int, int] | None]], workers: int | None = None):
+        """
+        Yield the list of page texts of every (file_path, page_range) document, in input order.
+        """
+        for file_path, page_range in documents:
+            yield list(self.iter_pages(file_path, workers, page_range))
+
+
+_extractors = {}
+
+
+def register(extractor: Extractor):
+    _extractors[extractor.name] = extractor
+
+
+def get_extractor(name: str) -> Extractor:
+    extractor = _extractors.get(name)
+    if extractor is None:
+        raise ValueError(f"Unknown extractor: {name} (expected one of {sorted(_extractors)})")
+    if not extractor.available():
+        raise ValueError(f"Extractor {name} is not available on this server")
+    return extractor
+
+
+def extractor_names() -> list[str]:
+    return sorted(_extractors)
+
+
+def describe() -> dict:
+    return {name: {"method": e.method, "available": e.available()} for name, e in sorted(_extractors.items())}
+
+
+class DoclingExtractor(Extractor):
+    """
+    Markdown per page from docling (layout model + table structure).
+    Whole documents are converted, so the parts of a virtual split share one conversion;
+    pages are cached when a cache is given (see extraction_cache.ExtractionCache).
+    """
+    name = "docling"
+    method = "docling"
+    batch_size = DOCLING_BATCH_SIZE
+
+    def __init__(self, cache=None, hash_file=None):
+        self.cache = cache
+        self.hash_file = hash_file
+        self.converter = None
+        self.version = None
+        # Building the converter loads models, so it happens once; batches take turns on it
+        self.lock = threading.Lock()
+
+    def available(self) -> bool:
+        try:
+            import docling  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def get_converter(self):
+        if self.converter is None:
+            from importlib.metadata import version
+            from docling.datamodel.base_models import InputFormat
+            from docling.datamodel.pipeline_options import PdfPipelineOptions
+            from docling.document_converter import DocumentConverter, PdfFormatOption
+
+            options = PdfPipelineOptions(do_ocr=DOCLING_OCR)
+            self.converter = DocumentConverter(format_options={InputFormat.PDF: PdfFormatOption(pipeline_options=options)})
+            self.version = f"docling-{version('docling')}-ocr{int(DOCLING_OCR)}/1"
+        return self.converter
+
+    def convert(self, documents, workers=None):
+        documents = list(documents)
+        with self.lock:
+            converter = self.get_converter()
+
+        # Serve what the cache has, convert the rest
+        cached = [self.cached_pages(file_path, page_range) for file_path, page_range in documents]
+        missing = list(dict.fromkeys(file_path for (file_path, _), pages in zip(documents, cached) if pages is None))
+        converted = {}
+        for batch_start in range(0, len(missing), DOCLING_BATCH_SIZE):
+            batch = missing[batch_start:batch_start + DOCLING_BATCH_SIZE]
+            with self.lock, metrics.stage("docling"):
+                results = list(converter.convert_all(batch, raises_on_error=False))
+            for file_path, result in zip(batch, results):
+                converted[file_path] = self.result_pages(file_path, result)
+
+        for (file_path, page_range), pages in zip(documents, cached):
+            if pages is None:
+                pages = converted[file_path]
+                if page_range:
+                    pages = pages[page_range[0]:page_range[1]]
+            metrics.PAGES.inc(len(pages), method="docling")
+            yield pages
+
+    def page_count(self, file_path):
+        with open(file_path, "rb") as f:
+            return len(PdfReader(f).pages)
+
+    def cached_pages(self, file_path, page_range):
+        if self.cache is None:
+            return None
+        start, end = page_range or (0, self.page_count(file_path))
+        file_hash, offset = self.cache.resolve(self.hash_file(file_path))
+        cached = self.cache.get_range(file_hash, self.version, offset + start, offset + end)
+        if len(cached) < end - start:
+            return None
+        return [cached[offset + i] for i in range(start, end)]
+
+    def result_pages(self, file_path, result):
+        page_count = self.page_count(file_path)
+        if result.status.value not in ("success", "partial_success"):
+            print(f"⚠️ Docling failed for {file_path}: {[e.error_message for e in result.errors]}", file=sys.stderr)
+            return [""] * page_count
+
+        document = result.document
+        # Docling numbers pages from 1; pages it found nothing on are absent
+        pages = [
+            document.export_to_markdown(page_no=i + 1) if (i + 1) in document.pages else ""
+            for i in range(page_count)
+        ]
+        if self.cache is not None:
+            file_hash, offset = self.cache.resolve(self.hash_file(file_path))
+            self.cache.put_range(file_hash, self.version, offset, pages)
+        return pages
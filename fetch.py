@@ -0,0 +1,205 @@
+"""
+Async PDF downloads for URL sources.
+
+- One pooled httpx client per event loop, with connect/read timeouts
+- The body is streamed to disk in chunks, never buffered in memory, with a size cap
+- Downloads are cached by URL and revalidated with ETag / Last-Modified,
+  so repeat requests for an unchanged report skip the transfer
+- The cached file is a plain file on disk, so it can be memory-mapped by the readers
+- File writes, swaps and pruning run in worker threads (asyncio.to_thread), never on the event loop
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import httpx
+
+import metrics
+
+DOWNLOAD_CACHE_DIR = os.path.join("cache", "downloads")
+DOWNLOAD_CACHE_MAX_BYTES = int(os.getenv("DOWNLOAD_CACHE_MAX_MB", "2048")) * 1024 * 1024
+FETCH_MAX_BYTES = int(os.getenv("FETCH_MAX_MB", "200")) * 1024 * 1024
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "60"))
+FETCH_CONNECT_TIMEOUT = float(os.getenv("FETCH_CONNECT_TIMEOUT", "10"))
+FETCH_MAX_CONNECTIONS = 20
+CHUNK_SIZE = 1024 * 1024
+# Downloads used (fetched or revalidated) this recently are never pruned; a request may be reading them
+PRUNE_GRACE_SECONDS = 300
+
+
+class FetchError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+_client = None
+_client_loop = None
+
+
+def make_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(FETCH_TIMEOUT, connect=FETCH_CONNECT_TIMEOUT),
+        limits=httpx.Limits(max_connections=FETCH_MAX_CONNECTIONS, max_keepalive_connections=FETCH_MAX_CONNECTIONS),
+        follow_redirects=True,
+    )
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Shared client for the running event loop; connections are pooled across requests.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = make_client()
+        _client_loop = loop
+    return _client
+
+
+async def close_client():
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+def cache_paths(url: str) -> tuple[str, str]:
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return os.path.join(DOWNLOAD_CACHE_DIR, f"{key}.pdf"), os.path.join(DOWNLOAD_CACHE_DIR, f"{key}.json")
+
+
+def load_meta(meta_path: str) -> dict | None:
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def write_meta(meta_path: str, meta: dict):
+    # Temp file + swap, so a crash never leaves a half-written meta file
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+
+def swap_in_body(tmp_path: str, body_path: str, meta_path: str):
+    # Old validators go first: a crash before the new meta is written then means a plain
+    # re-download next time, never the new body revalidated with the old ETag
+    remove_if_exists(meta_path)
+    # Swap in atomically; readers holding the old file keep their copy
+    os.replace(tmp_path, body_path)
+
+
+def remove_if_exists(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def fetch_pdf(url: str, client: httpx.AsyncClient | None = None) -> str:
+    """
+    Download a PDF (or revalidate the cached copy) and return its local path.
+    Raises FetchError with an HTTP status code on failure.
+    """
+    with metrics.stage("download"):
+        return await _fetch_pdf(url, client or get_client())
+
+
+async def _fetch_pdf(url: str, client: httpx.AsyncClient) -> str:
+    await asyncio.to_thread(os.makedirs, DOWNLOAD_CACHE_DIR, exist_ok=True)
+    body_path, meta_path = cache_paths(url)
+
+    headers = {}
+    meta = await asyncio.to_thread(load_meta, meta_path) if os.path.isfile(body_path) else None
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        async with client.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and meta:
+                await asyncio.to_thread(os.utime, body_path)
+                return body_path
+            if response.status_code != 200:
+                raise FetchError(400, f"Unable to download PDF from {url}")
+
+            declared = int(response.headers.get("Content-Length") or 0)
+            if declared > FETCH_MAX_BYTES:
+                raise FetchError(413, f"PDF at {url} is larger than {FETCH_MAX_BYTES} bytes")
+
+            tmp = await asyncio.to_thread(tempfile.NamedTemporaryFile, dir=DOWNLOAD_CACHE_DIR, suffix=".part", delete=False)
+            try:
+                size = 0
+                try:
+                    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                        size += len(chunk)
+                        if size > FETCH_MAX_BYTES:
+                            raise FetchError(413, f"PDF at {url} is larger than {FETCH_MAX_BYTES} bytes")
+                        await asyncio.to_thread(tmp.write, chunk)
+                finally:
+                    await asyncio.to_thread(tmp.close)
+                await asyncio.to_thread(swap_in_body, tmp.name, body_path, meta_path)
+                metrics.BYTES_READ.inc(size, source="download")
+            except BaseException:
+                await asyncio.to_thread(remove_if_exists, tmp.name)
+                raise
+
+            await asyncio.to_thread(write_meta, meta_path, {
+                "url": url,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "size": size,
+                "fetched_at": time.time(),
+            })
+    except httpx.HTTPError as e:
+        raise FetchError(400, f"Unable to download PDF from {url}: {e}")
+
+    await asyncio.to_thread(prune_download_cache)
+    return body_path
+
+
+def fetch_pdf_sync(url: str) -> str:
+    """
+    Blocking wrapper for callers outside the event loop (jobs, scripts).
+    Uses its own short-lived client, since the shared one belongs to the server loop.
+    """
+    async def run():
+        async with make_client() as client:
+            return await fetch_pdf(url, client=client)
+    return asyncio.run(run())
+
+
+def prune_download_cache():
+    """
+    Remove least recently used downloads once the cache is over DOWNLOAD_CACHE_MAX_BYTES.
+    Files used within PRUNE_GRACE_SECONDS are kept, so a path just handed to a request stays valid.
+    """
+    entries = []
+    for file_name in os.listdir(DOWNLOAD_CACHE_DIR):
+        if file_name.endswith(".pdf"):
+            path = os.path.join(DOWNLOAD_CACHE_DIR, file_name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    recent = time.time() - PRUNE_GRACE_SECONDS
+    for mtime, size, path in sorted(entries):
+        if total <= DOWNLOAD_CACHE_MAX_BYTES or mtime >= recent:
+            break
+        remove_if_exists(path)
+        remove_if_exists(path[:-len(".pdf")] + ".json")
+        total -= size
@@ -16,6 +16,8 @@ Using RAG we could implement that
 """
 
 import os
+import csv
+import io
 from meta_ai_api import MetaAI
 import json
 import re
@@ -198,6 +200,25 @@ def extract_company_name(filename):
 
     return company_name
 
+def load_page_tables(text_path):
+    """
+    Tables written by /scan-pdfs/?tables=true next to a text file (<name>N.tables.json),
+    as {page index: [csv, ...]}. Empty when the scan ran without tables.
+    """
+    tables_path = os.path.splitext(text_path)[0] + ".tables.json"
+    if not os.path.exists(tables_path):
+        return {}
+    with open(tables_path, "r", encoding="utf-8") as f:
+        found = json.load(f)
+
+    page_tables = {}
+    for table in found:
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerows(table["rows"])
+        page_tables.setdefault(table["page"], []).append(buffer.getvalue())
+    return page_tables
+
+
 def insert_prompt_record(cur, prompt, company_name):
     """
     Insert a new prompt record in rag_generated_prompts with status 'pending'
@@ -233,6 +254,8 @@ def main_fun_call():
     with open(full_path, "r", encoding="utf-8") as f:
         content = f.read()
 
+    page_tables = load_page_tables(full_path)
+
     # Split sections by delimiter
     sections = content.split("---||---")
     for i, section in enumerate(sections, start=1):
@@ -243,6 +266,11 @@ def main_fun_call():
         print(f"Processing section {i}...")
         # process_section(section, new_path)
         prompt = f"{BASE_PROMPT}\n\nCompany Report Excerpt (Part {i}):\n{section}"
+        # The text starts with the delimiter, so section i is page i - 2 of the file
+        tables_csv = page_tables.get(i - 2)
+        if tables_csv:
+            # Rows and columns survive in CSV, which the flattened page text loses
+            prompt += "\n\nTables on this page (CSV):\n" + "\n".join(tables_csv)
         company_name = extract_company_name(full_path)
         insert_prompt_record(cur, prompt, company_name)
         conn.commit()
@@ -256,6 +284,9 @@ def main_fun_call():
 
     # Move the file
     shutil.move(full_path, move_path)
+    tables_path = os.path.splitext(full_path)[0] + ".tables.json"
+    if os.path.exists(tables_path):
+        shutil.move(tables_path, os.path.splitext(move_path)[0] + ".tables.json")
     
 def main():
     val = True
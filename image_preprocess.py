@@ -0,0 +1,155 @@
+"""
+NumPy-backed image preprocessing for OCR.
+
+Same steps as the original PIL pipeline in main.preprocess_image:
+- Convert to grayscale
+- Enhance contrast
+- Binarize (fixed threshold, or optional Otsu / adaptive)
+- Denoise with a 3x3 median filter
+
+Contrast and fixed thresholding are fused into one 256-entry lookup table,
+and same-sized images are denoised as one stacked array.
+"""
+
+import numpy as np
+from PIL import Image
+
+CONTRAST_FACTOR = 2.0
+FIXED_THRESHOLD = 140
+# Adaptive thresholding: neighbourhood size (pixels) and offset below the local mean
+ADAPTIVE_BLOCK_SIZE = 31
+ADAPTIVE_OFFSET = 10
+
+THRESHOLD_METHODS = ("fixed", "otsu", "adaptive")
+
+
+def load_grayscale(image, target_dpi: int | None = None) -> np.ndarray:
+    """
+    Open an image (path or PIL image) as a uint8 grayscale array.
+    - Downscales to target_dpi when the image reports a higher DPI
+    """
+    img = Image.open(image) if isinstance(image, str) else image
+    dpi = img.info.get("dpi")
+    img = img.convert("L")
+
+    if target_dpi and dpi and dpi[0] > target_dpi:
+        scale = target_dpi / float(dpi[0])
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        # Box filter is area averaging, which is what we want when shrinking scans
+        img = img.resize(size, Image.Resampling.BOX)
+
+    return np.asarray(img, dtype=np.uint8)
+
+
+def contrast_lut(mean: int, factor: float = CONTRAST_FACTOR) -> np.ndarray:
+    """
+    Lookup table matching PIL's ImageEnhance.Contrast: blend every level away from the image mean.
+    """
+    levels = mean + factor * (np.arange(256, dtype=np.float32) - mean)
+    # PIL truncates after clipping, so astype (not round) keeps results identical
+    return np.clip(levels, 0, 255).astype(np.uint8)
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """
+    Threshold that maximises between-class variance of the grayscale histogram.
+    """
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    weight_bg = np.cumsum(hist)
+    weight_fg = weight_bg[-1] - weight_bg
+    cum_mean = np.cumsum(hist * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_bg = cum_mean / weight_bg
+        mean_fg = (cum_mean[-1] - cum_mean) / weight_fg
+        variance = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    # Pixels <= t are background, so the binarize cut-off is t + 1
+    return int(np.nanargmax(variance)) + 1
+
+
+def box_sum(values: np.ndarray, size: int) -> np.ndarray:
+    """
+    Sum over a size x size window around each pixel of the last two axes, edges replicated.
+    Separable running sums in int32, which cannot overflow for uint8 input at page sizes.
+    """
+    pad = size // 2
+    pad_width = [(0, 0)] * (values.ndim - 2) + [(pad, pad), (pad, pad)]
+    padded = np.pad(values, pad_width, mode="edge")
+    h, w = values.shape[-2:]
+
+    rows = np.cumsum(padded, axis=-1, dtype=np.int32)
+    rows = np.concatenate([rows[..., size - 1:size], rows[..., size:w + size - 1] - rows[..., :w - 1]], axis=-1)
+    cols = np.cumsum(rows, axis=-2, dtype=np.int32)
+    return np.concatenate([cols[..., size - 1:size, :], cols[..., size:h + size - 1, :] - cols[..., :h - 1, :]], axis=-2)
+
+
+def binarize(gray: np.ndarray, method: str = "fixed") -> np.ndarray:
+    """
+    Boolean array, True for white (background) pixels.
+    """
+    if method == "fixed":
+        return gray >= FIXED_THRESHOLD
+    if method == "otsu":
+        return gray >= otsu_threshold(gray)
+    if method == "adaptive":
+        local_mean = box_sum(gray, ADAPTIVE_BLOCK_SIZE) / (ADAPTIVE_BLOCK_SIZE * ADAPTIVE_BLOCK_SIZE)
+        return gray > local_mean - ADAPTIVE_OFFSET
+    raise ValueError(f"Unknown threshold method: {method} (expected one of {THRESHOLD_METHODS})")
+
+
+def median_denoise(binary: np.ndarray) -> np.ndarray:
+    """
+    3x3 median filter for binary images: a pixel is white when at least 5 of its 9 neighbours are.
+    """
+    pad_width = [(0, 0)] * (binary.ndim - 2) + [(1, 1), (1, 1)]
+    padded = np.pad(binary.view(np.uint8), pad_width, mode="edge")
+    # Window counts never exceed 9, so plain uint8 adds are safe
+    rows = padded[..., :-2] + padded[..., 1:-1] + padded[..., 2:]
+    return (rows[..., :-2, :] + rows[..., 1:-1, :] + rows[..., 2:, :]) >= 5
+
+
+def preprocess_images(images, threshold: str = "fixed", target_dpi: int | None = None,
+                      contrast: float = CONTRAST_FACTOR, denoise: bool = True) -> list[Image.Image]:
+    """
+    Preprocess a batch of images (paths or PIL images) for OCR.
+    Returns mode '1' PIL images in input order.
+    """
+    if threshold not in THRESHOLD_METHODS:
+        raise ValueError(f"Unknown threshold method: {threshold} (expected one of {THRESHOLD_METHODS})")
+
+    grays = [load_grayscale(image, target_dpi) for image in images]
+    results = [None] * len(grays)
+
+    # Stack same-sized pages (the common case for one scanned report) and process them together
+    groups = {}
+    for idx, gray in enumerate(grays):
+        groups.setdefault(gray.shape, []).append(idx)
+
+    for indices in groups.values():
+        binary = np.empty((len(indices),) + grays[indices[0]].shape, dtype=bool)
+        for n, i in enumerate(indices):
+            gray = grays[i]
+            # PIL rounds the mean to the nearest level before blending
+            hist = np.bincount(gray.ravel(), minlength=256)
+            mean = int(hist @ np.arange(256) / gray.size + 0.5)
+            lut = contrast_lut(mean, contrast)
+
+            if threshold == "fixed":
+                # Contrast and threshold are both per-level maps, so fuse them into one lookup
+                binary[n] = np.take(lut >= FIXED_THRESHOLD, gray)
+            else:
+                binary[n] = binarize(np.take(lut, gray), threshold)
+
+        if denoise:
+            binary = median_denoise(binary)
+
+        for i, page in zip(indices, binary):
+            results[i] = Image.fromarray(page)
+
+    return results
+
+
+def preprocess_image(image, **options) -> Image.Image:
+    """
+    Preprocess a single image; see preprocess_images for options.
+    """
+    return preprocess_images([image], **options)[0]
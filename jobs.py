@@ -0,0 +1,170 @@
+"""
+Background job queue for the heavy PDF Reader endpoints.
+
+- Each job type gets its own bounded thread pool (concurrency per type)
+- Job state is persisted as JSON under output/jobs/ so it survives a restart
+- Jobs that were queued or running when the server stopped are re-queued on startup
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JOBS_DIR = os.path.join("output", "jobs")
+
+# Do not rewrite the job file on every page; once a second is plenty for polling
+PROGRESS_SAVE_INTERVAL = 1.0
+
+
+class JobManager:
+    def __init__(self, jobs_dir: str = JOBS_DIR, concurrency: dict | None = None):
+        self.jobs_dir = jobs_dir
+        self.concurrency = concurrency or {}
+        self.runners = {}
+        self.executors = {}
+        self.jobs = {}
+        self.lock = threading.Lock()
+        os.makedirs(self.jobs_dir, exist_ok=True)
+
+    def register(self, job_type: str, runner):
+        """
+        Register a runner for a job type.
+        The runner is called as runner(**params, progress=callback),
+        where callback(done, total) reports progress.
+        """
+        self.runners[job_type] = runner
+        self.executors[job_type] = ThreadPoolExecutor(
+            max_workers=self.concurrency.get(job_type, 1),
+            thread_name_prefix=f"job-{job_type}",
+        )
+
+    def submit(self, job_type: str, params: dict) -> dict:
+        if job_type not in self.runners:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "type": job_type,
+            "params": params,
+            "status": "queued",
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "progress": {"done": 0, "total": None},
+            "result": None,
+            "error": None,
+        }
+        with self.lock:
+            self.jobs[job["id"]] = job
+            self._save(job)
+        self.executors[job_type].submit(self._run, job["id"])
+        return self.status(job["id"])
+
+    def get(self, job_id: str) -> dict | None:
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            job = self._load(job_id)
+        return job
+
+    def status(self, job_id: str) -> dict | None:
+        """
+        Job record plus derived throughput (units/sec) and ETA (seconds).
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+
+        with self.lock:
+            job = json.loads(json.dumps(job))
+
+        done = job["progress"]["done"]
+        total = job["progress"]["total"]
+        throughput = None
+        eta = None
+        if job["started_at"]:
+            elapsed = (job["finished_at"] or time.time()) - job["started_at"]
+            if elapsed > 0 and done:
+                throughput = round(done / elapsed, 3)
+                if total is not None and job["status"] == "running":
+                    eta = round((total - done) / throughput, 1)
+        job["progress"]["throughput"] = throughput
+        job["progress"]["eta_seconds"] = eta
+        return job
+
+    def resume(self):
+        """
+        Re-queue jobs left queued or running by a previous process.
+        """
+        for file_name in sorted(os.listdir(self.jobs_dir)):
+            if not file_name.endswith(".json"):
+                continue
+            job = self._load(file_name[:-len(".json")])
+            if not job or job["status"] not in ("queued", "running"):
+                continue
+            if job["type"] not in self.runners:
+                continue
+
+            job["status"] = "queued"
+            job["progress"] = {"done": 0, "total": None}
+            with self.lock:
+                self.jobs[job["id"]] = job
+                self._save(job)
+            self.executors[job["type"]].submit(self._run, job["id"])
+            print(f"🔁 Re-queued job {job['id']} ({job['type']})")
+
+    def _run(self, job_id: str):
+        with self.lock:
+            job = self.jobs[job_id]
+            job["status"] = "running"
+            job["started_at"] = time.time()
+            self._save(job)
+
+        last_saved = time.monotonic()
+
+        def progress(done, total):
+            nonlocal last_saved
+            with self.lock:
+                job["progress"] = {"done": done, "total": total}
+                if time.monotonic() - last_saved >= PROGRESS_SAVE_INTERVAL:
+                    self._save(job)
+                    last_saved = time.monotonic()
+
+        try:
+            result = self.runners[job["type"]](**job["params"], progress=progress)
+            with self.lock:
+                job["status"] = "done"
+                job["result"] = result
+        except Exception as e:
+            print(f"⚠️ Job {job_id} failed: {e}")
+            with self.lock:
+                job["status"] = "failed"
+                # HTTPException carries its message in `detail`
+                job["error"] = str(getattr(e, "detail", e))
+        finally:
+            with self.lock:
+                job["finished_at"] = time.time()
+                self._save(job)
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _save(self, job: dict):
+        # Write to a temp file and swap it in, so a crash never leaves half a record
+        tmp_path = self._path(job["id"]) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(job["id"]))
+
+    def _load(self, job_id: str) -> dict | None:
+        # Job ids are hex uuids; anything else is not a job file
+        if not job_id or not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
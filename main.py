@@ -1,62 +1,140 @@
-from fastapi import FastAPI, Query, HTTPException, UploadFile, File
-from fastapi.responses import JSONResponse
-import requests
-from io import BytesIO
-from PyPDF2 import PdfReader, PdfWriter
+from fastapi import FastAPI, Query, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from PyPDF2 import PdfWriter
 import os
 import uvicorn
-from fastapi.responses import StreamingResponse
-import shutil
+import sys
+import hashlib
+import asyncio
+from io import BytesIO
 import json
-from PIL import Image
-import pytesseract
-from PIL import Image, ImageEnhance, ImageFilter
-import re
+import ocr_routing
+import time
+import functools
+from collections import deque
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from jobs import JobManager
+from memory_probe import MemoryProbe, measure_memory
+from fetch import FetchError, close_client, fetch_pdf, fetch_pdf_sync
+from uploads import (UPLOAD_BATCH_MAX_BYTES, UPLOAD_MAX_BYTES, UploadError, check_content_length,
+                     iter_multipart_uploads, prune_uploads_periodically, save_upload)
+from extraction_cache import file_sha256, remember_sha256
+from report_cache import ReportCache, accepts_gzip, etag_matches
+import metrics
+import report_index
+import tables
+import extractors
+from pdf_extract import EXTRACT_WORKERS, get_extract_pool, open_pdf, shutdown_extract_pool
+from page_extraction import (SPLIT_MANIFEST, clean_extracted_text, count_pdf_pages, extract_pdf_tables,
+                             get_extraction_cache, get_ocr_executor, ingest_pages, iter_parts_pages,
+                             iter_pdf_pages, iter_pdf_pages_hybrid, list_pdf_parts, ocr_image_file,
+                             part_page_count, part_tables, preprocess_image, register_extractors)
+from dedup import Deduplicator, merge_stats
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Pick up jobs that were still queued or running when the server stopped
+    job_manager.resume()
+    get_extract_pool()
+    pruning = asyncio.create_task(prune_uploads_periodically())
+    yield
+    pruning.cancel()
+    await close_client()
+    shutdown_extract_pool()
+
 
-app = FastAPI(title="PDF Reader API", version="1.1")
+app = FastAPI(title="PDF Reader API", version="1.1", lifespan=lifespan)
+app.add_middleware(metrics.MetricsMiddleware)
 
 OUTPUT_DIR = "split_pdfs"
+# Scanned text goes to <CONTENT_DIR>/<orig_text_file>/, where rag-report_gen/insert_data_in_table.py picks it up
+CONTENT_DIR = os.path.join("output", "content")
+# Written next to scanned text files; records what each part was extracted from
+SCAN_MANIFEST = "scan_manifest.json"
+SPLIT_WRITE_WORKERS = int(os.getenv("SPLIT_WRITE_WORKERS", "4"))
+
+# Page extraction (text layer, hybrid, OCR) lives in page_extraction.py; the server sets up
+# its shared OCR pool, extraction cache and extractor backends at startup
+ocr_executor = get_ocr_executor()
+extraction_cache = get_extraction_cache()
+register_extractors()
+# Serialized /company-report/ payloads, revalidated against the file's mtime on every request
+report_cache = ReportCache()
+
+# Mean word confidence (0-100) under which /scan-images2/ flags or skips a routed (lang=auto) page
+OCR_MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", "40"))
+
+# Documents of one /upload-pdfs/ batch extracted at the same time; the extraction workers are shared between them
+UPLOAD_BATCH_CONCURRENCY = int(os.getenv("UPLOAD_BATCH_CONCURRENCY", "4"))
+
+
+
+def parse_job_concurrency(value: str) -> dict:
+    """
+    Parse "split-pdf=2,scan-pdfs=1" into {"split-pdf": 2, "scan-pdfs": 1}.
+    """
+    limits = {}
+    for item in value.split(","):
+        if "=" in item:
+            job_type, limit = item.split("=", 1)
+            limits[job_type.strip()] = max(1, int(limit))
+    return limits
+
+
+# Background jobs allowed to run at once, per job type.
+# Override with e.g. JOB_CONCURRENCY="split-pdf=4,scan-images=2"
+JOB_CONCURRENCY = {"split-pdf": 2, "scan-pdfs": 1, "scan-images": 1, "ingest": 1}
+JOB_CONCURRENCY.update(parse_job_concurrency(os.getenv("JOB_CONCURRENCY", "")))
 
 @app.get("/")
 def root():
     return {"message": "Welcome to the PDF Reader API"}
 
 
-def read_pdf_from_file(file_path: str) -> list[str]:
+def read_pdf_from_file(file_path: str, workers: int | None = None,
+                       page_range: tuple[int, int] | None = None) -> list[str]:
     """
     Read PDF file and return a list of strings, one per page.
+    - workers > 1 shards page ranges across a process pool
+    - Results are always merged back in page order
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
-    
-    pages = []
-    with open(file_path, "rb") as f:
-        pdf_reader = PdfReader(f)
-        for page in pdf_reader.pages:
-            page_text = page.extract_text() or ""
-            pages.append(page_text)
-    
-    return pages
 
-def read_pdf_from_url(url: str) -> str:
-    response = requests.get(url)
-    if response.status_code != 200:
-        raise HTTPException(status_code=400, detail=f"Unable to download PDF from {url}")
-    
-    pdf_file = BytesIO(response.content)
-    pdf_reader = PdfReader(pdf_file)
-    text = ""
-    for page in pdf_reader.pages:
-        text += page.extract_text() or ""
-    return text
-    
-@app.get("/company-report/")
-def get_company_report(
-    company_name: str = Query(..., description="Exact company name as used in stored JSON")
-):
+    return list(iter_pdf_pages(file_path, workers=workers, page_range=page_range))
+
+
+def read_pdf_from_url(url: str, workers: int | None = None) -> list[str]:
     """
-    Example usage:
-    http://localhost:8000/company-report/?company_name=Varun%20Beverages%20Limited
+    Download a PDF (or reuse the cached download) and return a list of strings, one per page.
+    """
+    try:
+        pdf_path = fetch_pdf_sync(url)
+    except FetchError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    return read_pdf_from_file(pdf_path, workers=workers)
+
+
+def get_extractor(name: str, mode: str = "text") -> extractors.Extractor:
+    """
+    The extractor backend for a request; hybrid mode is built on the PyPDF2 text layer.
+    """
+    if mode == "hybrid" and name != "pypdf2":
+        raise HTTPException(status_code=400, detail="mode=hybrid only works with extractor=pypdf2")
+    try:
+        return extractors.get_extractor(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def company_report_path(company_name: str) -> str:
+    """
+    output/reports/<company>/<company>.json, or a 404 when it does not exist.
     """
     folder_path = os.path.join("output", "reports", company_name)
     file_path = os.path.join(folder_path, f"{company_name}.json")
@@ -66,199 +144,741 @@ def get_company_report(
 
     if not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail="Merged JSON file not found for this company")
+    return file_path
 
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
 
-        return JSONResponse(
-            content=data,
-            media_type="application/json",
-            status_code=200
-        )
+def parse_fields(fields: str) -> list[str]:
+    paths = [field.strip() for field in fields.split(",") if field.strip()]
+    if not paths:
+        raise HTTPException(status_code=400, detail="fields must list at least one path")
+    return paths
+
+
+@app.get("/company-report/")
+def get_company_report(
+    request: Request,
+    company_name: str = Query(..., description="Exact company name as used in stored JSON"),
+    fields: str | None = Query(None, description="Comma-separated dotted paths to return instead of the whole report, e.g. financial_metrics.revenue_growth,risk_factors")
+):
+    """
+    Example usage:
+    http://localhost:8000/company-report/?company_name=Varun%20Beverages%20Limited
+    http://localhost:8000/company-report/?company_name=Varun%20Beverages%20Limited&fields=financial_metrics.revenue_growth,risk_factors
+    Served from an in-process cache with ETag / If-None-Match support; gzip when the client accepts it.
+    With fields, only those values are read, through the report's field index.
+    """
+    file_path = company_report_path(company_name)
+
+    if fields is not None:
+        try:
+            values, missing = report_index.project(file_path, parse_fields(fields))
+        except (OSError, ValueError) as e:
+            raise HTTPException(status_code=500, detail=f"Error reading JSON: {e}")
+        return JSONResponse(content={"company_name": company_name, "fields": values, "missing": missing})
 
+    try:
+        report = report_cache.get(file_path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reading JSON: {e}")
 
+    # no-cache: clients may keep the body but must revalidate, which is a cheap 304
+    headers = {"ETag": report.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), report.etag, weak=True):
+        return Response(status_code=304, headers=headers)
+
+    if accepts_gzip(request.headers.get("accept-encoding")):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=report.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=report.body, media_type="application/json", headers=headers)
+
+@app.get("/extraction-cache/")
+def get_extraction_cache_stats():
+    """
+    Hit/miss counters and size of the page text extraction cache.
+    """
+    return JSONResponse(content=extraction_cache.stats())
+
+
+@app.get("/extractors/")
+def get_extractors():
+    """
+    Extractor backends accepted by extractor=, and whether each can run on this server.
+    """
+    return JSONResponse(content=extractors.describe())
+
+
+@app.get("/company-reports/compare/")
+def compare_company_reports(
+    companies: list[str] = Query(..., description="Company names; repeat the param for each company"),
+    fields: str = Query(..., description="Comma-separated dotted paths to pull from every report")
+):
+    """
+    Same fields across many companies in one request, without loading the full documents.
+    Example usage:
+    http://localhost:8000/company-reports/compare/?companies=vbl&companies=tata-motor&fields=financial_metrics.revenue_growth,risk_factors
+    """
+    paths = parse_fields(fields)
+    results = {}
+    missing_companies = []
+    for company_name in dict.fromkeys(companies):
+        try:
+            file_path = company_report_path(company_name)
+            values, missing = report_index.project(file_path, paths)
+        except HTTPException:
+            missing_companies.append(company_name)
+            continue
+        except (OSError, ValueError) as e:
+            raise HTTPException(status_code=500, detail=f"Error reading JSON for '{company_name}': {e}")
+        results[company_name] = {"fields": values, "missing": missing}
+
+    return JSONResponse(content={"fields": paths, "companies": results, "missing_companies": missing_companies})
+
+
+def cache_metrics() -> list[str]:
+    caches = {"extraction": extraction_cache.stats(), "report": report_cache.stats()}
+    lines = []
+    lines += metrics.stat_lines("cache_hits_total", "Cache lookups that hit",
+                                {name: stats["hits"] for name, stats in caches.items()}, "cache", "counter")
+    lines += metrics.stat_lines("cache_misses_total", "Cache lookups that missed",
+                                {name: stats["misses"] for name, stats in caches.items()}, "cache", "counter")
+    lines += metrics.stat_lines("cache_hit_ratio", "Hits / lookups since start",
+                                {name: stats["hit_rate"] for name, stats in caches.items()}, "cache")
+    lines += metrics.stat_lines("cache_bytes", "Bytes held by the cache",
+                                {name: stats["bytes"] for name, stats in caches.items()}, "cache")
+    return lines
+
+
+metrics.register_collector(cache_metrics)
+
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Prometheus text format: request latency per route, pages/images processed, bytes read,
+    per-stage timings (download, parse, extract, preprocess, ocr, write) and cache hit rates.
+    """
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/report-cache/")
+def get_report_cache_stats():
+    """
+    Hit/miss counters and size of the /company-report/ cache.
+    """
+    return JSONResponse(content=report_cache.stats())
+
 @app.get("/read-pdf/")
-def read_pdf_api(source: str = Query(..., description="PDF local path or URL")):
+async def read_pdf_api(source: str = Query(..., description="PDF local path or URL"),
+                 workers: int | None = Query(None, ge=1, description="Worker processes for page extraction (defaults to PDF_EXTRACT_WORKERS)"),
+                 mode: str = Query("text", pattern="^(text|hybrid)$", description="text: text layer only, hybrid: OCR pages without a usable text layer"),
+                 extractor: str = Query("pypdf2", pattern="^(pypdf2|tesseract|docling)$", description="pypdf2: text layer, tesseract: OCR every page, docling: layout-aware markdown")):
     """
     Example usage:
     /read-pdf/?source=/absolute/path/to/file.pdf
     /read-pdf/?source=docs/sample.pdf
     /read-pdf/?source=https://arxiv.org/pdf/2408.09869
     """
-    # try:
-    #     if source.startswith("http://") or source.startswith("https://"):
-    #         pages = read_pdf_from_url(source)
-    #     else:
-    #         # Ensure local path is absolute
-    #         if not source.startswith("/"):
-    #             # Convert relative path to absolute
-    #             import os
-    #             source = os.path.abspath(source)
-    #         pages = read_pdf_from_file(source)
-
-    #     formatted_content = {}
-    #     for i, page_content in enumerate(pages):
-    #         cleaned_text = page_content.strip().replace("\n\n", "\n")
-    #         print(f"\n--- Page {i+1} ---\n{cleaned_text}\n")  # print as you go
-    #         formatted_content[f"Page {i+1}"] = cleaned_text
-
-    #     return JSONResponse(content={"source": source, "pages": formatted_content})
-
-    # except Exception as e:
-    #     raise HTTPException(status_code=500, detail=str(e))
-    
-    def page_generator(source):
-        if source.startswith("http://") or source.startswith("https://"):
-            pages = read_pdf_from_url(source)
-        else:
-            import os
-            if not source.startswith("/"):
-                source = os.path.abspath(source)
-            pages = read_pdf_from_file(source)
+    # Resolve the source before streaming starts, so errors still map to a status code.
+    # Downloads are awaited, so network I/O never holds a worker thread.
+    backend = get_extractor(extractor, mode)
+    is_url = source.startswith("http://") or source.startswith("https://")
+    if is_url:
+        try:
+            pdf_path = await fetch_pdf(source)
+        except FetchError as e:
+            raise HTTPException(status_code=e.status_code, detail=e.detail)
+    else:
+        pdf_path = os.path.abspath(source)
+        if not os.path.isfile(pdf_path):
+            raise HTTPException(status_code=404, detail=f"File not found: {source}")
 
-        for i, page_content in enumerate(pages):
-            cleaned_text = page_content.strip().replace("\n\n", "\n")
-            yield f"\n--- Page {i+1} ---\n{cleaned_text}\n"
+    def page_generator():
+        # Pages are extracted lazily and flushed to the client one at a time.
+        # Sync generator, so Starlette runs extraction in its threadpool, off the event loop.
+        # Headers are gone by the time we know the peak, so it is logged instead of returned.
+        with MemoryProbe() as probe:
+            if mode == "hybrid":
+                for i, (page_content, method) in enumerate(iter_pdf_pages_hybrid(pdf_path, workers=workers)):
+                    cleaned_text = page_content.strip().replace("\n\n", "\n")
+                    yield f"\n--- Page {i+1} ({method}) ---\n{cleaned_text}\n"
+            else:
+                for i, page_content in enumerate(backend.iter_pages(pdf_path, workers=workers)):
+                    cleaned_text = page_content.strip().replace("\n\n", "\n")
+                    yield f"\n--- Page {i+1} ---\n{cleaned_text}\n"
+        print(f"📈 /read-pdf/ {source}: {probe.report()}")
 
-    return StreamingResponse(page_generator(source), media_type="text/plain")
+    return StreamingResponse(page_generator(), media_type="text/plain")
 
-@app.get("/split-pdf/")
-def split_pdf_api(file_path: str = Query(..., description="Local PDF file path"),
-                  pages_per_file: int = Query(10, description="Number of pages per split PDF")):
+@app.get("/read-tables/")
+def read_tables_api(source: str = Query(..., description="Local PDF path"),
+                    first_page: int = Query(1, ge=1, description="First page to scan (1-based)"),
+                    last_page: int | None = Query(None, ge=1, description="Last page to scan (inclusive), defaults to the end"),
+                    format: str = Query("json", pattern="^(json|csv)$", description="json: rows per table, csv: one CSV block per table")):
+    """
+    Tables detected on the text layer of a PDF, e.g. balance sheets and P&L statements.
+    Example usage:
+    /read-tables/?source=files/VBL-2023.pdf&first_page=120&last_page=140&format=csv
+    """
+    pdf_path = os.path.abspath(source)
+    if not os.path.isfile(pdf_path):
+        raise HTTPException(status_code=404, detail=f"File not found: {source}")
+    total_pages = count_pdf_pages(pdf_path)
+    end = min(last_page or total_pages, total_pages)
+    if first_page > end:
+        raise HTTPException(status_code=400, detail=f"first_page is past the last page ({total_pages})")
+
+    found = extract_pdf_tables(pdf_path, (first_page - 1, end))
+    if format == "csv":
+        blocks = [f"# page {table['page'] + 1}\n{tables.table_csv(table['rows'])}" for table in found]
+        return Response(content="\n".join(blocks), media_type="text/csv")
+    return JSONResponse(content={"source": source, "tables": [dict(table, page=table["page"] + 1) for table in found]})
+
+def split_output_dir(file_path: str) -> str:
+    """
+    split_pdfs/<parent folder>/<file name>, e.g. files/VBL-2023.pdf -> split_pdfs/files/VBL-2023
+    """
+    parent = os.path.basename(os.path.dirname(os.path.abspath(file_path)))
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(OUTPUT_DIR, parent, stem)
+
+
+def write_pdf_part(pdf_writer: PdfWriter, output_path: str) -> int:
+    """
+    Serialise one split part and write it to disk; runs on the split writer pool.
+    Returns the number of bytes written.
+    """
+    with metrics.stage("write"):
+        buffer = BytesIO()
+        pdf_writer.write(buffer)
+        data = buffer.getvalue()
+        with open(output_path, "wb") as out_file:
+            out_file.write(data)
+    # The scanner hashes parts for the extraction cache; hand it the digest we already have
+    remember_sha256(output_path, hashlib.sha256(data).hexdigest())
+    return len(data)
+
+
+@measure_memory
+def split_pdf_file(file_path: str, pages_per_file: int = 10, virtual: bool = False, progress=None) -> dict:
     """
     Split a PDF at a given local file path into smaller PDFs of 'pages_per_file' pages each.
+    - Always writes a split_manifest.json with the page range of every part
+    - virtual=True writes only the manifest; scanners read the page ranges straight from the source
+    - Physical parts are written by a bounded thread pool
+    - progress(done, total) is called with the number of pages written so far
     """
-    output_dir = OUTPUT_DIR
+    started = time.perf_counter()
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail=f"File not found: {file_path}")
     
     if not file_path.endswith(".pdf"):
         raise HTTPException(status_code=400, detail="File must be a PDF.")
 
-    folder = file_path.rsplit("/")[0].split(".")[0]
-    output_dir = os.path.join(output_dir, folder)
-    # Ensure output directory exists
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-
-    # Read PDF
-    pdf_reader = PdfReader(file_path)
-    total_pages = len(pdf_reader.pages)
-    split_files = []
-
-    # Split PDF
-    for start in range(0, total_pages, pages_per_file):
-        pdf_writer = PdfWriter()
-        end = min(start + pages_per_file, total_pages)
+    output_dir = split_output_dir(file_path)
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(file_path))[0]
 
-        for i in range(start, end):
-            pdf_writer.add_page(pdf_reader.pages[i])
+    # One reader for the whole split, over a shared memory map of the source
+    with open_pdf(file_path) as pdf_reader:
+        total_pages = len(pdf_reader.pages)
+        source_hash, source_offset = extraction_cache.resolve(file_sha256(file_path))
+        parts = [
+            {"name": f"{stem}_part_{start+1}-{min(start + pages_per_file, total_pages)}.pdf",
+             "start": start, "end": min(start + pages_per_file, total_pages)}
+            for start in range(0, total_pages, pages_per_file)
+        ]
 
-        output_file_name = f"{os.path.splitext(os.path.basename(file_path))[0]}_part_{start+1}-{end}.pdf"
-        print(output_file_name)
-        output_path = os.path.join(output_dir, os.path.splitext(os.path.basename(file_path))[0])
-        os.makedirs(output_path, exist_ok=True)
-        output_path = os.path.join(output_path, output_file_name)
+        bytes_written = 0
+        if not virtual:
+            def finish(part, future):
+                nonlocal bytes_written
+                bytes_written += future.result()
+                # A copied page extracts to the same text, so parts reuse the source's cache entries
+                part_path = os.path.join(output_dir, part["name"])
+                extraction_cache.add_alias(file_sha256(part_path), source_hash, source_offset + part["start"])
+                print(part["name"])
+                if progress:
+                    progress(part["end"], total_pages)
 
-        with open(output_path, "wb") as out_file:
-            pdf_writer.write(out_file)
+            pending = deque()
+            with ThreadPoolExecutor(max_workers=SPLIT_WRITE_WORKERS, thread_name_prefix="split") as pool:
+                for part in parts:
+                    # Cloning pages reads from the shared reader, so it stays on this thread;
+                    # serialising and writing the finished part happens on the pool
+                    pdf_writer = PdfWriter()
+                    for i in range(part["start"], part["end"]):
+                        pdf_writer.add_page(pdf_reader.pages[i])
+                    pending.append((part, pool.submit(write_pdf_part, pdf_writer, os.path.join(output_dir, part["name"]))))
+                    # Keep only a few cloned parts in memory at once
+                    if len(pending) > SPLIT_WRITE_WORKERS * 2:
+                        finish(*pending.popleft())
+                while pending:
+                    finish(*pending.popleft())
+        elif progress:
+            progress(total_pages, total_pages)
 
-        split_files.append(output_file_name)
+    manifest = {
+        "source": os.path.abspath(file_path),
+        "source_hash": source_hash,
+        "total_pages": total_pages,
+        "pages_per_file": pages_per_file,
+        "virtual": virtual,
+        "parts": parts,
+    }
+    manifest_path = os.path.join(output_dir, SPLIT_MANIFEST)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(manifest_path + ".tmp", manifest_path)
 
-    return JSONResponse(content={
+    return {
         "original_file": os.path.basename(file_path),
         "total_pages": total_pages,
         "pages_per_file": pages_per_file,
-        "split_files": split_files
-    })
-    
-@app.get("/scan-pdfs/")
-def scan_pdfs(directory_path: str = Query(..., description="Path to the directory containing PDFs"), orig_text_file: str = Query(..., description="Original text file name"), small: bool = Query(False, description="If true, do not save to file, just return content")):
+        "split_files": [part["name"] for part in parts],
+        "output_dir": output_dir,
+        "virtual": virtual,
+        "manifest": manifest_path,
+        "bytes_written": bytes_written,
+        "elapsed_seconds": round(time.perf_counter() - started, 3)
+    }
+
+
+@app.get("/split-pdf/")
+@metrics.profiled
+def split_pdf_api(file_path: str = Query(..., description="Local PDF file path"),
+                  pages_per_file: int = Query(10, ge=1, description="Number of pages per split PDF"),
+                  virtual: bool = Query(False, description="If true, only write a page-range manifest, no part files")):
     """
-    Scan a directory for PDF files and append their content page by page to a text file.
+    Split a PDF at a given local file path into smaller PDFs of 'pages_per_file' pages each.
     """
-    direct = "output/content/"
-    # TODO:: Should come from the params
+    return JSONResponse(content=split_pdf_file(file_path, pages_per_file, virtual))
+
+
+def validate_directory(directory_path: str):
     if not os.path.exists(directory_path):
         raise HTTPException(status_code=404, detail=f"Directory not found: {directory_path}")
-    
     if not os.path.isdir(directory_path):
         raise HTTPException(status_code=400, detail=f"Path is not a directory: {directory_path}")
 
-    pdf_files = [f for f in os.listdir(directory_path) if f.lower().endswith(".pdf")]
+
+def ndjson_response(records) -> StreamingResponse:
+    """
+    Stream dicts as newline-delimited JSON, one line per record as soon as it is produced.
+    """
+    return StreamingResponse((json.dumps(record, ensure_ascii=False) + "\n" for record in records),
+                             media_type="application/x-ndjson")
+
+
+def iter_pdf_directory_records(parts: list[dict], workers: int | None = None, mode: str = "text",
+                               with_tables: bool = False, extractor: str = "pypdf2"):
+    """
+    One record per page for /scan-pdfs/?stream=true.
+    seconds is the wall time spent waiting for that page (near zero for pages of a shard already extracted).
+    with_tables adds the page's detected tables as lists of rows.
+    """
+    waited = time.perf_counter()
+    for part, records in iter_parts_pages(parts, workers, mode, extractor):
+        page_tables = {}
+        if with_tables:
+            for table in part_tables(part):
+                page_tables.setdefault(table["page"], []).append(table["rows"])
+        for page_index, (text, method) in enumerate(records):
+            now = time.perf_counter()
+            record = {
+                "file": part["name"],
+                "page_index": page_index,
+                "text": text.strip().replace("\n\n", "\n"),
+                "method": method,
+                "seconds": round(now - waited, 4),
+            }
+            if with_tables:
+                record["tables"] = page_tables.get(page_index, [])
+            yield record
+            waited = time.perf_counter()
+
+
+def scan_manifest_path(text_dir: str) -> str:
+    return os.path.join(text_dir, SCAN_MANIFEST)
+
+
+def load_scan_manifest(text_dir: str) -> dict:
+    try:
+        with open(scan_manifest_path(text_dir), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {"parts": {}}
+
+
+def write_atomic(path: str, content: str):
+    # Write to a temp file and swap it in, so a crash never leaves a half-written file
+    with metrics.stage("write"):
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(path + ".tmp", path)
+
+
+def part_unchanged(part: dict, entry: dict | None, mode: str, with_tables: bool = False,
+                   extractor: str = "pypdf2", dedup: bool = False) -> bool:
+    """
+    True when a scan manifest entry still matches the part on disk.
+    mtime and size are checked first; the content hash only when they differ (e.g. after a copy).
+    """
+    if not entry or entry.get("mode") != mode or not os.path.isfile(entry["text_file"]):
+        return False
+    # Manifests written before extractors were selectable are all PyPDF2
+    if entry.get("extractor", "pypdf2") != extractor or ("dedup" in entry) != dedup:
+        return False
+    if with_tables and not (entry.get("tables_file") and os.path.isfile(entry["tables_file"])):
+        return False
+    page_range = list(part["page_range"]) if part["page_range"] else None
+    if entry.get("page_range") != page_range:
+        return False
+    stat = os.stat(part["path"])
+    if entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("size") == stat.st_size:
+        return True
+    return entry.get("sha256") == file_sha256(part["path"])
+
+
+@measure_memory
+def scan_pdf_directory(directory_path: str, orig_text_file: str, small: bool = False,
+                       workers: int | None = None, mode: str = "text", force: bool = False,
+                       with_tables: bool = False, extractor: str = "pypdf2", dedup: bool = False,
+                       dedup_scope: str | None = None, content_dir: str = CONTENT_DIR, progress=None) -> dict:
+    """
+    Scan a directory for PDF files and write their content page by page to text files
+    in <content_dir>/<orig_text_file>/.
+    - Directories from /split-pdf/ are scanned in manifest (page) order, virtual parts included
+    - Incremental: a scan_manifest.json next to the text files records each part's hash, mtime
+      and output file, so re-runs only extract new or changed parts (force=True redoes all)
+    - Each part is written atomically and recorded as soon as it is done, so an interrupted
+      scan resumes from the first unfinished part
+    - mode="hybrid" OCRs only pages without a usable text layer and records the method per page
+    - with_tables=True also writes the detected tables of each part to <name>N.tables.json
+    - extractor picks the backend (pypdf2, tesseract, docling); docling converts parts in batches
+    - dedup=True strips repeated headers/footers and empties near-duplicate pages (see dedup.py),
+      within dedup_scope (defaults to orig_text_file; use e.g. a company name to dedup across filings)
+    - progress(done, total) is called with pages extracted across all files
+    """
+    validate_directory(directory_path)
+
+    parts = list_pdf_parts(directory_path)
+    pdf_files = [part["name"] for part in parts]
     
     if not pdf_files:
-        return JSONResponse(content={"message": "No PDF files found in the directory."})
-    j = 1
-    content = ''
+        return {"message": "No PDF files found in the directory."}
+    content = []
 
-    for pdf_file in pdf_files:
-        full_pdf_path = os.path.join(directory_path, pdf_file)
-        pages = read_pdf_from_file(full_pdf_path)  # use full path
-        os.makedirs(direct + orig_text_file, exist_ok=True)
-        text_file = direct + orig_text_file + "/" + orig_text_file + str(j) + ".txt"
-        j += 1
-        with open(text_file, "a", encoding="utf-8") as f:
-            for i, page_content in enumerate(pages):
-                cleaned_text = page_content.strip().replace("\n\n", "\n")
-                if small:
-                    content += f"\n---||---\n{cleaned_text}\n"
-                else:
-                    f.write(f"\n---||---\n{cleaned_text}\n")
+    text_dir = os.path.join(content_dir, orig_text_file)
+    manifest = {"parts": {}} if small else load_scan_manifest(text_dir)
+    entries = manifest["parts"]
+
+    # File numbers stick to their part; new parts get the next free number
+    next_number = max((entry["number"] for entry in entries.values()), default=0) + 1
+    for part in parts:
+        if part["name"] not in entries:
+            entries[part["name"]] = {"number": next_number}
+            next_number += 1
+
+    if small:
+        pending = parts
+    else:
+        pending = [part for part in parts
+                   if force or not part_unchanged(part, entries[part["name"]], mode, with_tables, extractor, dedup)]
+        os.makedirs(text_dir, exist_ok=True)
+        # Parts that are gone (e.g. after a re-split) would otherwise leave stale text behind
+        gone = set(entries) - set(pdf_files)
+        for name in gone:
+            stale = entries.pop(name)
+            for key in ("text_file", "tables_file"):
+                if stale.get(key) and os.path.isfile(stale[key]):
+                    os.remove(stale[key])
+        if gone:
+            # Nothing else may be pending, so record the removal now
+            write_atomic(scan_manifest_path(text_dir), json.dumps(manifest, indent=4))
+    pending_names = {part["name"] for part in pending}
+
+    # Page counts are cheap to read and give pollers a real total
+    total_pages = sum(part_page_count(part) for part in pending) if progress else None
+    pages_done = 0
+    page_methods = {}
+    found_tables = {}
+    text_file = None
+    deduplicator = Deduplicator(dedup_scope or orig_text_file) if dedup else None
+    dedup_totals = {}
+
+    for part, records in iter_parts_pages(pending, workers, mode, extractor):
+        pdf_file = part["name"]
+        full_pdf_path = part["path"]  # use full path
+        records = list(records)
+        pages = [text for text, _ in records]
+        if mode == "hybrid":
+            page_methods[pdf_file] = [method for _, method in records]
+        if deduplicator:
+            # Keyed by source document page, so split parts and re-splits share entries
+            source_hash, page_offset = extraction_cache.resolve(file_sha256(full_pdf_path))
+            first_page = page_offset + (part["page_range"][0] if part["page_range"] else 0)
+            with metrics.stage("dedup"):
+                pages, dedup_stats = deduplicator.process(source_hash, pages, first_page)
+            merge_stats(dedup_totals, dedup_stats)
+        entry = entries[pdf_file]
+        text_file = os.path.join(text_dir, orig_text_file + str(entry["number"]) + ".txt")
+        part_text = ''
+        for page_content in pages:
+            cleaned_text = page_content.strip().replace("\n\n", "\n")
+            part_text += f"\n---||---\n{cleaned_text}\n"
+        if with_tables:
+            found_tables[pdf_file] = part_tables(part)
+        if small:
+            content.append(part_text)
+        else:
+            write_atomic(text_file, part_text)
+            if with_tables:
+                entry["tables_file"] = text_file[:-len(".txt")] + ".tables.json"
+                write_atomic(entry["tables_file"], json.dumps(found_tables[pdf_file], ensure_ascii=False))
+            stat = os.stat(full_pdf_path)
+            entry.update({
+                "source": os.path.abspath(full_pdf_path),
+                "page_range": list(part["page_range"]) if part["page_range"] else None,
+                "sha256": file_sha256(full_pdf_path),
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "mode": mode,
+                "extractor": extractor,
+                "pages": len(pages),
+                "text_file": text_file,
+                "scanned_at": time.time(),
+            })
+            if mode == "hybrid":
+                entry["page_methods"] = page_methods[pdf_file]
+            if deduplicator:
+                entry["dedup"] = dedup_stats
+            else:
+                entry.pop("dedup", None)
+            # Record progress after every part, so a crash only loses the part in flight
+            write_atomic(scan_manifest_path(text_dir), json.dumps(manifest, indent=4))
+        pages_done += len(pages)
+        if progress:
+            progress(pages_done, total_pages)
+
+    if mode == "hybrid" and not small:
+        # Unchanged parts keep the methods recorded when they were scanned
+        for name in pdf_files:
+            if name not in pending_names:
+                page_methods[name] = entries[name].get("page_methods", [])
     
-    return JSONResponse(content={
+    result = {
         "directory_scanned": directory_path,
         "pdf_files_found": len(pdf_files),
         "txt_file_updated": text_file,
-        "files_added": pdf_files,
-        "content": content
-    })
-    
-@app.get("/scan-images/")
-def scan_images(
-    directory_path: str = Query(..., description="Path to the directory containing images"),
-    orig_text_file: str = Query(..., description="Base name for output text files"),
-    small: bool = Query(False, description="If true, return text instead of saving")
-):
+        "files_added": [part["name"] for part in pending],
+        "files_skipped": [name for name in pdf_files if name not in pending_names],
+        "content": "".join(content)
+    }
+    if not small:
+        result["manifest"] = scan_manifest_path(text_dir)
+    if with_tables:
+        result["tables_found"] = sum(len(found) for found in found_tables.values())
+        if small:
+            result["tables"] = found_tables
+    if dedup:
+        result["dedup"] = dedup_totals
+    if mode == "hybrid":
+        result["page_methods"] = page_methods
+        result["ocr_pages"] = sum(methods.count("ocr") for methods in page_methods.values())
+        result["text_pages"] = sum(len(methods) for methods in page_methods.values()) - result["ocr_pages"]
+    return result
+
+
+@app.get("/scan-pdfs/")
+@metrics.profiled
+def scan_pdfs(directory_path: str = Query(..., description="Path to the directory containing PDFs"), orig_text_file: str = Query(..., description="Original text file name"), small: bool = Query(False, description="If true, do not save to file, just return content"),
+              workers: int | None = Query(None, ge=1, description="Worker processes for page extraction (defaults to PDF_EXTRACT_WORKERS)"),
+              mode: str = Query("text", pattern="^(text|hybrid)$", description="text: text layer only, hybrid: OCR pages without a usable text layer"),
+              force: bool = Query(False, description="If true, re-extract every part even if it is unchanged since the last scan"),
+              stream: bool = Query(False, description="If true, stream one NDJSON record per page instead of writing text files"),
+              tables: bool = Query(False, description="If true, also extract tables (rows/columns) from the text layer"),
+              dedup: bool = Query(False, description="If true, strip repeated headers/footers and drop near-duplicate pages"),
+              dedup_scope: str | None = Query(None, description="Pages are deduplicated against earlier scans in this scope (defaults to orig_text_file)"),
+              extractor: str = Query("pypdf2", pattern="^(pypdf2|tesseract|docling)$", description="pypdf2: text layer, tesseract: OCR every page, docling: layout-aware markdown")):
     """
-    Scan a directory for image files (JPG/PNG) and extract text using OCR.
-    - Saves text in 'output/content/<orig_text_file>/' folder by default
-    - If small=True, returns extracted text directly
+    Scan a directory for PDF files and write their content page by page to text files.
+    Only parts that are new or changed since the last scan are extracted.
+    With stream=true nothing is written; pages are streamed as NDJSON as they are extracted.
     """
-    output_dir = os.path.join("output", "content")
-    os.makedirs(output_dir, exist_ok=True)
+    get_extractor(extractor, mode)
+    if stream:
+        validate_directory(directory_path)
+        return ndjson_response(iter_pdf_directory_records(list_pdf_parts(directory_path), workers, mode, tables, extractor))
+    return JSONResponse(content=scan_pdf_directory(directory_path, orig_text_file, small, workers, mode, force, tables,
+                                                   extractor, dedup, dedup_scope))
 
-    # Validate directory
-    if not os.path.exists(directory_path):
-        raise HTTPException(status_code=404, detail=f"Directory not found: {directory_path}")
-    if not os.path.isdir(directory_path):
-        raise HTTPException(status_code=400, detail=f"Path is not a directory: {directory_path}")
 
-    # Find all image files
-    image_files = [
+def ocr_image_routed(image_path, lang: str = ocr_routing.OCR_DEFAULT_LANG, **preprocess_options) -> dict:
+    """
+    Preprocess and OCR one image with the language and page segmentation mode picked for it
+    (see ocr_routing); lang="auto" detects the script per page (one extra OSD run),
+    anything else OCRs with that language as one block (--psm 6) through image_to_string, as before
+    routing existed. Same result shape as ocr_image_file, plus lang, psm, script and confidence;
+    confidence is only measured for routed pages, and is None for pages without words.
+    """
+    started = time.perf_counter()
+    result = {"text": None, "error": None, "preprocess_seconds": 0.0, "lang": None, "psm": None,
+              "script": None, "confidence": None}
+    try:
+        img = preprocess_image(image_path, **preprocess_options)
+        result["preprocess_seconds"] = round(time.perf_counter() - started, 4)
+        if lang == "auto":
+            with metrics.stage("osd"):
+                detection = ocr_routing.detect_script(img)
+            if detection["rotate"]:
+                img = img.rotate(-detection["rotate"], expand=True)
+            result["script"] = detection["script"]
+            result["lang"], result["psm"] = ocr_routing.route(img, detection)
+        else:
+            result["lang"], result["psm"] = lang, ocr_routing.PSM_BLOCK
+        ocr_started = time.perf_counter()
+        if lang == "auto":
+            result["text"], result["confidence"] = ocr_routing.ocr_with_confidence(img, result["lang"], result["psm"])
+        else:
+            result["text"] = ocr_routing.ocr_text(img, result["lang"], result["psm"])
+        metrics.OCR_LANG_SECONDS.observe(time.perf_counter() - ocr_started, lang=result["lang"])
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = round(time.perf_counter() - started, 4)
+    result["ocr_seconds"] = round(result["seconds"] - result["preprocess_seconds"], 4)
+
+    metrics.STAGE_SECONDS.observe(result["preprocess_seconds"], stage="preprocess")
+    metrics.STAGE_SECONDS.observe(result["ocr_seconds"], stage="ocr")
+    if isinstance(image_path, str):
+        metrics.IMAGES.inc(status="error" if result["error"] else "ok")
+        if os.path.isfile(image_path):
+            metrics.BYTES_READ.inc(os.path.getsize(image_path), source="image")
+    return result
+
+
+def ocr_images_routed(image_paths: list[str], lang: str = ocr_routing.OCR_DEFAULT_LANG, min_confidence: float = 0.0,
+                      low_confidence: str = "flag", **preprocess_options):
+    """
+    Routed OCR of images on the shared pool, yielding results in input order.
+    Pages under min_confidence get low_confidence=True, and skipped=True with low_confidence="skip";
+    pages without a confidence (a fixed lang, or no words found) are never flagged.
+    """
+    for result in ocr_executor.map(functools.partial(ocr_image_routed, lang=lang, **preprocess_options), image_paths):
+        if not result["error"] and result["confidence"] is not None and result["confidence"] < min_confidence:
+            result["low_confidence"] = True
+            result["skipped"] = low_confidence == "skip"
+            metrics.OCR_LOW_CONFIDENCE.inc(lang=result["lang"], action=low_confidence)
+        yield result
+
+
+def language_stats(results: list[dict]) -> dict:
+    """
+    Per-language throughput of routed OCR results: pages, OCR seconds, pages/sec and mean confidence.
+    """
+    stats = {}
+    for result in results:
+        if result.get("error") or not result.get("lang"):
+            continue
+        lang = stats.setdefault(result["lang"], {"pages": 0, "ocr_seconds": 0.0, "confidence_sum": 0.0,
+                                                 "confidence_pages": 0})
+        lang["pages"] += 1
+        lang["ocr_seconds"] += result["ocr_seconds"]
+        if result["confidence"] is not None:
+            lang["confidence_sum"] += result["confidence"]
+            lang["confidence_pages"] += 1
+    for lang in stats.values():
+        confidence_sum = lang.pop("confidence_sum")
+        confidence_pages = lang.pop("confidence_pages")
+        lang["ocr_seconds"] = round(lang["ocr_seconds"], 3)
+        lang["pages_per_sec"] = round(lang["pages"] / lang["ocr_seconds"], 3) if lang["ocr_seconds"] else None
+        lang["mean_confidence"] = round(confidence_sum / confidence_pages, 2) if confidence_pages else None
+    return stats
+
+
+def ocr_images(image_paths: list[str], preprocess: bool = False, config: str = "", **preprocess_options):
+    """
+    OCR images concurrently on the shared pool, yielding results in input order.
+    """
+    yield from ocr_executor.map(
+        functools.partial(ocr_image_file, preprocess=preprocess, config=config, **preprocess_options),
+        image_paths,
+    )
+
+
+def list_image_files(directory_path: str) -> list[str]:
+    """
+    Image files (JPG/PNG/TIFF/BMP) in a directory, in listdir order.
+    """
+    validate_directory(directory_path)
+    return [
         f for f in os.listdir(directory_path)
         if f.lower().endswith((".jpg", ".jpeg", ".png", ".tiff", ".bmp"))
     ]
 
+
+def iter_image_records(image_files: list[str], results, clean=None):
+    """
+    One NDJSON record per image for the scanners' stream mode; failed images carry an error and no text.
+    """
+    for image_file, result in zip(image_files, results):
+        record = {
+            "file": image_file,
+            "page_index": 0,
+            "text": None,
+            "method": "ocr",
+            **{key: value for key, value in ocr_timing(image_file, result).items() if key != "file"},
+        }
+        if not result["error"] and not result.get("skipped"):
+            text = result["text"]
+            record["text"] = clean(text) if clean else text.strip().replace("\n\n", "\n")
+        yield record
+
+
+def ocr_timing(image_file: str, result: dict) -> dict:
+    timing = {
+        "file": image_file,
+        "seconds": result["seconds"],
+        "preprocess_seconds": result["preprocess_seconds"],
+        "ocr_seconds": result["ocr_seconds"],
+    }
+    for key in ("lang", "psm", "script", "confidence", "low_confidence"):
+        if result.get(key) is not None:
+            timing[key] = result[key]
+    if result["error"]:
+        timing["error"] = result["error"]
+    return timing
+
+
+@measure_memory
+def scan_image_directory(directory_path: str, orig_text_file: str, small: bool = False, progress=None) -> dict:
+    """
+    Scan a directory for image files (JPG/PNG) and extract text using OCR.
+    - progress(done, total) is called with the number of images processed
+    """
+    output_dir = CONTENT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+
+    image_files = list_image_files(directory_path)
+
     if not image_files:
-        return JSONResponse(content={"message": "No image files found in the directory."})
+        return {"message": "No image files found in the directory."}
 
     j = 1
-    combined_content = ""
+    combined_content = []
+    timings = []
+    started = time.perf_counter()
 
-    for image_file in image_files:
-        full_image_path = os.path.join(directory_path, image_file)
+    # OCR runs concurrently; results still come back in directory order
+    image_paths = [os.path.join(directory_path, f) for f in image_files]
+    for done, (image_file, result) in enumerate(zip(image_files, ocr_images(image_paths)), start=1):
+        timings.append(ocr_timing(image_file, result))
+        if progress:
+            progress(done, len(image_files))
 
-        try:
-            # OCR extraction
-            img = Image.open(full_image_path)
-            extracted_text = pytesseract.image_to_string(img)
-        except Exception as e:
-            print(f"⚠️ Error reading {image_file}: {e}")
+        if result["error"]:
+            print(f"⚠️ Error reading {image_file}: {result['error']}")
             continue
+        extracted_text = result["text"]
 
         # Prepare text folder and file path
         company_folder = os.path.join(output_dir, orig_text_file)
@@ -271,112 +891,356 @@ def scan_images(
 
         # Write or return
         if small:
-            combined_content += f"\n---||---\n{cleaned_text}\n"
+            combined_content.append(f"\n---||---\n{cleaned_text}\n")
         else:
-            with open(text_file_path, "a", encoding="utf-8") as f:
+            with metrics.stage("write"), open(text_file_path, "a", encoding="utf-8") as f:
                 f.write(f"\n---||---\n{cleaned_text}\n")
 
-    return JSONResponse(content={
+    return {
         "directory_scanned": directory_path,
         "image_files_found": len(image_files),
         "output_folder": os.path.join(output_dir, orig_text_file),
         "content_returned": small,
-        "content": combined_content if small else "Saved to files",
-        "files_added": image_files
-    })
+        "content": "".join(combined_content) if small else "Saved to files",
+        "files_added": image_files,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "timings": timings
+    }
+
+
+@app.get("/scan-images/")
+@metrics.profiled
+def scan_images(
+    directory_path: str = Query(..., description="Path to the directory containing images"),
+    orig_text_file: str = Query(..., description="Base name for output text files"),
+    small: bool = Query(False, description="If true, return text instead of saving"),
+    stream: bool = Query(False, description="If true, stream one NDJSON record per image instead of saving")
+):
+    """
+    Scan a directory for image files (JPG/PNG) and extract text using OCR.
+    - Saves text in 'output/content/<orig_text_file>/' folder by default
+    - If small=True, returns extracted text directly
+    - If stream=True, streams one NDJSON record per image as soon as it is OCR'd
+    """
+    if stream:
+        image_files = list_image_files(directory_path)
+        results = ocr_images([os.path.join(directory_path, f) for f in image_files])
+        return ndjson_response(iter_image_records(image_files, results))
+    return JSONResponse(content=scan_image_directory(directory_path, orig_text_file, small))
+
+
+class BatchRecords:
+    """
+    Page records for several documents at once, in the order pages become available.
+    Documents are added one by one, e.g. as each file of a multipart upload is stored, and start
+    extracting right away while later ones are still arriving.
+    Up to `concurrency` documents run side by side. Their shards all go to the shared extraction
+    pool, so the batch never adds processes beyond PDF_EXTRACT_WORKERS; each document keeps at most
+    workers / concurrency of them busy. A bounded queue keeps fast producers from running ahead of the client.
+    """
+    def __init__(self, workers: int | None = None, mode: str = "text", extractor: str = "pypdf2",
+                 concurrency: int = UPLOAD_BATCH_CONCURRENCY):
+        self.doc_workers = max(1, (EXTRACT_WORKERS if workers is None else min(workers, EXTRACT_WORKERS)) // concurrency)
+        self.mode = mode
+        self.extractor = extractor
+        self.queue = queue.Queue(maxsize=256)
+        self.stopped = threading.Event()
+        self.finished = object()
+        self.added = 0
+        self.pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="upload-batch")
+
+    def offer(self, item) -> bool:
+        # Give up once the client is gone instead of blocking on a queue nobody reads
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(self, part: dict):
+        try:
+            for record in iter_pdf_directory_records([part], self.doc_workers, self.mode, extractor=self.extractor):
+                if not self.offer(record):
+                    return
+        except Exception as e:
+            self.offer({"file": part["name"], "error": str(e)})
+        finally:
+            self.offer(self.finished)
+
+    def add(self, part: dict):
+        self.added += 1
+        self.pool.submit(self.produce, part)
+
+    def stop(self):
+        self.stopped.set()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    def records(self):
+        """
+        Every record of the documents added so far; call once all documents are added.
+        """
+        try:
+            remaining = self.added
+            while remaining:
+                record = self.queue.get()
+                if record is self.finished:
+                    remaining -= 1
+                else:
+                    yield record
+        finally:
+            self.stop()
+
+
+@app.post("/upload-pdf/")
+async def upload_pdf(request: Request,
+                     filename: str = Query("upload.pdf", description="Original file name, used in records and split part names"),
+                     action: str = Query("extract", pattern="^(extract|split)$", description="extract: stream page records as NDJSON, split: split into parts"),
+                     pages_per_file: int = Query(10, ge=1, description="Number of pages per split PDF (action=split)"),
+                     workers: int | None = Query(None, ge=1, description="Worker processes for page extraction (defaults to PDF_EXTRACT_WORKERS)"),
+                     mode: str = Query("text", pattern="^(text|hybrid)$", description="text: text layer only, hybrid: OCR pages without a usable text layer"),
+                     extractor: str = Query("pypdf2", pattern="^(pypdf2|tesseract|docling)$", description="pypdf2: text layer, tesseract: OCR every page, docling: layout-aware markdown")):
+    """
+    Upload one PDF as the raw request body (Content-Type: application/pdf).
+    The body is written to disk chunk by chunk as it arrives, capped at UPLOAD_MAX_MB.
+    Example usage:
+    curl -X POST --data-binary @VBL-2023.pdf -H "Content-Type: application/pdf" "http://localhost:8000/upload-pdf/?filename=VBL-2023.pdf"
+    """
+    get_extractor(extractor, mode)
+    try:
+        check_content_length(request.headers, UPLOAD_MAX_BYTES)
+        pdf_path = await save_upload(request.stream(), filename)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
+    if action == "split":
+        return JSONResponse(content=await run_in_threadpool(split_pdf_file, pdf_path, pages_per_file))
+    part = {"name": filename, "path": pdf_path, "page_range": None}
+    return ndjson_response(iter_pdf_directory_records([part], workers, mode, extractor=extractor))
 
-def preprocess_image(image_path):
+
+@app.post("/upload-pdfs/")
+async def upload_pdfs(request: Request,
+                      workers: int | None = Query(None, ge=1, description="Worker processes for page extraction, shared by the batch (defaults to PDF_EXTRACT_WORKERS)"),
+                      mode: str = Query("text", pattern="^(text|hybrid)$", description="text: text layer only, hybrid: OCR pages without a usable text layer"),
+                      extractor: str = Query("pypdf2", pattern="^(pypdf2|tesseract|docling)$", description="pypdf2: text layer, tesseract: OCR every page, docling: layout-aware markdown")):
+    """
+    Upload a batch of PDFs as multipart/form-data (field "files") and stream one NDJSON record per page.
+    The body is parsed as it arrives: each file is written to disk and starts extracting as soon as
+    its part is complete. Every file is capped at UPLOAD_MAX_MB, the whole request at UPLOAD_BATCH_MAX_MB.
+    Documents are extracted concurrently, so records from different files interleave; use the file field.
+    Example usage:
+    curl -X POST -F files=@a.pdf -F files=@b.pdf "http://localhost:8000/upload-pdfs/"
+    """
+    get_extractor(extractor, mode)
+    batch = BatchRecords(workers, mode, extractor)
+    try:
+        check_content_length(request.headers, UPLOAD_BATCH_MAX_BYTES)
+        async for filename, pdf_path in iter_multipart_uploads(request.stream(), request.headers.get("content-type")):
+            batch.add({"name": filename, "path": pdf_path, "page_range": None})
+    except UploadError as e:
+        batch.stop()
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    if not batch.added:
+        batch.stop()
+        raise HTTPException(status_code=400, detail='No PDF files in the "files" field')
+    return ndjson_response(batch.records())
+
+
+def load_ingest_pipeline():
+    # Postgres and the embedding model are only needed here, not by the rest of the API
+    scripts_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rag-report_gen")
+    if scripts_dir not in sys.path:
+        sys.path.insert(0, scripts_dir)
+    try:
+        import ingest_pipeline
+    except ImportError as e:
+        raise HTTPException(status_code=503, detail=f"Ingest pipeline unavailable: {e}")
+    return ingest_pipeline
+
+
+def ingest_company(source: str, company: str, workers: int | None = None, mode: str = "text",
+                   extractor: str = "pypdf2", replace: bool = False, progress=None) -> dict:
     """
-    Preprocess image for OCR:
-    - Convert to grayscale
-    - Enhance contrast
-    - Binarize
-    - Denoise (optional)
+    Extract, chunk, embed and store a company's report in financial_excerpts in one pass.
+    progress(done, total) is called with pages stored.
     """
-    img = Image.open(image_path)
+    pipeline = load_ingest_pipeline().IngestPipeline()
+    pages, total_pages = ingest_pages(source, company, workers, mode, extractor)
+    return pipeline.run(company, pages, total_pages, replace=replace, progress=progress)
 
-    # Convert to grayscale
-    img = img.convert("L")
 
-    # Increase contrast
-    enhancer = ImageEnhance.Contrast(img)
-    img = enhancer.enhance(2.0)
+job_manager = JobManager(concurrency=JOB_CONCURRENCY)
+job_manager.register("split-pdf", split_pdf_file)
+job_manager.register("scan-pdfs", scan_pdf_directory)
+job_manager.register("scan-images", scan_image_directory)
+job_manager.register("ingest", ingest_company)
 
-    # Apply binary threshold
-    img = img.point(lambda x: 0 if x < 140 else 255, '1')
 
-    # Slight blur to remove small noise
-    img = img.filter(ImageFilter.MedianFilter(size=3))
+@app.post("/jobs/split-pdf/")
+def submit_split_pdf_job(file_path: str = Query(..., description="Local PDF file path"),
+                         pages_per_file: int = Query(10, ge=1, description="Number of pages per split PDF"),
+                         virtual: bool = Query(False, description="If true, only write a page-range manifest, no part files")):
+    """
+    Queue a /split-pdf/ run in the background and return its job id.
+    Poll /jobs/<job_id> for progress and the result.
+    """
+    job = job_manager.submit("split-pdf", {"file_path": file_path, "pages_per_file": pages_per_file, "virtual": virtual})
+    return JSONResponse(content=job, status_code=202)
 
-    return img
+
+@app.post("/jobs/scan-pdfs/")
+def submit_scan_pdfs_job(directory_path: str = Query(..., description="Path to the directory containing PDFs"),
+                         orig_text_file: str = Query(..., description="Original text file name"),
+                         small: bool = Query(False, description="If true, do not save to file, just return content"),
+                         workers: int | None = Query(None, ge=1, description="Worker processes for page extraction (defaults to PDF_EXTRACT_WORKERS)"),
+                         mode: str = Query("text", pattern="^(text|hybrid)$", description="text: text layer only, hybrid: OCR pages without a usable text layer"),
+                         force: bool = Query(False, description="If true, re-extract every part even if it is unchanged since the last scan"),
+                         tables: bool = Query(False, description="If true, also extract tables (rows/columns) from the text layer"),
+                         dedup: bool = Query(False, description="If true, strip repeated headers/footers and drop near-duplicate pages"),
+                         dedup_scope: str | None = Query(None, description="Pages are deduplicated against earlier scans in this scope (defaults to orig_text_file)"),
+                         extractor: str = Query("pypdf2", pattern="^(pypdf2|tesseract|docling)$", description="pypdf2: text layer, tesseract: OCR every page, docling: layout-aware markdown")):
+    """
+    Queue a /scan-pdfs/ run in the background and return its job id.
+    A re-queued job after a restart picks up from the scan manifest.
+    """
+    get_extractor(extractor, mode)
+    job = job_manager.submit("scan-pdfs", {
+        "directory_path": directory_path,
+        "orig_text_file": orig_text_file,
+        "small": small,
+        "workers": workers,
+        "mode": mode,
+        "force": force,
+        "with_tables": tables,
+        "extractor": extractor,
+        "dedup": dedup,
+        "dedup_scope": dedup_scope,
+    })
+    return JSONResponse(content=job, status_code=202)
 
 
-def clean_extracted_text(text):
+@app.post("/jobs/scan-images/")
+def submit_scan_images_job(directory_path: str = Query(..., description="Path to the directory containing images"),
+                           orig_text_file: str = Query(..., description="Base name for output text files"),
+                           small: bool = Query(False, description="If true, return text instead of saving")):
     """
-    Clean OCR text:
-    - Normalize spacing
-    - Remove broken hyphenations
-    - Replace multiple newlines
-    - Remove junk symbols
+    Queue a /scan-images/ run in the background and return its job id.
     """
-    text = text.replace("­", "")                # soft hyphens
-    text = re.sub(r"(?<=\w)-\n(?=\w)", "", text) # join hyphenated words
-    text = re.sub(r"\n{2,}", "\n", text)        # remove excessive newlines
-    text = re.sub(r"[ \t]+", " ", text)         # normalize spaces
-    text = text.strip()
-    return text
+    job = job_manager.submit("scan-images", {
+        "directory_path": directory_path,
+        "orig_text_file": orig_text_file,
+        "small": small,
+    })
+    return JSONResponse(content=job, status_code=202)
+
+
+@app.post("/jobs/ingest/")
+def submit_ingest_job(source: str = Query(..., description="PDF file, or a directory of PDFs / split parts"),
+                      company: str = Query(..., description="Company name; excerpts are stored as <company>N.txt"),
+                      workers: int | None = Query(None, ge=1, description="Worker processes for page extraction (defaults to PDF_EXTRACT_WORKERS)"),
+                      mode: str = Query("text", pattern="^(text|hybrid)$", description="text: text layer only, hybrid: OCR pages without a usable text layer"),
+                      extractor: str = Query("pypdf2", pattern="^(pypdf2|tesseract|docling)$", description="pypdf2: text layer, tesseract: OCR every page, docling: layout-aware markdown"),
+                      replace: bool = Query(False, description="If true, delete the company's existing excerpts first")):
+    """
+    Queue a one-pass ingest (extract -> chunk -> embed -> financial_excerpts) and return its job id.
+    The result has per-stage throughput.
+    """
+    get_extractor(extractor, mode)
+    if not os.path.exists(source):
+        raise HTTPException(status_code=404, detail=f"File not found: {source}")
+    load_ingest_pipeline()
+    job = job_manager.submit("ingest", {
+        "source": source,
+        "company": company,
+        "workers": workers,
+        "mode": mode,
+        "extractor": extractor,
+        "replace": replace,
+    })
+    return JSONResponse(content=job, status_code=202)
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Job status: queued/running/done/failed, progress (done/total, throughput, ETA) and result.
+    """
+    job = job_manager.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return JSONResponse(content=job)
 
 
 @app.get("/scan-images2/")
+@metrics.profiled
 def scan_images2(
     directory_path: str = Query(..., description="Path to the directory containing images"),
     orig_text_file: str = Query(..., description="Base name for output text files"),
-    small: bool = Query(False, description="If true, return text instead of saving")
+    small: bool = Query(False, description="If true, return text instead of saving"),
+    threshold: str = Query("fixed", pattern="^(fixed|otsu|adaptive)$", description="Binarization: fixed, otsu or adaptive"),
+    target_dpi: int | None = Query(None, ge=50, description="Downscale scans above this DPI before OCR"),
+    stream: bool = Query(False, description="If true, stream one NDJSON record per image instead of saving"),
+    lang: str = Query(ocr_routing.OCR_DEFAULT_LANG, pattern=r"^[a-z_]+(\+[a-z_]+)*$", description="A tesseract language such as eng or hin+eng (default OCR_DEFAULT_LANG), or auto: detect the script per page and pick the language pack (one extra OSD pass per page)"),
+    min_confidence: float = Query(OCR_MIN_CONFIDENCE, ge=0, le=100, description="With lang=auto, pages whose mean word confidence is below this are flagged or skipped"),
+    low_confidence: str = Query("flag", pattern="^(flag|skip)$", description="flag: keep low-confidence pages and list them, skip: leave them out of the text")
 ):
     """
     Scan a directory for image files (JPG/PNG) and extract text using improved OCR.
     - Saves text in 'output/content/<orig_text_file>/' folder
     - If small=True, returns combined text
+    - If stream=True, streams one NDJSON record per image as soon as it is OCR'd
+    - lang=auto routes each page to a tesseract language and page segmentation mode;
+      the response reports per-language throughput and the low-confidence pages
     """
-    output_dir = os.path.join("output", "content")
+    output_dir = CONTENT_DIR
     os.makedirs(output_dir, exist_ok=True)
 
-    if not os.path.exists(directory_path):
-        raise HTTPException(status_code=404, detail=f"Directory not found: {directory_path}")
-    if not os.path.isdir(directory_path):
-        raise HTTPException(status_code=400, detail=f"Path is not a directory: {directory_path}")
+    image_files = list_image_files(directory_path)
+    ocr_options = {"lang": lang, "min_confidence": min_confidence, "low_confidence": low_confidence,
+                   "threshold": threshold, "target_dpi": target_dpi}
 
-    image_files = [
-        f for f in os.listdir(directory_path)
-        if f.lower().endswith((".jpg", ".jpeg", ".png", ".tiff", ".bmp"))
-    ]
+    if stream and image_files:
+        sorted_files = sorted(image_files)
+        results = ocr_images_routed([os.path.join(directory_path, f) for f in sorted_files], **ocr_options)
+        return ndjson_response(iter_image_records(sorted_files, results, clean_extracted_text))
 
     if not image_files:
         return JSONResponse(content={"message": "No image files found in the directory."})
 
-    combined_content = ""
+    combined_content = []
     company_folder = os.path.join(output_dir, orig_text_file)
     os.makedirs(company_folder, exist_ok=True)
+    timings = []
+    started = time.perf_counter()
 
-    for idx, image_file in enumerate(sorted(image_files), start=1):
-        full_image_path = os.path.join(directory_path, image_file)
+    sorted_files = sorted(image_files)
+    image_paths = [os.path.join(directory_path, f) for f in sorted_files]
+    results = []
+    low_confidence_files = []
 
-        try:
-            img = preprocess_image(full_image_path)
+    for idx, (image_file, result) in enumerate(zip(sorted_files, ocr_images_routed(image_paths, **ocr_options)), start=1):
+        timings.append(ocr_timing(image_file, result))
+        results.append(result)
 
-            # layout-aware mode (detects paragraphs better)
-            custom_config = r'--oem 3 --psm 6'
-            extracted_text = pytesseract.image_to_string(img, config=custom_config)
+        try:
+            if result["error"]:
+                raise RuntimeError(result["error"])
+            if result.get("low_confidence"):
+                low_confidence_files.append(image_file)
+                if result["skipped"]:
+                    continue
+            extracted_text = result["text"]
 
             cleaned_text = clean_extracted_text(extracted_text)
 
             text_file_path = os.path.join(company_folder, f"{orig_text_file}{idx}.txt")
 
             if small:
-                combined_content += f"\n---||---\n{cleaned_text}\n"
+                combined_content.append(f"\n---||---\n{cleaned_text}\n")
             else:
-                with open(text_file_path, "a", encoding="utf-8") as f:
+                with metrics.stage("write"), open(text_file_path, "a", encoding="utf-8") as f:
                     f.write(f"\n---||---\n{cleaned_text}\n")
 
         except Exception as e:
@@ -388,8 +1252,12 @@ def scan_images2(
         "image_files_found": len(image_files),
         "output_folder": company_folder,
         "content_returned": small,
-        "content": combined_content if small else "Saved to files",
-        "files_processed": image_files
+        "content": "".join(combined_content) if small else "Saved to files",
+        "files_processed": image_files,
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+        "languages": language_stats(results),
+        "low_confidence_files": low_confidence_files,
+        "timings": timings
     })
 
 
@@ -0,0 +1,101 @@
+"""
+Per-request memory measurement.
+
+Samples /proc/self/status while a request runs and reports:
+- rss_anon: private (anonymous) memory, what actually pushes the box into swap
+- rss_file: file-backed pages, e.g. memory-mapped PDFs, which concurrent requests share via the page cache
+Memory is process-wide, so with concurrent requests the peak covers everything running at the time.
+Set PDF_TRACE_MEMORY=1 to also report the Python heap peak (tracemalloc, slower).
+"""
+
+import functools
+import os
+import resource
+import threading
+import time
+import tracemalloc
+
+SAMPLE_INTERVAL = 0.05
+TRACE_PYTHON_HEAP = os.getenv("PDF_TRACE_MEMORY") == "1"
+
+
+def read_rss() -> dict:
+    """
+    Current RssAnon / RssFile in bytes; falls back to ru_maxrss where /proc is unavailable.
+    """
+    rss = {}
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith(("RssAnon:", "RssFile:")):
+                    key, value = line.split(":", 1)
+                    rss[key] = int(value.split()[0]) * 1024
+    except OSError:
+        pass
+    if not rss:
+        # ru_maxrss is KiB on Linux, bytes on macOS; only used as a rough fallback
+        rss["RssAnon"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        rss["RssFile"] = 0
+    return rss
+
+
+class MemoryProbe:
+    def __init__(self):
+        self.start = {}
+        self.peak_anon = 0
+        self.peak_file = 0
+        self.python_peak = None
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        self.start = read_rss()
+        self.peak_anon = self.start["RssAnon"]
+        self.peak_file = self.start["RssFile"]
+        if TRACE_PYTHON_HEAP and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.thread = threading.Thread(target=self._sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        self._update(read_rss())
+        if TRACE_PYTHON_HEAP and tracemalloc.is_tracing():
+            self.python_peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.reset_peak()
+        return False
+
+    def _sample(self):
+        while not self.stopped.wait(SAMPLE_INTERVAL):
+            self._update(read_rss())
+
+    def _update(self, rss: dict):
+        self.peak_anon = max(self.peak_anon, rss["RssAnon"])
+        self.peak_file = max(self.peak_file, rss["RssFile"])
+
+    def report(self) -> dict:
+        mb = 1024 * 1024
+        report = {
+            "peak_rss_anon_mb": round(self.peak_anon / mb, 1),
+            "rss_anon_growth_mb": round((self.peak_anon - self.start["RssAnon"]) / mb, 1),
+            "peak_rss_file_mb": round(self.peak_file / mb, 1),
+        }
+        if self.python_peak is not None:
+            report["python_heap_peak_mb"] = round(self.python_peak / mb, 1)
+        return report
+
+
+def measure_memory(func):
+    """
+    Run func under a MemoryProbe and add the report to its result dict as "memory".
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with MemoryProbe() as probe:
+            result = func(*args, **kwargs)
+        if isinstance(result, dict):
+            result["memory"] = probe.report()
+        return result
+    return wrapper
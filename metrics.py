@@ -0,0 +1,205 @@
+"""
+Prometheus-style metrics for the PDF Reader API, rendered in the text exposition format at /metrics.
+
+Small on purpose (no prometheus_client dependency): labelled counters and histograms,
+plus collectors that turn existing stats (e.g. the extraction cache) into samples at scrape time.
+Values are per process; worker processes of the extraction pool do not report.
+
+Optional sampled profiling: set PROFILE_SAMPLE_RATE (0..1) and a matching fraction of calls to
+@profiled handlers is run under cProfile, with the stats written to PROFILE_DIR as .prof files
+(open with `python -m pstats` or snakeviz).
+"""
+
+import cProfile
+import functools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIX = "pdf_reader_"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join("output", "profiles"))
+
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple = ()):
+        self.name = PREFIX + name
+        self.help_text = help_text
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = PREFIX + name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, series in sorted(self.values.items()):
+                labels = format_labels(self.labels, key)
+                for bound, count in zip(self.buckets + ("+Inf",), series):
+                    bucket_labels = format_labels(self.labels, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+                lines.append(f"{self.name}_count{labels} {series[-2]}")
+                lines.append(f"{self.name}_sum{labels} {round(series[-1], 6)}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram("request_duration_seconds",
+                            "Time from request to the last byte of the response, per route",
+                            ("method", "route", "status"))
+STAGE_SECONDS = Histogram("stage_duration_seconds", "Time spent per processing stage",
+                          ("stage",), STAGE_BUCKETS)
+PAGES = Counter("pages_total",
+                "PDF pages processed: text_layer = text layer read, ocr = page OCR'd, ocr_cached = OCR text from cache, "
+                "docling = converted by docling",
+                ("method",))
+IMAGES = Counter("images_total", "Images OCR'd", ("status",))
+BYTES_READ = Counter("bytes_read_total", "Input bytes: size of every PDF/image opened, and downloaded bytes", ("source",))
+OCR_LANG_SECONDS = Histogram("ocr_language_duration_seconds", "Tesseract time per routed page, by language pack",
+                             ("lang",), STAGE_BUCKETS)
+OCR_LOW_CONFIDENCE = Counter("ocr_low_confidence_total", "Routed pages under the OCR confidence threshold",
+                             ("lang", "action"))
+
+_metrics = [REQUEST_SECONDS, STAGE_SECONDS, PAGES, IMAGES, BYTES_READ, OCR_LANG_SECONDS, OCR_LOW_CONFIDENCE]
+_collectors = []
+
+
+def stage(name: str):
+    """
+    with stage("extract"): ... records the block's duration under that stage.
+    """
+    return STAGE_SECONDS.time(stage=name)
+
+
+def register_collector(collector):
+    """
+    collector() -> list of exposition lines, called on every scrape.
+    """
+    _collectors.append(collector)
+
+
+def stat_lines(name: str, help_text: str, samples: dict, label: str, kind: str = "gauge") -> list[str]:
+    """
+    Exposition lines for one metric from {label value: number}; None values are skipped.
+    For collectors exposing counters/gauges that another component already keeps.
+    """
+    lines = [f"# HELP {PREFIX}{name} {help_text}", f"# TYPE {PREFIX}{name} {kind}"]
+    for value, number in samples.items():
+        if number is not None:
+            lines.append(f'{PREFIX}{name}{{{label}="{escape(value)}"}} {number}')
+    return lines
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+def profiled(func):
+    """
+    Run a sampled fraction (PROFILE_SAMPLE_RATE) of calls under cProfile and dump the stats.
+    Only the calling thread is profiled; work handed to the OCR/extraction pools shows up as waits.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if PROFILE_SAMPLE_RATE <= 0 or random.random() >= PROFILE_SAMPLE_RATE:
+            return func(*args, **kwargs)
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(func, *args, **kwargs)
+        finally:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            path = os.path.join(PROFILE_DIR, f"{func.__name__}-{time.strftime('%Y%m%d-%H%M%S')}-{threading.get_ident()}.prof")
+            profiler.dump_stats(path)
+            print(f"🧪 Profile written to {path}")
+    return wrapper
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording REQUEST_SECONDS, labelled with the route template (/jobs/{job_id}),
+    so path parameters do not explode the number of series.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(time.perf_counter() - started, method=scope["method"],
+                                    route=getattr(route, "path", "unmatched"), status=status)
@@ -0,0 +1,109 @@
+"""
+Per-page OCR routing: pick the tesseract language pack and page segmentation mode for each scan.
+
+- Script and orientation come from tesseract's OSD (--psm 0) on a downscaled copy of the page,
+  which is much cheaper than a full OCR pass
+- The script maps to a language pack (OCR_SCRIPT_LANGS, e.g. Devanagari -> hin+eng for our
+  mixed Hindi/English filings); packs that are not installed are dropped, falling back to OCR_DEFAULT_LANG
+- Pages with little ink are OCR'd as sparse text (--psm 11) instead of one uniform block (--psm 6)
+- Routed pages are OCR'd through image_to_data, so the text comes back with a mean word confidence;
+  the text is rebuilt with image_to_string's layout (one line per line, a blank line between paragraphs).
+  A page without any words has no confidence (None), not 0
+- Routing is opt-in (lang="auto"): OSD is an extra tesseract run per page. A fixed language keeps the
+  plain image_to_string text (ocr_text) and has no confidence
+"""
+
+import functools
+import os
+
+import numpy as np
+import pytesseract
+from pytesseract import Output, TesseractError
+
+OCR_DEFAULT_LANG = os.getenv("OCR_DEFAULT_LANG", "eng")
+# OSD script name -> tesseract language(s)
+OCR_SCRIPT_LANGS = dict(
+    pair.split("=", 1) for pair in os.getenv("OCR_SCRIPT_LANGS", "Latin=eng,Devanagari=hin+eng").split(",") if "=" in pair
+)
+# Below this OSD script confidence the default language is used
+MIN_SCRIPT_CONFIDENCE = float(os.getenv("OCR_MIN_SCRIPT_CONFIDENCE", "1.0"))
+# OSD needs a few lines of text, not full resolution
+OSD_MAX_SIDE = 1200
+PSM_BLOCK = 6
+PSM_SPARSE = 11
+# Fraction of dark pixels under which a page is treated as sparse text
+SPARSE_INK_RATIO = 0.02
+
+
+@functools.lru_cache(maxsize=1)
+def installed_languages() -> frozenset:
+    try:
+        return frozenset(pytesseract.get_languages(config=""))
+    except Exception:
+        return frozenset()
+
+
+def detect_script(img) -> dict:
+    """
+    {"script", "script_confidence", "rotate"} from OSD; script is None when OSD fails
+    (too little text, or osd.traineddata missing).
+    """
+    small = img.copy()
+    small.thumbnail((OSD_MAX_SIDE, OSD_MAX_SIDE))
+    try:
+        osd = pytesseract.image_to_osd(small, config="--psm 0", output_type=Output.DICT)
+    except TesseractError:
+        return {"script": None, "script_confidence": 0.0, "rotate": 0}
+    return {"script": osd["script"], "script_confidence": float(osd["script_conf"]), "rotate": int(osd["rotate"])}
+
+
+def ink_ratio(img) -> float:
+    return float(np.mean(np.asarray(img.convert("L")) < 128))
+
+
+def route(img, detection: dict) -> tuple[str, int]:
+    """
+    (lang, psm) for a page, given detect_script's result.
+    """
+    lang = OCR_DEFAULT_LANG
+    if detection["script"] and detection["script_confidence"] >= MIN_SCRIPT_CONFIDENCE:
+        lang = OCR_SCRIPT_LANGS.get(detection["script"], OCR_DEFAULT_LANG)
+    installed = installed_languages()
+    if installed:
+        lang = "+".join(part for part in lang.split("+") if part in installed) or OCR_DEFAULT_LANG
+    psm = PSM_SPARSE if ink_ratio(img) < SPARSE_INK_RATIO else PSM_BLOCK
+    return lang, psm
+
+
+def ocr_text(img, lang: str, psm: int) -> str:
+    """
+    Plain image_to_string OCR, for pages whose language was given rather than routed.
+    """
+    return pytesseract.image_to_string(img, lang=lang, config=f"--oem 3 --psm {psm}")
+
+
+def ocr_with_confidence(img, lang: str, psm: int) -> tuple[str, float | None]:
+    """
+    OCR text and the mean confidence (0-100) of its words, from a single tesseract run;
+    the confidence is None when tesseract found no words.
+    The text keeps image_to_string's layout: lines on their own line, paragraphs and blocks
+    separated by a blank line.
+    """
+    data = pytesseract.image_to_data(img, lang=lang, config=f"--oem 3 --psm {psm}", output_type=Output.DICT)
+    lines = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        if not word.strip():
+            continue
+        lines.setdefault((data["block_num"][i], data["par_num"][i], data["line_num"][i]), []).append(word)
+        if float(data["conf"][i]) >= 0:
+            confidences.append(float(data["conf"][i]))
+    parts = []
+    paragraph = None
+    for (block, par, _), words in lines.items():
+        if paragraph is not None:
+            parts.append("\n" if (block, par) == paragraph else "\n\n")
+        parts.append(" ".join(words))
+        paragraph = (block, par)
+    text = "".join(parts)
+    return text, round(sum(confidences) / len(confidences), 2) if confidences else None
@@ -0,0 +1,513 @@
+"""
+Page text of PDFs and split-part directories: text layer, hybrid and OCR extraction, with the
+extraction cache. Shared by main.py and the scripts (rag-report_gen/ingest_pipeline.py).
+
+Kept free of import-time side effects like pdf_extract.py, so a script can import it without
+starting the API: the extraction cache, the OCR pool and the extractor registry are set up on
+first use.
+"""
+
+import itertools
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+from PyPDF2 import __version__ as PYPDF2_VERSION
+import pytesseract
+
+import extractors
+import image_preprocess
+import metrics
+import tables
+from extraction_cache import ExtractionCache, file_sha256
+from pdf_extract import (EXTRACT_WORKERS, extract_page_range, get_extract_pool, open_pdf, page_shards,
+                         reset_extract_pool)
+
+# Written next to split parts; lists the source page range of every part
+SPLIT_MANIFEST = "split_manifest.json"
+
+# Page text is extracted by one server-wide process pool of PDF_EXTRACT_WORKERS (see pdf_extract.py);
+# the `workers` query param limits how many of them one request keeps busy.
+# Below this page count a process pool costs more than it saves
+PARALLEL_MIN_PAGES = 20
+
+# Threads, not processes: tesseract itself runs as a subprocess per image.
+# Shared by every request, so this also caps tesseract processes server-wide.
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", os.cpu_count() or 1))
+
+# Part of every extraction cache key; bump the suffix when page text post-processing changes
+EXTRACTOR_VERSION = f"PyPDF2-{PYPDF2_VERSION}/1"
+# Detected tables are cached per page as JSON, next to the page text
+TABLES_CACHE_VERSION = f"{EXTRACTOR_VERSION}+tables-{tables.TABLES_VERSION}"
+
+# Hybrid mode: pages whose text layer fails these checks are rasterized and OCR'd
+HYBRID_MIN_CHARS = 50
+HYBRID_MIN_READABLE_RATIO = 0.8
+HYBRID_OCR_DPI = 300
+HYBRID_OCR_VERSION = f"tesseract-hybrid-{HYBRID_OCR_DPI}dpi/1"
+PDFIUM_LOCK = threading.Lock()
+
+_extraction_cache = None
+_ocr_executor = None
+_extractors_registered = False
+_setup_lock = threading.Lock()
+
+
+def get_extraction_cache() -> ExtractionCache:
+    """
+    The process-wide extraction cache, opened on first use.
+    """
+    global _extraction_cache
+    with _setup_lock:
+        if _extraction_cache is None:
+            _extraction_cache = ExtractionCache()
+        return _extraction_cache
+
+
+def set_extraction_cache(cache: ExtractionCache):
+    """
+    Swap the shared extraction cache, e.g. for a throw-away one in a benchmark.
+    The docling backend keeps the cache it was registered with; set its .cache as well.
+    """
+    global _extraction_cache
+    with _setup_lock:
+        _extraction_cache = cache
+
+
+def get_ocr_executor() -> ThreadPoolExecutor:
+    """
+    The shared OCR pool; its threads are only started on the first submit.
+    """
+    global _ocr_executor
+    with _setup_lock:
+        if _ocr_executor is None:
+            # Each tesseract process would otherwise start its own OpenMP thread team
+            os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+            _ocr_executor = ThreadPoolExecutor(max_workers=OCR_WORKERS, thread_name_prefix="ocr")
+        return _ocr_executor
+
+
+def register_extractors():
+    """
+    Register the "pypdf2", "tesseract" and "docling" backends (once) in extractors.
+    """
+    global _extractors_registered
+    cache = get_extraction_cache()
+    with _setup_lock:
+        if _extractors_registered:
+            return
+        extractors.register(PyPDF2Extractor())
+        extractors.register(TesseractExtractor())
+        extractors.register(extractors.DoclingExtractor(cache=cache, hash_file=file_sha256))
+        _extractors_registered = True
+
+
+def get_backend(name: str) -> extractors.Extractor:
+    register_extractors()
+    return extractors.get_extractor(name)
+
+
+def iter_pdf_pages(file_path: str, workers: int | None = None, page_range: tuple[int, int] | None = None):
+    """
+    Yield page text lazily, in page order.
+    - Serial mode holds a single page in memory at a time
+    - Parallel mode keeps a bounded window of page-range shards in flight on the shared pool
+    - Pages found in the extraction cache are never re-extracted
+    - page_range=(start, end) limits extraction to pages [start, end), e.g. a virtual split part
+    """
+    workers = EXTRACT_WORKERS if workers is None else min(workers, EXTRACT_WORKERS)
+    cache = get_extraction_cache()
+    # Cache keys are content based; split parts resolve to their source document
+    file_hash, page_offset = cache.resolve(file_sha256(file_path))
+
+    with open_pdf(file_path) as pdf_reader:
+        first_page, last_page = page_range or (0, len(pdf_reader.pages))
+        if workers <= 1 or last_page - first_page < PARALLEL_MIN_PAGES:
+            for i in range(first_page, last_page):
+                page_text = cache.get(file_hash, EXTRACTOR_VERSION, page_offset + i)
+                if page_text is None:
+                    with metrics.stage("extract"):
+                        page_text = pdf_reader.pages[i].extract_text() or ""
+                    cache.put(file_hash, EXTRACTOR_VERSION, page_offset + i, page_text)
+                metrics.PAGES.inc(method="text_layer")
+                yield page_text
+            return
+
+    shards = iter(page_shards(first_page, last_page, workers))
+    pool = get_extract_pool()
+
+    def submit(start, end):
+        cached = cache.get_range(file_hash, EXTRACTOR_VERSION, page_offset + start, page_offset + end)
+        if len(cached) == end - start:
+            return start, [cached[page_offset + i] for i in range(start, end)]
+        return start, pool.submit(extract_page_range, file_path, start, end)
+
+    pending = deque()
+    try:
+        pending.extend(submit(start, end) for start, end in itertools.islice(shards, workers * 2))
+        while pending:
+            start, pages = pending.popleft()
+            if not isinstance(pages, list):
+                # Time spent waiting on the pool, which is what the consumer actually feels
+                with metrics.stage("extract"):
+                    try:
+                        pages = pages.result()
+                    except BrokenProcessPool:
+                        # A worker died; later requests get a fresh pool
+                        reset_extract_pool()
+                        raise
+                cache.put_range(file_hash, EXTRACTOR_VERSION, page_offset + start, pages)
+            # Refill the window before handing pages to the (possibly slow) consumer
+            shard = next(shards, None)
+            if shard:
+                pending.append(submit(*shard))
+            metrics.PAGES.inc(len(pages), method="text_layer")
+            yield from pages
+    finally:
+        # Client may disconnect mid-stream; drop this request's queued shards, the pool stays up
+        for _, pages in pending:
+            if not isinstance(pages, list):
+                pages.cancel()
+
+
+def extract_pdf_tables(file_path: str, page_range: tuple[int, int] | None = None) -> list[dict]:
+    """
+    Tables detected on the text layer, as {"page", "rows"} dicts with page indices of file_path.
+    Pages already in the extraction cache are not parsed again.
+    """
+    cache = get_extraction_cache()
+    file_hash, page_offset = cache.resolve(file_sha256(file_path))
+    with open_pdf(file_path) as pdf_reader:
+        first_page, last_page = page_range or (0, len(pdf_reader.pages))
+        cached = cache.get_range(file_hash, TABLES_CACHE_VERSION, page_offset + first_page, page_offset + last_page)
+        found = []
+        for i in range(first_page, last_page):
+            page_tables = cached.get(page_offset + i)
+            if page_tables is None:
+                with metrics.stage("tables"):
+                    page_tables = json.dumps(tables.extract_page_tables(pdf_reader.pages[i]), ensure_ascii=False)
+                cache.put(file_hash, TABLES_CACHE_VERSION, page_offset + i, page_tables)
+            found.extend({"page": i, "rows": rows} for rows in json.loads(page_tables))
+    return found
+
+
+def part_tables(part: dict) -> list[dict]:
+    """
+    Tables of a part from list_pdf_parts, with page indices relative to the part.
+    """
+    first_page = part["page_range"][0] if part["page_range"] else 0
+    return [dict(table, page=table["page"] - first_page) for table in extract_pdf_tables(part["path"], part["page_range"])]
+
+
+def text_layer_usable(text: str) -> bool:
+    """
+    Decide whether a page's embedded text layer is good enough to skip OCR.
+    - Density: enough characters to be a real page rather than a stray header
+    - Quality: mostly letters/digits/punctuation, not glyph garbage from a broken font map
+    """
+    stripped = text.strip()
+    if len(stripped) < HYBRID_MIN_CHARS:
+        return False
+    if "(cid:" in stripped or stripped.count("\ufffd") > len(stripped) * 0.01:
+        return False
+    readable = sum(1 for c in stripped if c.isalnum() or c.isspace() or c in ".,;:%()-/₹$&'\"")
+    return readable / len(stripped) >= HYBRID_MIN_READABLE_RATIO
+
+
+def rasterize_pdf_page(file_path: str, page_index: int, dpi: int = HYBRID_OCR_DPI):
+    """
+    Render one PDF page to a PIL image for OCR.
+    """
+    import pypdfium2 as pdfium
+
+    # pdfium is not thread-safe, so renders are serialised; tesseract still runs in parallel
+    with PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            return pdf[page_index].render(scale=dpi / 72).to_pil()
+        finally:
+            pdf.close()
+
+
+def ocr_image_file(image_path, preprocess: bool = False, config: str = "", **preprocess_options) -> dict:
+    """
+    OCR a single image file (path or PIL image). Runs on the shared OCR pool.
+    Errors are returned instead of raised so one bad scan does not sink the batch.
+    """
+    started = time.perf_counter()
+    result = {"text": None, "error": None, "preprocess_seconds": 0.0}
+    try:
+        img = preprocess_image(image_path, **preprocess_options) if preprocess else (
+            Image.open(image_path) if isinstance(image_path, str) else image_path)
+        result["preprocess_seconds"] = round(time.perf_counter() - started, 4)
+        result["text"] = pytesseract.image_to_string(img, config=config)
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = round(time.perf_counter() - started, 4)
+    result["ocr_seconds"] = round(result["seconds"] - result["preprocess_seconds"], 4)
+
+    if preprocess:
+        metrics.STAGE_SECONDS.observe(result["preprocess_seconds"], stage="preprocess")
+    metrics.STAGE_SECONDS.observe(result["ocr_seconds"], stage="ocr")
+    if isinstance(image_path, str):
+        metrics.IMAGES.inc(status="error" if result["error"] else "ok")
+        if os.path.isfile(image_path):
+            metrics.BYTES_READ.inc(os.path.getsize(image_path), source="image")
+    return result
+
+
+def preprocess_image(image_path, threshold: str = "fixed", target_dpi: int | None = None):
+    """
+    Preprocess image for OCR:
+    - Convert to grayscale
+    - Enhance contrast
+    - Binarize (fixed threshold by default, or "otsu" / "adaptive")
+    - Denoise (3x3 median)
+    - Optionally downscale to target_dpi first
+    Vectorised in image_preprocess; fixed-threshold output matches the old PIL path pixel for pixel.
+    """
+    return image_preprocess.preprocess_image(image_path, threshold=threshold, target_dpi=target_dpi)
+
+
+def clean_extracted_text(text):
+    """
+    Clean OCR text:
+    - Normalize spacing
+    - Remove broken hyphenations
+    - Replace multiple newlines
+    - Remove junk symbols
+    """
+    text = text.replace("­", "")                # soft hyphens
+    text = re.sub(r"(?<=\w)-\n(?=\w)", "", text) # join hyphenated words
+    text = re.sub(r"\n{2,}", "\n", text)        # remove excessive newlines
+    text = re.sub(r"[ \t]+", " ", text)         # normalize spaces
+    text = text.strip()
+    return text
+
+
+def ocr_pdf_page(file_path: str, page_index: int) -> dict:
+    """
+    Rasterize and OCR one PDF page on the shared OCR pool.
+    """
+    started = time.perf_counter()
+    try:
+        img = rasterize_pdf_page(file_path, page_index)
+    except Exception as e:
+        return {"text": None, "error": str(e), "seconds": round(time.perf_counter() - started, 4)}
+    result = ocr_image_file(img, preprocess=True, config=r'--oem 3 --psm 6')
+    result["seconds"] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def iter_pdf_pages_hybrid(file_path: str, workers: int | None = None, page_range: tuple[int, int] | None = None):
+    """
+    Yield (text, method) per page, in page order.
+    - method is "text" when the embedded text layer passes text_layer_usable
+    - otherwise the page is rasterized and OCR'd ("ocr"), or "text" again if OCR failed
+    OCR work is queued as soon as a page fails the check, so scanned pages are
+    processed concurrently while text pages keep streaming.
+    """
+    cache = get_extraction_cache()
+    file_hash, page_offset = cache.resolve(file_sha256(file_path))
+    pending = deque()
+
+    def ready(item):
+        return not isinstance(item[1], Future) or item[1].done()
+
+    def resolve(item):
+        page_index, value, text_layer = item
+        if not isinstance(value, Future):
+            return value
+        result = value.result()
+        if result["error"]:
+            print(f"⚠️ OCR failed for page {page_index + 1} of {file_path}: {result['error']}")
+            return text_layer, "text"
+        text = clean_extracted_text(result["text"])
+        cache.put(file_hash, HYBRID_OCR_VERSION, page_offset + page_index, text)
+        metrics.PAGES.inc(method="ocr")
+        return text, "ocr"
+
+    first_page = page_range[0] if page_range else 0
+    pages = iter_pdf_pages(file_path, workers=workers, page_range=page_range)
+    for page_index, text in enumerate(pages, start=first_page):
+        if text_layer_usable(text):
+            pending.append((page_index, (text, "text"), text))
+        else:
+            cached = cache.get(file_hash, HYBRID_OCR_VERSION, page_offset + page_index)
+            if cached is not None:
+                metrics.PAGES.inc(method="ocr_cached")
+                pending.append((page_index, (cached, "ocr"), text))
+            else:
+                pending.append((page_index, get_ocr_executor().submit(ocr_pdf_page, file_path, page_index), text))
+
+        # Bounded look-ahead: wait on the head once enough OCR is in flight
+        while pending and (ready(pending[0]) or len(pending) > OCR_WORKERS * 2):
+            yield resolve(pending.popleft())
+
+    while pending:
+        yield resolve(pending.popleft())
+
+
+def iter_pdf_pages_ocr(file_path: str, page_range: tuple[int, int] | None = None):
+    """
+    Yield OCR text for every page, in page order, ignoring the text layer.
+    Pages go through the shared OCR pool with a bounded look-ahead, and share the hybrid
+    mode's cache entries (same rasterization and tesseract settings).
+    """
+    cache = get_extraction_cache()
+    file_hash, page_offset = cache.resolve(file_sha256(file_path))
+    first_page, last_page = page_range or (0, count_pdf_pages(file_path))
+    pending = deque()
+
+    def resolve(page_index, value):
+        if not isinstance(value, Future):
+            return value
+        result = value.result()
+        if result["error"]:
+            print(f"⚠️ OCR failed for page {page_index + 1} of {file_path}: {result['error']}")
+            return ""
+        text = clean_extracted_text(result["text"])
+        cache.put(file_hash, HYBRID_OCR_VERSION, page_offset + page_index, text)
+        metrics.PAGES.inc(method="ocr")
+        return text
+
+    for page_index in range(first_page, last_page):
+        cached = cache.get(file_hash, HYBRID_OCR_VERSION, page_offset + page_index)
+        if cached is not None:
+            metrics.PAGES.inc(method="ocr_cached")
+            pending.append((page_index, cached))
+        else:
+            pending.append((page_index, get_ocr_executor().submit(ocr_pdf_page, file_path, page_index)))
+
+        while pending and (not isinstance(pending[0][1], Future) or pending[0][1].done() or len(pending) > OCR_WORKERS * 2):
+            yield resolve(*pending.popleft())
+
+    while pending:
+        yield resolve(*pending.popleft())
+
+
+class PyPDF2Extractor(extractors.Extractor):
+    name = "pypdf2"
+    method = "text"
+
+    def iter_pages(self, file_path, workers=None, page_range=None):
+        return iter_pdf_pages(file_path, workers=workers, page_range=page_range)
+
+
+class TesseractExtractor(extractors.Extractor):
+    name = "tesseract"
+    method = "ocr"
+
+    def available(self):
+        return shutil.which(pytesseract.pytesseract.tesseract_cmd) is not None
+
+    def iter_pages(self, file_path, workers=None, page_range=None):
+        return iter_pdf_pages_ocr(file_path, page_range=page_range)
+
+
+def count_pdf_pages(file_path: str) -> int:
+    with open_pdf(file_path) as pdf_reader:
+        return len(pdf_reader.pages)
+
+
+def load_split_manifest(directory_path: str) -> dict | None:
+    manifest_path = os.path.join(directory_path, SPLIT_MANIFEST)
+    if not os.path.isfile(manifest_path):
+        return None
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def list_pdf_parts(directory_path: str) -> list[dict]:
+    """
+    PDFs to scan in a directory, as {"name", "path", "page_range"} dicts.
+    - With a split manifest: its parts in page order; parts without a file on disk
+      (virtual splits) read their page range straight from the source PDF
+    - Otherwise: every PDF in the directory, whole, in name order
+    """
+    manifest = load_split_manifest(directory_path)
+    if manifest is None:
+        return [
+            {"name": f, "path": os.path.join(directory_path, f), "page_range": None}
+            for f in sorted(os.listdir(directory_path)) if f.lower().endswith(".pdf")
+        ]
+
+    parts = []
+    for part in manifest["parts"]:
+        part_path = os.path.join(directory_path, part["name"])
+        if os.path.isfile(part_path):
+            parts.append({"name": part["name"], "path": part_path, "page_range": None})
+        else:
+            parts.append({"name": part["name"], "path": manifest["source"], "page_range": (part["start"], part["end"])})
+    return parts
+
+
+def part_page_count(part: dict) -> int:
+    if part["page_range"]:
+        return part["page_range"][1] - part["page_range"][0]
+    return count_pdf_pages(part["path"])
+
+
+def iter_part_pages(part: dict, workers: int | None = None, mode: str = "text", extractor: str = "pypdf2"):
+    """
+    Yield (text, method) for every page of a part from list_pdf_parts.
+    """
+    if mode == "hybrid":
+        yield from iter_pdf_pages_hybrid(part["path"], workers=workers, page_range=part["page_range"])
+    else:
+        backend = get_backend(extractor)
+        for text in backend.iter_pages(part["path"], workers=workers, page_range=part["page_range"]):
+            yield text, backend.method
+
+
+def iter_parts_pages(parts: list[dict], workers: int | None = None, mode: str = "text", extractor: str = "pypdf2"):
+    """
+    Yield (part, iterator of (text, method)) for every part, in order.
+    Backends that batch (docling) convert batch_size parts per call; the others stream page by page.
+    """
+    backend = get_backend(extractor)
+    if mode == "hybrid" or backend.batch_size <= 1:
+        for part in parts:
+            yield part, iter_part_pages(part, workers, mode, extractor)
+        return
+    for batch_start in range(0, len(parts), backend.batch_size):
+        batch = parts[batch_start:batch_start + backend.batch_size]
+        converted = backend.convert([(part["path"], part["page_range"]) for part in batch], workers)
+        for part, pages in zip(batch, converted):
+            yield part, ((text, backend.method) for text in pages)
+
+
+def ingest_pages(source: str, company: str, workers: int | None = None, mode: str = "text",
+                 extractor: str = "pypdf2"):
+    """
+    (pages, total) for rag-report_gen/ingest_pipeline.py: pages yields (filename, text) for every page
+    of a PDF or a directory of PDFs / split parts, named <company>N.txt per part like /scan-pdfs/.
+    Raises ValueError for an unknown extractor or a source without PDFs, FileNotFoundError for a missing source.
+    """
+    if mode == "hybrid" and extractor != "pypdf2":
+        raise ValueError("mode=hybrid only works with extractor=pypdf2")
+    get_backend(extractor)
+    if os.path.isfile(source):
+        parts = [{"name": os.path.basename(source), "path": source, "page_range": None}]
+    elif os.path.isdir(source):
+        parts = list_pdf_parts(source)
+    else:
+        raise FileNotFoundError(f"File not found: {source}")
+    if not parts:
+        raise ValueError(f"No PDF files found in {source}")
+    numbers = {part["name"]: n for n, part in enumerate(parts, start=1)}
+
+    def pages():
+        for part, records in iter_parts_pages(parts, workers, mode, extractor):
+            filename = f"{company}{numbers[part['name']]}.txt"
+            for text, _ in records:
+                yield filename, text
+
+    return pages(), sum(part_page_count(part) for part in parts)
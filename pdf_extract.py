@@ -0,0 +1,104 @@
+"""
+PDF text-layer reading and the server-wide process pool that extracts page ranges.
+
+Kept free of import-time side effects: with the forkserver/spawn start methods every pool
+worker imports this module (not main.py) to run extract_page_range.
+
+- One ProcessPoolExecutor per process, PDF_EXTRACT_WORKERS processes, shared by every request
+  and job, so concurrent requests queue for the same workers instead of each starting a pool
+- Workers are started with forkserver (spawn where that is unavailable), never forked from the
+  multi-threaded server, so they cannot inherit a lock held by another thread
+"""
+
+import math
+import mmap
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from PyPDF2 import PdfReader
+
+import metrics
+
+# Size of the shared extraction pool; a request's `workers` can only ask for fewer
+EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+# Read PDFs through mmap (set PDF_MMAP=0 to fall back to buffered file reads)
+PDF_MMAP = os.getenv("PDF_MMAP", "1") != "0"
+# Shards handed out per worker, so one slow page range does not stall the pool
+SHARDS_PER_WORKER = 4
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+@contextmanager
+def open_pdf(file_path: str):
+    """
+    PdfReader over a read-only memory map of the file.
+    Concurrent requests (and pool workers) on the same report then share the OS page cache
+    instead of each holding a private copy of the bytes.
+    """
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        metrics.BYTES_READ.inc(size, source="pdf")
+        # mmap cannot map an empty file; let PdfReader raise its usual error instead
+        if not PDF_MMAP or size == 0:
+            with metrics.stage("parse"):
+                pdf_reader = PdfReader(f)
+            yield pdf_reader
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with metrics.stage("parse"):
+                pdf_reader = PdfReader(mapped)
+            yield pdf_reader
+
+
+def extract_page_range(file_path: str, start: int, end: int) -> list[str]:
+    """
+    Extract text for pages [start, end) of a PDF file.
+    Runs inside the worker processes, so it opens its own reader.
+    """
+    with open_pdf(file_path) as pdf_reader:
+        return [pdf_reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def page_shards(first_page: int, last_page: int, workers: int) -> list[tuple[int, int]]:
+    """
+    Split [first_page, last_page) into contiguous (start, end) page ranges for the pool.
+    """
+    shard_size = max(1, math.ceil((last_page - first_page) / (workers * SHARDS_PER_WORKER)))
+    return [(start, min(start + shard_size, last_page)) for start in range(first_page, last_page, shard_size)]
+
+
+def get_extract_pool() -> ProcessPoolExecutor:
+    """
+    The shared pool; worker processes are only started on the first submit.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _pool = ProcessPoolExecutor(max_workers=EXTRACT_WORKERS, mp_context=context)
+        return _pool
+
+
+def reset_extract_pool():
+    """
+    Drop a broken pool (a worker died); the next get_extract_pool() starts a fresh one.
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_extract_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -1,5 +1,28 @@
+"""
+Backfill embeddings for financial_excerpts rows that do not have one yet.
+
+- Rows are streamed with a server-side cursor, so the backlog is never loaded in one go
+- Excerpts are encoded in batches (model.encode(list, batch_size=...)) by embedding_server.py,
+  which keeps the model warm between runs, and written back with one UPDATE ... FROM (VALUES ...) per chunk
+- Every chunk is committed, so an interrupted run resumes where it stopped: the next run
+  only sees rows that still have no embedding
+
+Usage:
+    python rag-report_gen/generate_embeddings_for_text.py
+    python rag-report_gen/generate_embeddings_for_text.py --batch-size 128 --chunk-size 2048 --limit 10000
+"""
+
+import argparse
+import os
+import sys
+import time
+
 import psycopg2
-from sentence_transformers import SentenceTransformer
+from psycopg2.extras import execute_values
+from pgvector.psycopg2 import register_vector
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from embedding_client import EmbeddingClient  # noqa: E402
 
 # ====== CONFIGURATION ======
 DB_CONFIG = {
@@ -11,36 +34,87 @@ DB_CONFIG = {
 }
 
 TABLE_NAME = "financial_excerpts"
-
-# ====== LOAD MODEL ======
 # You can switch to another if desired (MiniLM is faster, E5 gives higher quality)
-model = SentenceTransformer("intfloat/e5-large-v2")
+MODEL_NAME = "intfloat/e5-large-v2"
+
+# Excerpts per model.encode forward pass
+BATCH_SIZE = 64
+# Rows fetched, encoded, written and committed together (one checkpoint)
+CHUNK_SIZE = 1024
+
 
-# ====== CONNECT TO DATABASE ======
-conn = psycopg2.connect(**DB_CONFIG)
-cur = conn.cursor()
+def fetch_pending(conn, chunk_size, limit=None):
+    """
+    Yield lists of (id, excerpt) for rows without an embedding, in id order, chunk_size at a time.
+    """
+    # Named cursor = server-side; rows come over in chunk_size round trips
+    with conn.cursor(name="embedding_backfill") as cur:
+        cur.itersize = chunk_size
+        query = f"SELECT id, excerpt FROM {TABLE_NAME} WHERE embedding IS NULL ORDER BY id"
+        cur.execute(query + (" LIMIT %s" if limit else ""), (limit,) if limit else None)
+        while rows := cur.fetchmany(chunk_size):
+            yield rows
 
-# ====== FETCH EXCERPTS WITHOUT EMBEDDINGS ======
-cur.execute(f"SELECT id, excerpt FROM {TABLE_NAME} WHERE embedding IS NULL;")
-rows = cur.fetchall()
-print(f"📄 Found {len(rows)} excerpts without embeddings")
 
-# ====== GENERATE AND STORE EMBEDDINGS ======
-i = 0
-for record_id, excerpt in rows:
+def embed_passages(model, excerpts, batch_size):
     # For E5 models, prepend "passage:" to text for better results
-    text = f"passage: {excerpt}"
-    embedding = model.encode(text).tolist()
-    
-    cur.execute(f"UPDATE {TABLE_NAME} SET embedding = %s WHERE id = %s;", (embedding, record_id))
-    i += 1
-    if i % 100 == 0:
-        print(f"  ✅ Processed {i} excerpts")
-        break
+    return model.encode([f"passage: {excerpt or ''}" for excerpt in excerpts],
+                        batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+
+
+def write_embeddings(conn, ids, embeddings):
+    with conn.cursor() as cur:
+        execute_values(
+            cur,
+            f"UPDATE {TABLE_NAME} AS t SET embedding = data.embedding "
+            f"FROM (VALUES %s) AS data (id, embedding) WHERE t.id = data.id",
+            list(zip(ids, embeddings)),
+            template="(%s, %s::vector)",
+            page_size=len(ids),
+        )
+    # Checkpoint: everything up to here survives a crash
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill embeddings for financial_excerpts.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Excerpts per encode batch")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows per fetch and commit")
+    parser.add_argument("--limit", type=int, default=None, help="Stop after this many rows")
+    parser.add_argument("--model", default=MODEL_NAME)
+    args = parser.parse_args()
+
+    model = EmbeddingClient(args.model)
+
+    # Reads and writes use separate connections: committing the writes must not close the read cursor
+    read_conn = psycopg2.connect(**DB_CONFIG)
+    write_conn = psycopg2.connect(**DB_CONFIG)
+    register_vector(write_conn)
+
+    with read_conn.cursor() as cur:
+        cur.execute(f"SELECT COUNT(*) FROM {TABLE_NAME} WHERE embedding IS NULL;")
+        pending = cur.fetchone()[0]
+    total = min(pending, args.limit) if args.limit else pending
+    print(f"📄 Found {pending} excerpts without embeddings, processing {total}")
+
+    done = 0
+    started = time.perf_counter()
+    try:
+        for rows in fetch_pending(read_conn, args.chunk_size, args.limit):
+            ids = [record_id for record_id, _ in rows]
+            embeddings = embed_passages(model, [excerpt for _, excerpt in rows], args.batch_size)
+            write_embeddings(write_conn, ids, embeddings)
+            done += len(rows)
+            rate = done / (time.perf_counter() - started)
+            print(f"  ✅ {done}/{total} excerpts (up to id {ids[-1]}), {rate:.1f} excerpts/sec")
+    finally:
+        read_conn.close()
+        write_conn.close()
 
+    elapsed = time.perf_counter() - started
+    print(f"✅ {done} embeddings generated and stored in {elapsed:.1f}s "
+          f"({done / elapsed if elapsed else 0:.1f} excerpts/sec)")
 
-conn.commit()
-cur.close()
-conn.close()
 
-print("✅ Embeddings generated and stored successfully!")
+if __name__ == "__main__":
+    main()
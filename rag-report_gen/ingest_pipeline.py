@@ -0,0 +1,295 @@
+"""
+One-pass ingest of a company's report into financial_excerpts: extract -> chunk -> embed -> store.
+
+Replaces running /scan-pdfs/, insert_data_in_table.py, split_long_text.py and
+generate_embeddings_for_text.py by hand. Nothing is written to output/content or re-read from Postgres:
+- Pages come straight from page_extraction.py, the API's extractors (any backend/mode)
+- Each stage runs in its own thread, connected by bounded queues, so extraction, tokenizing,
+  encoding and DB writes overlap and a slow stage holds the others back instead of piling up memory
+- Chunks follow split_long_text.py (token-aware, with lineage in financial_excerpt_sources and the
+  same chunker tag), so that script treats ingested rows as done; rows are stored with their embedding
+- A page's row carries insert_data_in_table.py's key (company, filename, excerpt_index), so re-running
+  skips pages already stored instead of duplicating them; --replace deletes the company's rows first
+- Each write batch is committed; the report lists items and items/sec of busy time per stage
+- Encoding goes through embedding_server.py when it is running, so no model load per run
+
+Usage:
+    python rag-report_gen/ingest_pipeline.py --company VBL-2023 --source split_pdfs/files/VBL-2023/
+    python rag-report_gen/ingest_pipeline.py --company tata-motor --source files/tata-motor.pdf --replace
+API: POST /jobs/ingest/?company=VBL-2023&source=split_pdfs/files/VBL-2023/
+"""
+
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+import psycopg2
+from psycopg2.extras import execute_values
+from pgvector.psycopg2 import register_vector
+
+import insert_data_in_table as loader
+import split_long_text as chunking
+from generate_embeddings_for_text import DB_CONFIG, MODEL_NAME, TABLE_NAME, embed_passages
+
+# Repo root: embedding_client, and page_extraction for the CLI's page source
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from embedding_client import EmbeddingClient  # noqa: E402
+
+# Batches in flight between two stages
+QUEUE_SIZE = 4
+# Pages per batch; one tokenizer call, one encode call and one commit each
+PAGE_BATCH = 32
+EMBED_BATCH_SIZE = 64
+
+
+class Stage:
+    def __init__(self, name: str, unit: str):
+        self.name = name
+        self.unit = unit
+        self.items = 0
+        self.busy_seconds = 0.0
+
+    def report(self) -> dict:
+        return {
+            self.unit: self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            f"{self.unit}_per_sec": round(self.items / self.busy_seconds, 2) if self.busy_seconds else None,
+        }
+
+
+class IngestPipeline:
+    def __init__(self, model_name: str = MODEL_NAME, max_tokens: int | None = None,
+                 overlap: int = chunking.OVERLAP_TOKENS, embed_batch_size: int = EMBED_BATCH_SIZE):
+        # The model itself stays warm in embedding_server.py; only the tokenizer is loaded here
+        self.model = EmbeddingClient(model_name)
+        self.tokenizer = self.model.tokenizer
+        self.max_tokens = max_tokens or chunking.default_max_tokens(self.tokenizer)
+        self.overlap = overlap
+        self.embed_batch_size = embed_batch_size
+        self.chunker = f"{model_name}:{self.max_tokens}/{overlap}/v1"
+
+    def run(self, company: str, pages, total_pages: int | None = None, replace: bool = False, progress=None) -> dict:
+        """
+        Ingest (filename, page text) pairs for a company. replace=True first deletes the company's
+        existing excerpts, otherwise pages already stored are skipped. progress(done, total) is called with pages done,
+        stored or skipped as blank, so it ends at total_pages.
+        """
+        stages = {name: Stage(name, unit) for name, unit in
+                  (("extract", "pages"), ("chunk", "pages"), ("embed", "chunks"), ("write", "rows"))}
+        stopped = threading.Event()
+        errors = []
+        page_batches = queue.Queue(maxsize=QUEUE_SIZE)
+        chunk_batches = queue.Queue(maxsize=QUEUE_SIZE)
+        embedded_batches = queue.Queue(maxsize=QUEUE_SIZE)
+        finished = object()
+
+        def offer(out, item) -> bool:
+            # Give up once another stage failed instead of blocking on a queue nobody reads
+            while not stopped.is_set():
+                try:
+                    out.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def take(source):
+            while not stopped.is_set():
+                try:
+                    return source.get(timeout=0.5)
+                except queue.Empty:
+                    continue
+            return finished
+
+        def run_stage(body, out):
+            try:
+                body()
+            except Exception as e:
+                errors.append(e)
+                stopped.set()
+            finally:
+                offer(out, finished)
+
+        # Batches travel as (pages seen, pages kept): blank pages are dropped but still counted as done
+        def extract():
+            stage = stages["extract"]
+            seen, batch = 0, []
+            # excerpt_index counts the kept pages of a file, as insert_data_in_table.py counts its excerpts
+            indexes = {}
+            iterator = iter(pages)
+            while True:
+                started = time.perf_counter()
+                page = next(iterator, None)
+                stage.busy_seconds += time.perf_counter() - started
+                if page is not None:
+                    filename, text = page
+                    text = text.strip().replace("\n\n", "\n")
+                    stage.items += 1
+                    seen += 1
+                    if text:
+                        batch.append((filename, indexes.get(filename, 0), text))
+                        indexes[filename] = indexes.get(filename, 0) + 1
+                if seen and (page is None or len(batch) >= PAGE_BATCH):
+                    if not offer(page_batches, (seen, batch)):
+                        return
+                    seen, batch = 0, []
+                if page is None:
+                    return
+
+        def chunk():
+            stage = stages["chunk"]
+            while (item := take(page_batches)) is not finished:
+                seen, batch = item
+                started = time.perf_counter()
+                chunks = chunking.chunk_texts([text for _, _, text in batch], self.tokenizer, self.max_tokens, self.overlap)
+                stage.busy_seconds += time.perf_counter() - started
+                stage.items += len(batch)
+                # A page that fits in one chunk is stored as is, like split_long_text.py leaves such rows;
+                # chunk_texts would hand back its sentences re-joined
+                kept = [(f, i, t, c if len(c) > 1 else [t]) for (f, i, t), c in zip(batch, chunks) if c]
+                if not offer(chunk_batches, (seen, kept)):
+                    return
+
+        def embed():
+            stage = stages["embed"]
+            while (item := take(chunk_batches)) is not finished:
+                seen, batch = item
+                flat = [c for _, _, _, page_chunks in batch for c in page_chunks]
+                started = time.perf_counter()
+                vectors = embed_passages(self.model, flat, self.embed_batch_size) if flat else []
+                stage.busy_seconds += time.perf_counter() - started
+                stage.items += len(flat)
+                embedded, start = [], 0
+                for filename, index, text, page_chunks in batch:
+                    embedded.append((filename, index, text, page_chunks, vectors[start:start + len(page_chunks)]))
+                    start += len(page_chunks)
+                if not offer(embedded_batches, (seen, embedded)):
+                    return
+
+        conn = psycopg2.connect(**DB_CONFIG)
+        chunking.ensure_schema(conn)
+        loader.ensure_schema(conn, TABLE_NAME)
+        register_vector(conn)
+        if replace:
+            delete_company(conn, company)
+
+        threads = [
+            threading.Thread(target=run_stage, args=(extract, page_batches), name="ingest-extract", daemon=True),
+            threading.Thread(target=run_stage, args=(chunk, chunk_batches), name="ingest-chunk", daemon=True),
+            threading.Thread(target=run_stage, args=(embed, embedded_batches), name="ingest-embed", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        started = time.perf_counter()
+        pages_done = pages_stored = 0
+        try:
+            write = stages["write"]
+            while (item := take(embedded_batches)) is not finished:
+                seen, batch = item
+                if batch:
+                    write_started = time.perf_counter()
+                    stored, rows = write_pages(conn, company, batch, self.chunker)
+                    write.items += rows
+                    write.busy_seconds += time.perf_counter() - write_started
+                    pages_stored += stored
+                pages_done += seen
+                if progress:
+                    progress(pages_done, total_pages)
+        except Exception:
+            stopped.set()
+            raise
+        finally:
+            for thread in threads:
+                thread.join()
+            conn.close()
+        if errors:
+            raise errors[0]
+
+        return {
+            "company": company,
+            "chunker": self.chunker,
+            "pages": stages["extract"].items,
+            "pages_stored": pages_stored,
+            "rows": stages["write"].items,
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+            "stages": {name: stage.report() for name, stage in stages.items()},
+        }
+
+
+def delete_company(conn, company: str):
+    """
+    insert_data_in_table.py's delete_company, plus the page texts of the company's split excerpts.
+    """
+    with conn.cursor() as cur:
+        removed = loader.delete_company(cur, company, TABLE_NAME)
+        cur.execute(f"DELETE FROM {chunking.SOURCES_TABLE} WHERE filename ~ %s",
+                    (loader.company_filename_pattern(company),))
+        print(f"🗑️ Removed {removed} earlier excerpts of {company}")
+    conn.commit()
+
+
+def write_pages(conn, company: str, batch, chunker) -> tuple[int, int]:
+    """
+    Store (filename, excerpt_index, page text, chunks, embeddings) pages with split_long_text.py's lineage:
+    chunk 0 is the page's row, keyed by (company, filename, excerpt_index) like insert_data_in_table.py,
+    further chunks point at the page text in the sources table. Pages already stored are skipped.
+    Returns (pages stored, rows written).
+    """
+    with conn.cursor() as cur:
+        # Skipped pages return nothing, so rows are matched back to pages by their key
+        first_ids = {(filename, index): row_id for row_id, filename, index in execute_values(
+            cur, f"INSERT INTO {TABLE_NAME} (company, filename, excerpt_index, excerpt, embedding, chunker) VALUES %s "
+                 f"ON CONFLICT {loader.CONFLICT_TARGET} DO NOTHING RETURNING id, filename, excerpt_index",
+            [(company, filename, index, chunks[0], vectors[0], chunker) for filename, index, _, chunks, vectors in batch],
+            template="(%s, %s, %s, %s, %s::vector, %s)", page_size=len(batch), fetch=True)}
+
+        stored = [(first_ids[page[:2]], page) for page in batch if page[:2] in first_ids]
+        split = [(row_id, page) for row_id, page in stored if len(page[3]) > 1]
+        if split:
+            source_ids = dict(execute_values(
+                cur, f"INSERT INTO {chunking.SOURCES_TABLE} (excerpt_id, filename, excerpt) VALUES %s RETURNING excerpt_id, id",
+                [(row_id, filename, text) for row_id, (filename, _, text, _, _) in split], fetch=True))
+            execute_values(cur, f"""
+                UPDATE {TABLE_NAME} AS t SET source_id = data.source_id, chunk_index = 0
+                FROM (VALUES %s) AS data (id, source_id) WHERE t.id = data.id
+            """, [(row_id, source_ids[row_id]) for row_id, _ in split])
+            execute_values(
+                cur, f"INSERT INTO {TABLE_NAME} (company, filename, excerpt, embedding, chunker, source_id, chunk_index) VALUES %s",
+                [(company, filename, chunk, vectors[i], chunker, source_ids[row_id], i)
+                 for row_id, (filename, _, _, chunks, vectors) in split for i, chunk in enumerate(chunks) if i > 0],
+                template="(%s, %s, %s, %s::vector, %s, %s, %s)", page_size=1000)
+    conn.commit()
+    return len(stored), len(stored) + sum(len(page[3]) - 1 for _, page in split)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract, chunk, embed and store a company's report in one pass.")
+    parser.add_argument("--company", required=True, help="Company name; excerpts are stored as <company>N.txt")
+    parser.add_argument("--source", required=True, help="PDF file, or a directory of PDFs / split parts")
+    parser.add_argument("--extractor", default="pypdf2", help="Extractor backend (pypdf2, tesseract, docling)")
+    parser.add_argument("--mode", default="text", choices=("text", "hybrid"))
+    parser.add_argument("--workers", type=int, default=None, help="Extraction workers (defaults to PDF_EXTRACT_WORKERS)")
+    parser.add_argument("--replace", action="store_true", help="Delete the company's existing excerpts first")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--max-tokens", type=int, default=None)
+    parser.add_argument("--overlap", type=int, default=chunking.OVERLAP_TOKENS)
+    parser.add_argument("--embed-batch-size", type=int, default=EMBED_BATCH_SIZE)
+    args = parser.parse_args()
+
+    import page_extraction
+
+    pages, total_pages = page_extraction.ingest_pages(args.source, args.company, args.workers, args.mode, args.extractor)
+    pipeline = IngestPipeline(args.model, args.max_tokens, args.overlap, args.embed_batch_size)
+    result = pipeline.run(args.company, pages, total_pages, args.replace,
+                          progress=lambda done, total: print(f"  ✅ {done}/{total} pages done"))
+    print(f"🎯 {result['company']}: {result['pages']} pages -> {result['rows']} excerpts in {result['elapsed_seconds']}s")
+    for name, stage in result["stages"].items():
+        print(f"  {name:<8} {stage}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,31 @@
+"""
+Load scanned text files (output/content/<company>/*.txt) into financial_excerpts, one row per
+excerpt between ---||--- delimiters.
+
+- Files are read line by line and excerpts are streamed straight into the database,
+  so no file is ever held in memory whole
+- --method copy (default) uses COPY ... FROM STDIN, --method values batched execute_values,
+  --method rows the old one INSERT per excerpt (kept as the benchmark baseline)
+- One transaction per file, as before, so a failed file does not leave half its excerpts behind
+- Re-runs do not duplicate: every row records (company, filename, excerpt_index), which is unique,
+  and excerpts already loaded are skipped (ON CONFLICT DO NOTHING; COPY goes through a staging table)
+- --replace deletes the company's rows (in the same transaction) before loading them again,
+  e.g. after a re-scan or for rows loaded before excerpt_index existed
+
+Usage:
+    python rag-report_gen/insert_data_in_table.py --company Lg-el
+    python rag-report_gen/insert_data_in_table.py --input-dir output/content --company VBL-2023 --company tata-motor
+    python rag-report_gen/insert_data_in_table.py --all      # every company directory under --input-dir
+"""
+
+import argparse
+import itertools
 import os
+import re
+import time
+
 import psycopg2
+from psycopg2.extras import execute_values
 
 # ====== CONFIGURATION ======
 DB_CONFIG = {
@@ -10,10 +36,15 @@ DB_CONFIG = {
     "port": "5432"
 }
 
-# make this dynamic as per your needs
-INPUT_DIR = "output/content/Lg-el"
+INPUT_DIR = "output/content"
 DELIMITER = "---||---"
 TABLE_NAME = "financial_excerpts"
+# Staging table for COPY, so conflicts can be skipped on the way into TABLE_NAME
+STAGE_TABLE = "financial_excerpts_stage"
+CONFLICT_TARGET = "(company, filename, excerpt_index) WHERE excerpt_index IS NOT NULL"
+# Rows per execute_values statement (--method values)
+VALUES_PAGE_SIZE = 1000
+
 
 # ====== CONNECT TO DATABASE ======
 def get_connection():
@@ -25,39 +56,197 @@ def get_connection():
         print("❌ Database connection failed:", e)
         exit(1)
 
-# ====== INSERT FUNCTION ======
-def insert_excerpt(cursor, filename, excerpt_text):
-    query = f"""
-        INSERT INTO {TABLE_NAME} (filename, excerpt)
-        VALUES (%s, %s);
+
+def ensure_schema(conn, table=TABLE_NAME):
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            ALTER TABLE {table} ADD COLUMN IF NOT EXISTS company TEXT;
+            ALTER TABLE {table} ADD COLUMN IF NOT EXISTS excerpt_index INTEGER;
+            CREATE UNIQUE INDEX IF NOT EXISTS {table}_source_key ON {table} {CONFLICT_TARGET};
+        """)
+    conn.commit()
+
+
+# ====== READING ======
+def iter_excerpts(file_path):
+    """
+    Yield the stripped, non-empty excerpts of a text file, reading it line by line.
+    Same result as splitting the whole content on DELIMITER.
     """
-    cursor.execute(query, (filename, excerpt_text))
+    current = []
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            if DELIMITER not in line:
+                current.append(line)
+                continue
+            *complete, rest = line.split(DELIMITER)
+            for piece in complete:
+                current.append(piece)
+                excerpt = "".join(current).strip()
+                if excerpt:
+                    yield excerpt
+                current = []
+            current.append(rest)
+    excerpt = "".join(current).strip()
+    if excerpt:
+        yield excerpt
 
-# ====== MAIN SCRIPT ======
-def main():
-    conn = get_connection()
-    cursor = conn.cursor()
 
-    for filename in os.listdir(INPUT_DIR):
-        if not filename.endswith(".txt"):
+def list_text_files(input_dir, companies=None):
+    """
+    (company, filename, path) for every .txt file of the given company directories
+    (all directories under input_dir when none are given), in name order.
+    """
+    companies = companies or sorted(d for d in os.listdir(input_dir) if os.path.isdir(os.path.join(input_dir, d)))
+    files = []
+    for company in companies:
+        company_dir = os.path.join(input_dir, company)
+        if not os.path.isdir(company_dir):
+            print(f"⚠️ No directory for {company}: {company_dir}")
             continue
+        for filename in sorted(os.listdir(company_dir)):
+            if filename.endswith(".txt"):
+                files.append((company, filename, os.path.join(company_dir, filename)))
+    return files
+
+
+# ====== WRITING ======
+def copy_escape(value):
+    # COPY text format: backslash escapes for the characters that delimit fields and rows; NUL is not allowed
+    return (value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+            .replace("\r", "\\r").replace("\x00", ""))
+
+
+class CopyStream:
+    """
+    File-like object over an iterator of str rows, for cursor.copy_expert; only holds one buffer's worth.
+    """
+    def __init__(self, rows):
+        self.rows = rows
+        self.buffer = bytearray()
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            self.buffer += row.encode("utf-8")
+        size = len(self.buffer) if size < 0 else size
+        chunk = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return chunk
+
 
-        file_path = os.path.join(INPUT_DIR, filename)
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
+# Each insert method returns the number of excerpts actually added; ones already loaded are skipped
+def insert_copy(cursor, company, filename, excerpts, table=TABLE_NAME):
+    def rows():
+        for index, excerpt in enumerate(excerpts):
+            yield f"{copy_escape(company)}\t{copy_escape(filename)}\t{index}\t{copy_escape(excerpt)}\n"
 
-        excerpts = [chunk.strip() for chunk in content.split(DELIMITER) if chunk.strip()]
-        print(f"📄 Processing {filename}: found {len(excerpts)} excerpts")
+    cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS {STAGE_TABLE} "
+                   f"(company TEXT, filename TEXT, excerpt_index INTEGER, excerpt TEXT) ON COMMIT DELETE ROWS")
+    cursor.copy_expert(f"COPY {STAGE_TABLE} (company, filename, excerpt_index, excerpt) FROM STDIN WITH (FORMAT text)",
+                       CopyStream(rows()))
+    cursor.execute(f"INSERT INTO {table} (company, filename, excerpt_index, excerpt) "
+                   f"SELECT company, filename, excerpt_index, excerpt FROM {STAGE_TABLE} "
+                   f"ON CONFLICT {CONFLICT_TARGET} DO NOTHING")
+    inserted = cursor.rowcount
+    cursor.execute(f"TRUNCATE {STAGE_TABLE}")
+    return inserted
 
-        for excerpt in excerpts:
-            insert_excerpt(cursor, filename, excerpt)
 
-        conn.commit()
-        print(f"✅ Inserted {len(excerpts)} excerpts from {filename}")
+def insert_values(cursor, company, filename, excerpts, table=TABLE_NAME):
+    total = 0
+    excerpts = enumerate(excerpts)
+    while batch := list(itertools.islice(excerpts, VALUES_PAGE_SIZE)):
+        inserted = execute_values(
+            cursor, f"INSERT INTO {table} (company, filename, excerpt_index, excerpt) VALUES %s "
+                    f"ON CONFLICT {CONFLICT_TARGET} DO NOTHING RETURNING id",
+            [(company, filename, index, excerpt) for index, excerpt in batch], page_size=VALUES_PAGE_SIZE, fetch=True)
+        total += len(inserted)
+    return total
+
+
+def insert_rows(cursor, company, filename, excerpts, table=TABLE_NAME):
+    total = 0
+    for index, excerpt in enumerate(excerpts):
+        cursor.execute(f"INSERT INTO {table} (company, filename, excerpt_index, excerpt) VALUES (%s, %s, %s, %s) "
+                       f"ON CONFLICT {CONFLICT_TARGET} DO NOTHING;", (company, filename, index, excerpt))
+        total += cursor.rowcount
+    return total
+
+
+INSERT_METHODS = {"copy": insert_copy, "values": insert_values, "rows": insert_rows}
+
+
+def company_filename_pattern(company):
+    # <company>N.txt, as written by /scan-pdfs/; "VBL" must not match "VBL-2023"
+    return "^" + re.escape(company) + r"[0-9]+\.txt$"
+
+
+def delete_company(cursor, company, table=TABLE_NAME):
+    """
+    Remove a company's excerpts: rows tagged with it, and untagged rows loaded before
+    excerpt_index existed. Not committed; load_files commits it together with the first file.
+    """
+    cursor.execute(f"DELETE FROM {table} WHERE company = %s OR (company IS NULL AND filename ~ %s)",
+                   (company, company_filename_pattern(company)))
+    return cursor.rowcount
+
+
+def load_files(conn, files, method="copy", table=TABLE_NAME, replace=False):
+    """
+    Insert the excerpts of every (company, filename, path), committing per file. Returns the row count.
+    replace=True deletes each company's existing rows in the transaction of its first file.
+    """
+    insert = INSERT_METHODS[method]
+    total = 0
+    replaced = set()
+    with conn.cursor() as cursor:
+        for company, filename, path in files:
+            try:
+                if replace and company not in replaced:
+                    print(f"🗑️ Removed {delete_company(cursor, company, table)} earlier excerpts of {company}")
+                    replaced.add(company)
+                inserted = insert(cursor, company, filename, iter_excerpts(path), table)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                replaced.discard(company)
+                print(f"❌ {company}/{filename}: {e}")
+                continue
+            total += inserted
+            print(f"✅ Inserted {inserted} excerpts from {company}/{filename}")
+    return total
+
+
+# ====== MAIN SCRIPT ======
+def main():
+    parser = argparse.ArgumentParser(description="Load scanned text files into financial_excerpts.")
+    parser.add_argument("--input-dir", default=INPUT_DIR, help="Directory holding one sub-directory per company")
+    which = parser.add_mutually_exclusive_group(required=True)
+    which.add_argument("--company", action="append", help="Company directory to load (repeatable)")
+    which.add_argument("--all", action="store_true", help="Load every company directory under --input-dir")
+    parser.add_argument("--method", choices=sorted(INSERT_METHODS), default="copy")
+    parser.add_argument("--replace", action="store_true", help="Delete each company's existing excerpts before loading")
+    args = parser.parse_args()
+
+    files = list_text_files(args.input_dir, args.company)
+    if not files:
+        print(f"No .txt files found under {args.input_dir}")
+        return
+
+    conn = get_connection()
+    ensure_schema(conn)
+    started = time.perf_counter()
+    try:
+        total = load_files(conn, files, args.method, replace=args.replace)
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - started
+    print(f"🎯 {total} excerpts from {len(files)} files in {elapsed:.2f}s "
+          f"({total / elapsed if elapsed else 0:.0f} rows/sec, method={args.method})")
 
-    cursor.close()
-    conn.close()
-    print("🎯 All files processed successfully!")
 
 if __name__ == "__main__":
     main()
@@ -1,10 +1,15 @@
+import os
+import sys
+
 import psycopg2
-from sentence_transformers import SentenceTransformer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from embedding_client import EmbeddingClient  # noqa: E402
 
 # This will only run once to generate embeddings for questions
 
-# Load a free open-source embedding model (you can swap with others below)
-model = SentenceTransformer("intfloat/e5-large-v2")
+# Free open-source embedding model (you can swap with others below), served warm by embedding_server.py
+model = EmbeddingClient("intfloat/e5-large-v2")
 # Other good free models:
 # "all-MiniLM-L6-v2"
 # "nomic-ai/nomic-embed-text-v1.5"
@@ -18,13 +23,12 @@ cur = conn.cursor()
 cur.execute("SELECT id, question FROM rag_questions WHERE embedding IS NULL;")
 rows = cur.fetchall()
 
-for id, question in rows:
-    # For E5 models, prepend "query:" for better embedding performance
-    text = f"query: {question}"
-    embedding = model.encode(text).tolist()
-    
+# For E5 models, prepend "query:" for better embedding performance; all questions go in one batch
+embeddings = model.encode([f"query: {question}" for _, question in rows], batch_size=64)
+
+for (id, _), embedding in zip(rows, embeddings):
     # Update the embedding column (VECTOR type expects list of floats)
-    cur.execute("UPDATE rag_questions SET embedding = %s WHERE id = %s;", (embedding, id))
+    cur.execute("UPDATE rag_questions SET embedding = %s WHERE id = %s;", (embedding.tolist(), id))
 
 # Commit changes
 conn.commit()
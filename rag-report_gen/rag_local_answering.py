@@ -3,19 +3,22 @@ RAG: retrieve relevant excerpts from Postgres (pgvector) and answer questions us
 
 Requires:
 - psycopg2-binary
-- sentence-transformers
+- sentence-transformers (or a running embedding_server.py)
 - pgvector
 - transformers (or llama-cpp-python if using that backend)
 - torch / accelerate (for HF)
 """
 
 import os
+import sys
 import time
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from pgvector.psycopg2 import register_vector
-from sentence_transformers import SentenceTransformer
 from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from embedding_client import EmbeddingClient  # noqa: E402
 # -------------------------
 # CONFIG
 # -------------------------
@@ -133,8 +136,8 @@ def build_prompt(question_text, retrieved_passages):
 # -------------------------
 # Embedding model
 # -------------------------
-print("Loading embedding model...")
-embed_model = SentenceTransformer(EMBED_MODEL_NAME)
+# Served warm by embedding_server.py; falls back to loading it here if the server is not running
+embed_model = EmbeddingClient(EMBED_MODEL_NAME)
 
 # -------------------------
 # LLM setup (HF or llama_cpp)
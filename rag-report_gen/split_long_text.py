@@ -1,5 +1,30 @@
+"""
+Re-chunk financial_excerpts so every excerpt fits the embedding model.
+
+- Lengths are measured in tokens of the embedding model's tokenizer, not words; chunks are packed
+  from whole sentences (long sentences are cut on token boundaries) with a token overlap between chunks
+- Only rows not yet chunked with the current settings are read, through a server-side cursor,
+  in batches; each batch is tokenized in one call and written back with bulk statements
+- Lineage: a split excerpt's original text is kept in financial_excerpt_sources. Its first chunk
+  stays in the original row (same id), the rest are new rows, all pointing at the source with
+  source_id/chunk_index. Every row handled records the settings in `chunker`, so re-running is a
+  no-op, and changing --max-tokens/--overlap re-chunks from the original text instead of chunks of chunks
+- Rows whose text changes get embedding = NULL, so generate_embeddings_for_text.py picks them up
+
+Usage:
+    python rag-report_gen/split_long_text.py
+    python rag-report_gen/split_long_text.py --max-tokens 256 --overlap 32 --company Lg-el
+"""
+
+import argparse
+import re
+import time
+
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import execute_values
+from transformers import AutoTokenizer
+
+from insert_data_in_table import company_filename_pattern
 
 # Database connection setup
 DB_NAME = "jkinda_stocks"
@@ -10,69 +35,229 @@ DB_PORT = "5432"
 
 # Table and column names
 TABLE_NAME = "financial_excerpts"
+SOURCES_TABLE = "financial_excerpt_sources"
 TEXT_COLUMN = "excerpt"
 FILENAME_COLUMN = "filename"
-MAX_WORDS = 400
 
+# Same model as generate_embeddings_for_text.py; its tokenizer decides what fits
+MODEL_NAME = "intfloat/e5-large-v2"
+# Prepended to every excerpt before embedding, so it counts against the limit
+EMBED_PREFIX = "passage: "
+OVERLAP_TOKENS = 50
+# Rows read, chunked and committed together
+BATCH_SIZE = 500
 
-def split_text_into_chunks(text, max_words=MAX_WORDS):
-    """Split text into smaller chunks with at most `max_words` words."""
-    words = text.split()
-    return [
-        " ".join(words[i:i + max_words])
-        for i in range(0, len(words), max_words)
-    ]
+SENTENCE_RE = re.compile(r"(?<=[.!?;])\s+|\n+")
 
 
-def main():
-    conn = psycopg2.connect(
+def connect():
+    return psycopg2.connect(
         dbname=DB_NAME,
         user=DB_USER,
         password=DB_PASSWORD,
         host=DB_HOST,
         port=DB_PORT
     )
-    cur = conn.cursor(cursor_factory=RealDictCursor)
 
-    # Fetch all excerpts and filenames
-    cur.execute(f"SELECT id, {TEXT_COLUMN}, {FILENAME_COLUMN} FROM {TABLE_NAME};")
-    rows = cur.fetchall()
 
-    for row in rows:
-        excerpt_id = row["id"]
-        excerpt = row[TEXT_COLUMN]
-        filename = row.get(FILENAME_COLUMN)
+def ensure_schema(conn):
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {SOURCES_TABLE} (
+                id SERIAL PRIMARY KEY,
+                excerpt_id INTEGER UNIQUE NOT NULL,
+                {FILENAME_COLUMN} TEXT,
+                {TEXT_COLUMN} TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT now()
+            );
+            ALTER TABLE {TABLE_NAME} ADD COLUMN IF NOT EXISTS source_id INTEGER REFERENCES {SOURCES_TABLE} (id);
+            ALTER TABLE {TABLE_NAME} ADD COLUMN IF NOT EXISTS chunk_index INTEGER;
+            ALTER TABLE {TABLE_NAME} ADD COLUMN IF NOT EXISTS chunker TEXT;
+            CREATE INDEX IF NOT EXISTS {TABLE_NAME}_source_id ON {TABLE_NAME} (source_id);
+        """)
+    conn.commit()
+
+
+def default_max_tokens(tokenizer):
+    # Room for [CLS]/[SEP] and the embedding prefix; some tokenizers report a huge model_max_length
+    limit = min(tokenizer.model_max_length, 512)
+    return limit - tokenizer.num_special_tokens_to_add() - len(tokenizer(EMBED_PREFIX, add_special_tokens=False)["input_ids"])
+
+
+def split_long_sentence(sentence, tokenizer, max_tokens, overlap):
+    """
+    Cut a sentence longer than max_tokens into overlapping token windows, as (text, tokens) pieces.
+    """
+    offsets = tokenizer(sentence, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+    step = max(1, max_tokens - overlap)
+    pieces = []
+    for start in range(0, len(offsets), step):
+        end = min(start + max_tokens, len(offsets))
+        pieces.append((sentence[offsets[start][0]:offsets[end - 1][1]], end - start))
+        if end == len(offsets):
+            break
+    return pieces
+
+
+def pack_chunks(pieces, max_tokens, overlap):
+    """
+    Greedily pack (text, tokens) pieces into chunks of at most max_tokens, repeating up to
+    `overlap` tokens of trailing pieces at the start of the next chunk.
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    for piece, tokens in pieces:
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(text for text, _ in current))
+            carry, carried = [], 0
+            for text, count in reversed(current):
+                if carried + count > overlap:
+                    break
+                carry.insert(0, (text, count))
+                carried += count
+            if carried + tokens > max_tokens:
+                carry, carried = [], 0
+            current, current_tokens = carry, carried
+        current.append((piece, tokens))
+        current_tokens += tokens
+    if current:
+        chunks.append(" ".join(text for text, _ in current))
+    return chunks
 
-        if not excerpt or not isinstance(excerpt, str):
-            continue
 
-        words = excerpt.split()
-        word_count = len(words)
+def chunk_texts(texts, tokenizer, max_tokens, overlap):
+    """
+    Chunks for every text; sentences of all texts are tokenized in a single call.
+    """
+    sentences = [[s.strip() for s in SENTENCE_RE.split(text) if s.strip()] for text in texts]
+    flat = [s for text_sentences in sentences for s in text_sentences]
+    counts = iter(len(ids) for ids in tokenizer(flat, add_special_tokens=False)["input_ids"]) if flat else iter(())
 
-        if word_count <= MAX_WORDS:
-            continue  # Already short enough
+    result = []
+    for text_sentences in sentences:
+        pieces = []
+        for sentence in text_sentences:
+            tokens = next(counts)
+            if tokens <= max_tokens:
+                pieces.append((sentence, tokens))
+            else:
+                pieces.extend(split_long_sentence(sentence, tokenizer, max_tokens, overlap))
+        result.append(pack_chunks(pieces, max_tokens, overlap))
+    return result
 
-        # Split into smaller chunks
-        chunks = split_text_into_chunks(excerpt, MAX_WORDS)
-        print(f"Splitting ID {excerpt_id} ({filename}) into {len(chunks)} chunks ({word_count} words total).")
 
-        # Update the first record with the first chunk
-        cur.execute(
-            f"UPDATE {TABLE_NAME} SET {TEXT_COLUMN} = %s WHERE id = %s;",
-            (chunks[0], excerpt_id)
-        )
+def fetch_unchunked(conn, chunker, batch_size, company=None):
+    """
+    Yield batches of (id, text, filename, source_id) for excerpts not chunked with `chunker`.
+    A split excerpt is read once, through its first chunk, with its original text.
+    """
+    query = f"""
+        SELECT e.id, COALESCE(s.{TEXT_COLUMN}, e.{TEXT_COLUMN}), e.{FILENAME_COLUMN}, e.source_id
+        FROM {TABLE_NAME} e LEFT JOIN {SOURCES_TABLE} s ON s.id = e.source_id
+        WHERE e.chunker IS DISTINCT FROM %s AND (e.source_id IS NULL OR e.chunk_index = 0)
+    """
+    params = [chunker]
+    if company:
+        query += f" AND e.{FILENAME_COLUMN} ~ %s"
+        params.append(company_filename_pattern(company))
+    with conn.cursor(name="rechunk") as cur:
+        cur.itersize = batch_size
+        cur.execute(query + " ORDER BY e.id", params)
+        while rows := cur.fetchmany(batch_size):
+            yield rows
 
-        # Insert remaining chunks as new records, preserving filename
-        for chunk in chunks[1:]:
-            cur.execute(
-                f"INSERT INTO {TABLE_NAME} ({TEXT_COLUMN}, {FILENAME_COLUMN}) VALUES (%s, %s);",
-                (chunk, filename)
-            )
 
+def write_batch(conn, rows, chunks, chunker):
+    """
+    Apply one batch of chunking results with bulk statements and commit.
+    """
+    marked = []      # ids of rows that already fit
+    restored = []    # previously split rows that fit again with the current settings
+    splits = []      # (row, chunks) for rows stored as several chunks
+    for row, row_chunks in zip(rows, chunks):
+        if len(row_chunks) > 1:
+            splits.append((row, row_chunks))
+        elif row[3]:
+            restored.append(row)
+        else:
+            marked.append(row[0])
+
+    with conn.cursor() as cur:
+        if marked:
+            cur.execute(f"UPDATE {TABLE_NAME} SET chunker = %s WHERE id = ANY(%s)", (chunker, marked))
+
+        # Chunks from an earlier run go; the first chunk's row is reused
+        old_sources = [row[3] for row in restored] + [row[3] for row, _ in splits if row[3]]
+        if old_sources:
+            cur.execute(f"DELETE FROM {TABLE_NAME} WHERE source_id = ANY(%s) AND chunk_index > 0", (old_sources,))
+
+        if restored:
+            execute_values(cur, f"""
+                UPDATE {TABLE_NAME} AS t SET {TEXT_COLUMN} = data.text, source_id = NULL, chunk_index = NULL,
+                    chunker = data.chunker, embedding = NULL
+                FROM (VALUES %s) AS data (id, text, chunker) WHERE t.id = data.id
+            """, [(row[0], row[1], chunker) for row in restored])
+            cur.execute(f"DELETE FROM {SOURCES_TABLE} WHERE id = ANY(%s)", ([row[3] for row in restored],))
+
+        source_ids = {row[0]: row[3] for row, _ in splits if row[3]}
+        new_sources = [(row[0], row[2], row[1]) for row, _ in splits if not row[3]]
+        if new_sources:
+            inserted = execute_values(
+                cur, f"INSERT INTO {SOURCES_TABLE} (excerpt_id, {FILENAME_COLUMN}, {TEXT_COLUMN}) VALUES %s "
+                     f"ON CONFLICT (excerpt_id) DO UPDATE SET {TEXT_COLUMN} = EXCLUDED.{TEXT_COLUMN} RETURNING excerpt_id, id",
+                new_sources, fetch=True)
+            source_ids.update(dict(inserted))
+
+        if splits:
+            execute_values(cur, f"""
+                UPDATE {TABLE_NAME} AS t SET {TEXT_COLUMN} = data.text, source_id = data.source_id, chunk_index = 0,
+                    chunker = data.chunker, embedding = NULL
+                FROM (VALUES %s) AS data (id, text, source_id, chunker) WHERE t.id = data.id
+            """, [(row[0], row_chunks[0], source_ids[row[0]], chunker) for row, row_chunks in splits])
+            execute_values(
+                cur, f"INSERT INTO {TABLE_NAME} ({TEXT_COLUMN}, {FILENAME_COLUMN}, source_id, chunk_index, chunker) VALUES %s",
+                [(chunk, row[2], source_ids[row[0]], i, chunker)
+                 for row, row_chunks in splits for i, chunk in enumerate(row_chunks) if i > 0],
+                page_size=1000)
     conn.commit()
-    cur.close()
-    conn.close()
-    print("✅ Long excerpts split and updated successfully (filenames preserved).")
+    return {"unchanged": len(marked), "restored": len(restored), "split": len(splits),
+            "chunks": sum(len(row_chunks) for _, row_chunks in splits)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token-aware re-chunking of financial_excerpts.")
+    parser.add_argument("--model", default=MODEL_NAME, help="Embedding model whose tokenizer measures chunks")
+    parser.add_argument("--max-tokens", type=int, default=None, help="Tokens per chunk (default: what the model takes)")
+    parser.add_argument("--overlap", type=int, default=OVERLAP_TOKENS, help="Tokens repeated between consecutive chunks")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows per read/commit")
+    parser.add_argument("--company", help="Only this company's excerpts (<company>N.txt)")
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    max_tokens = args.max_tokens or default_max_tokens(tokenizer)
+    chunker = f"{args.model}:{max_tokens}/{args.overlap}/v1"
+
+    # Reads and writes on separate connections: committing a batch must not close the read cursor
+    read_conn = connect()
+    write_conn = connect()
+    ensure_schema(write_conn)
+
+    totals = {"unchanged": 0, "restored": 0, "split": 0, "chunks": 0}
+    done = 0
+    started = time.perf_counter()
+    try:
+        for rows in fetch_unchunked(read_conn, chunker, args.batch_size, args.company):
+            chunks = chunk_texts([row[1] or "" for row in rows], tokenizer, max_tokens, args.overlap)
+            for key, value in write_batch(write_conn, rows, chunks, chunker).items():
+                totals[key] += value
+            done += len(rows)
+            print(f"  ✅ {done} excerpts checked, {totals['split']} split into {totals['chunks']} chunks "
+                  f"({done / (time.perf_counter() - started):.0f} rows/sec)")
+    finally:
+        read_conn.close()
+        write_conn.close()
+
+    print(f"✅ Re-chunked with {chunker}: {totals}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,127 @@
+"""
+In-process cache for the JSON company reports served by /company-report/.
+
+- Entries are keyed by file path and validated against (mtime, size) on every request,
+  so a regenerated report is picked up right away and an unchanged one is never re-read
+- Each entry holds the response body exactly as JSONResponse would render it,
+  a pre-gzipped copy and a strong ETag derived from the body
+- Least recently used reports are dropped once REPORT_CACHE_MAX_ENTRIES is exceeded
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "256"))
+GZIP_LEVEL = 6
+# One entity-tag of an If-None-Match / If-Match list: optional W/ prefix, then a quoted opaque tag
+ETAG_RE = re.compile(r'(?:W/)?"[^"]*"')
+
+
+class CachedReport:
+    __slots__ = ("mtime_ns", "size", "body", "gzip_body", "etag")
+
+    def __init__(self, mtime_ns: int, size: int, body: bytes):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.body = body
+        self.gzip_body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def render_json(data) -> bytes:
+    # Same bytes JSONResponse produces, so cached and uncached responses are identical
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def accepts_gzip(accept_encoding: str | None) -> bool:
+    """
+    Whether an Accept-Encoding header allows gzip: listed (or covered by "*") with q > 0.
+    "gzip;q=0" refuses it, and an explicit gzip entry overrides "*".
+    """
+    if not accept_encoding:
+        return False
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    quality = qualities.get("gzip", qualities.get("x-gzip", qualities.get("*", 0.0)))
+    return quality > 0
+
+
+def etag_matches(header: str | None, etag: str, weak: bool = False) -> bool:
+    """
+    Whether a conditional header's entity-tag list matches etag.
+    - weak=True: weak comparison, only for If-None-Match; W/"x" and "x" are equal
+    - weak=False (If-Match, If-Range): strong comparison; a weak tag on either side never matches
+    """
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = ETAG_RE.findall(header)
+    if weak:
+        return any(tag.removeprefix("W/") == etag.removeprefix("W/") for tag in candidates)
+    return not etag.startswith("W/") and etag in candidates
+
+
+class ReportCache:
+    def __init__(self, max_entries: int = REPORT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, file_path: str) -> CachedReport:
+        """
+        Cached report for a file, re-read only when its mtime or size changed.
+        Raises OSError / ValueError like open() and json.load().
+        """
+        stat = os.stat(file_path)
+        with self.lock:
+            entry = self.entries.get(file_path)
+            if entry and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+                self.entries.move_to_end(file_path)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Parse outside the lock; two requests racing on a changed file just both load it
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        entry = CachedReport(stat.st_mtime_ns, stat.st_size, render_json(data))
+
+        with self.lock:
+            self.entries[file_path] = entry
+            self.entries.move_to_end(file_path)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, file_path: str):
+        with self.lock:
+            self.entries.pop(file_path, None)
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "bytes": sum(len(e.body) + len(e.gzip_body) for e in self.entries.values()),
+            }
@@ -0,0 +1,163 @@
+"""
+Field index for the merged company reports in output/reports/<company>/<company>.json.
+
+write_report() writes the report byte-for-byte as json.dump(indent=4, ensure_ascii=False) would,
+and next to it <company>.index.json with the byte offset and length of every object value,
+keyed by dotted path ("financial_metrics.revenue_growth").
+Projections then seek straight to the requested values instead of loading the whole document.
+
+- Paths go through objects only; list items are reached from their closest indexed parent ("risk_factors.0")
+- Keys containing "." cannot be addressed by path
+- An index that does not match the report's size/mtime is ignored and the report is read in full
+"""
+
+import functools
+import json
+import os
+
+INDEX_VERSION = 1
+INDENT = 4
+
+
+def index_path(report_path: str) -> str:
+    return os.path.splitext(report_path)[0] + ".index.json"
+
+
+def encode_report(data: dict) -> tuple[bytes, dict]:
+    """
+    Serialise a report exactly like json.dump(data, f, indent=4, ensure_ascii=False)
+    and return (bytes, {path: [offset, length]}).
+    """
+    chunks = []
+    offsets = {}
+    position = 0
+
+    def emit(text: str):
+        nonlocal position
+        encoded = text.encode("utf-8")
+        chunks.append(encoded)
+        position += len(encoded)
+
+    def encode_value(value, path: str, level: int):
+        start = position
+        if isinstance(value, dict) and value:
+            emit("{")
+            for n, (key, item) in enumerate(value.items()):
+                emit(("," if n else "") + "\n" + " " * (INDENT * (level + 1)) + json.dumps(str(key), ensure_ascii=False) + ": ")
+                encode_value(item, f"{path}.{key}" if path else str(key), level + 1)
+            emit("\n" + " " * (INDENT * level) + "}")
+        else:
+            # Nested indentation is purely additive, so re-indenting a standalone dump matches json.dump
+            emit(json.dumps(value, indent=INDENT, ensure_ascii=False).replace("\n", "\n" + " " * (INDENT * level)))
+        if path:
+            offsets[path] = [start, position - start]
+
+    encode_value(data, "", 0)
+    return b"".join(chunks), offsets
+
+
+def write_report(report_path: str, data: dict):
+    """
+    Write a report and its field index. Both are swapped in atomically, report first.
+    """
+    body, offsets = encode_report(data)
+    with open(report_path + ".tmp", "wb") as f:
+        f.write(body)
+    os.replace(report_path + ".tmp", report_path)
+
+    stat = os.stat(report_path)
+    index = {
+        "version": INDEX_VERSION,
+        "report_size": stat.st_size,
+        "report_mtime_ns": stat.st_mtime_ns,
+        "paths": offsets,
+    }
+    with open(index_path(report_path) + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(index_path(report_path) + ".tmp", index_path(report_path))
+
+
+@functools.lru_cache(maxsize=256)
+def read_index(path: str, mtime_ns: int, size: int) -> dict | None:
+    # mtime/size are only part of the cache key, so a rewritten index is parsed again
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def load_index(report_path: str) -> dict | None:
+    """
+    The report's path index, or None when it is missing or out of date.
+    """
+    try:
+        index_stat = os.stat(index_path(report_path))
+    except OSError:
+        return None
+    index = read_index(index_path(report_path), index_stat.st_mtime_ns, index_stat.st_size)
+    if index is None:
+        return None
+    stat = os.stat(report_path)
+    if (index.get("version") != INDEX_VERSION or index.get("report_size") != stat.st_size
+            or index.get("report_mtime_ns") != stat.st_mtime_ns):
+        return None
+    return index["paths"]
+
+
+def walk(value, keys: list[str]):
+    """
+    Follow keys into a parsed value; raises KeyError when the path does not exist.
+    """
+    for key in keys:
+        if isinstance(value, dict) and key in value:
+            value = value[key]
+        elif isinstance(value, list) and key.isdigit() and int(key) < len(value):
+            value = value[int(key)]
+        else:
+            raise KeyError(key)
+    return value
+
+
+def project(report_path: str, fields: list[str]) -> tuple[dict, list[str]]:
+    """
+    Values for the given dotted paths, read through the index where possible.
+    Returns ({path: value}, [missing paths]).
+    """
+    paths = load_index(report_path)
+    found = {}
+    missing = []
+
+    if paths is None:
+        with open(report_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for field in fields:
+            try:
+                found[field] = walk(data, field.split("."))
+            except KeyError:
+                missing.append(field)
+        return found, missing
+
+    # Longest indexed prefix of each field; the rest of the path is walked in the parsed value
+    reads = []
+    for field in fields:
+        keys = field.split(".")
+        for cut in range(len(keys), 0, -1):
+            prefix = ".".join(keys[:cut])
+            if prefix in paths:
+                reads.append((paths[prefix], field, keys[cut:]))
+                break
+        else:
+            missing.append(field)
+
+    with open(report_path, "rb") as f:
+        # Read in file order, so several fields from one report are a forward scan
+        for (offset, length), field, rest in sorted(reads, key=lambda item: item[0][0]):
+            f.seek(offset)
+            try:
+                found[field] = walk(json.loads(f.read(length)), rest)
+            except KeyError:
+                missing.append(field)
+
+    # Keep the caller's field order
+    return {field: found[field] for field in fields if field in found}, missing
@@ -8,13 +8,18 @@ semantic similarity search queries.
 """
 
 import os
+import sys
 import numpy as np
 import faiss
-from sentence_transformers import SentenceTransformer
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 import argparse
 import pickle
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from embedding_client import EmbeddingClient  # noqa: E402
+
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+
 
 def build_faiss_index(text_file, index_path="faiss_index", chunk_size=500, chunk_overlap=50):
     """
@@ -41,8 +46,8 @@ def build_faiss_index(text_file, index_path="faiss_index", chunk_size=500, chunk
     # Load embedding model
     # ------------------------------
     # You can replace this with any SentenceTransformer model
-    # For small GPUs/CPUs, MiniLM-L6-v2 is very efficient
-    embedder = SentenceTransformer("all-MiniLM-L6-v2")
+    # For small GPUs/CPUs, MiniLM-L6-v2 is very efficient; embedding_server.py keeps it loaded
+    embedder = EmbeddingClient(EMBED_MODEL_NAME)
 
     # Compute embeddings for each chunk
     print("🔹 Encoding chunks into embeddings...")
@@ -81,7 +86,7 @@ def search_faiss(query, index_path="faiss_index", top_k=3):
         chunks = pickle.load(f)
 
     # Load same embedder used for building index
-    embedder = SentenceTransformer("all-MiniLM-L6-v2")
+    embedder = EmbeddingClient(EMBED_MODEL_NAME)
     query_vec = embedder.encode([query], convert_to_numpy=True)
 
     # Search for top-k nearest chunks
@@ -0,0 +1,181 @@
+"""
+Layout-aware table extraction for text-layer PDFs (balance sheets, P&L statements, notes).
+
+PyPDF2's extract_text flattens a table into one value per line. Here the text-show operations are
+collected with their positions instead (extract_text's visitor_text hook), then:
+- Fragments are grouped into lines by baseline and merged into cells when they nearly touch
+- Runs of consecutive multi-cell lines with numbers in them are treated as a table
+- Columns are the union of the cells' x extents across the table, so left-aligned labels and
+  right-aligned figures both land in the right column
+
+Widths are estimated from the font size, not measured, which is plenty to separate columns.
+"""
+
+import csv
+import io
+import re
+
+# Bump when the detection rules change; part of the extraction cache key
+TABLES_VERSION = "layout/1"
+
+# Average glyph width as a fraction of the font size, for estimating where a fragment ends
+CHAR_WIDTH_RATIO = 0.5
+# Fragments closer than this (in font sizes) belong to the same cell
+CELL_GAP_RATIO = 0.8
+# Lines closer than this (in font sizes) share a baseline
+LINE_TOLERANCE_RATIO = 0.4
+TABLE_MIN_ROWS = 3
+# Fraction of a table's rows that must contain a number
+TABLE_MIN_NUMERIC_RATIO = 0.5
+
+NUMBER_RE = re.compile(r"^\(?[-+−]?[₹$€£]?\s?\d[\d,]*(\.\d+)?\)?%?$")
+COLUMN_SPLIT_RE = re.compile(r"\S+(?: \S+)*")
+
+
+def parse_number(cell: str) -> float | None:
+    """
+    "1,23,456.70" -> 123456.7, "(230.06)" -> -230.06, "12.5%" -> 12.5; None for anything else.
+    """
+    value = cell.strip().replace("−", "-")
+    if not NUMBER_RE.match(value):
+        return None
+    negative = value.startswith("(") and value.endswith(")") or value.lstrip("(").startswith("-")
+    digits = re.sub(r"[^\d.]", "", value)
+    try:
+        number = float(digits)
+    except ValueError:
+        return None
+    return -number if negative else number
+
+
+def page_fragments(page) -> list[dict]:
+    """
+    Positioned text fragments of a page: {"text", "x0", "x1", "y", "size"}.
+    """
+    fragments = []
+
+    def visitor(text, cm, tm, font_dict, font_size):
+        text = text.strip("\n")
+        if not text.strip():
+            return
+        # Text space -> user space; only translation and scale matter for upright text
+        x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+        y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+        size = (font_size or 10) * (abs(tm[0]) or 1) * (abs(cm[0]) or 1)
+        char_width = size * CHAR_WIDTH_RATIO
+        # A fragment may itself hold several columns separated by runs of spaces
+        for match in COLUMN_SPLIT_RE.finditer(text.replace("\n", " ")):
+            fragments.append({
+                "text": match.group(),
+                "x0": x + match.start() * char_width,
+                "x1": x + match.end() * char_width,
+                "y": y,
+                "size": size,
+            })
+
+    page.extract_text(visitor_text=visitor)
+    return fragments
+
+
+def group_lines(fragments: list[dict]) -> list[list[dict]]:
+    """
+    Fragments grouped into lines (top to bottom), each line a list of cells (left to right).
+    """
+    lines = []
+    for fragment in sorted(fragments, key=lambda f: (-f["y"], f["x0"])):
+        if lines and abs(lines[-1][0]["y"] - fragment["y"]) <= fragment["size"] * LINE_TOLERANCE_RATIO:
+            lines[-1].append(fragment)
+        else:
+            lines.append([fragment])
+
+    merged_lines = []
+    for line in lines:
+        cells = []
+        for fragment in sorted(line, key=lambda f: f["x0"]):
+            if cells and fragment["x0"] - cells[-1]["x1"] < fragment["size"] * CELL_GAP_RATIO:
+                cells[-1] = dict(cells[-1], text=cells[-1]["text"] + " " + fragment["text"], x1=fragment["x1"])
+            else:
+                cells.append(dict(fragment))
+        merged_lines.append(cells)
+    return merged_lines
+
+
+def column_spans(rows: list[list[dict]]) -> list[tuple[float, float]]:
+    """
+    Merge the x extents of all cells into non-overlapping column spans.
+    """
+    spans = []
+    for start, end in sorted((cell["x0"], cell["x1"]) for row in rows for cell in row):
+        if spans and start <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+        else:
+            spans.append((start, end))
+    return spans
+
+
+def build_table(rows: list[list[dict]]) -> list[list[str]]:
+    spans = column_spans(rows)
+    table = []
+    for row in rows:
+        values = [""] * len(spans)
+        for cell in row:
+            centre = (cell["x0"] + cell["x1"]) / 2
+            column = next((i for i, (start, end) in enumerate(spans) if start <= centre <= end), len(spans) - 1)
+            values[column] = (values[column] + " " + cell["text"]).strip()
+        table.append(values)
+    return table
+
+
+def is_table(rows: list[list[dict]]) -> bool:
+    if len(rows) < TABLE_MIN_ROWS:
+        return False
+    numeric_rows = sum(1 for row in rows if any(parse_number(cell["text"]) is not None for cell in row))
+    return numeric_rows >= len(rows) * TABLE_MIN_NUMERIC_RATIO
+
+
+def extract_page_tables(page) -> list[list[list[str]]]:
+    """
+    Tables on one page, each a list of rows of cell strings ("" for empty cells).
+    """
+    tables = []
+    run = []
+    for line in group_lines(page_fragments(page)) + [[]]:
+        if len(line) >= 2:
+            run.append(line)
+            continue
+        if is_table(run):
+            tables.append(build_table(run))
+        run = []
+    return tables
+
+
+def extract_tables(pdf_reader, start: int = 0, end: int | None = None) -> list[dict]:
+    """
+    Tables for pages [start, end) of an open PdfReader, as {"page", "rows"} dicts.
+    """
+    end = len(pdf_reader.pages) if end is None else end
+    return [
+        {"page": i, "rows": rows}
+        for i in range(start, end)
+        for rows in extract_page_tables(pdf_reader.pages[i])
+    ]
+
+
+def table_csv(rows: list[list[str]]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue()
+
+
+def row_values(tables: list[dict], label: str) -> list[float | None] | None:
+    """
+    Numbers in the first table row whose label (first cell) contains `label`, e.g.
+    row_values(tables, "revenue from operations") -> [None, 10656.7, 7084.08].
+    Lets simple numeric fields be read without going through the LLM.
+    """
+    label = label.lower()
+    for table in tables:
+        for row in table["rows"]:
+            if row and label in row[0].lower():
+                return [parse_number(cell) for cell in row[1:]]
+    return None
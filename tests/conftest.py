@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The API modules live at the repo root, the RAG scripts in rag-report_gen/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "rag-report_gen")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,79 @@
+import random
+
+import dedup
+
+
+def report_page(n, body):
+    return f"Varun Beverages Limited\nAnnual Report 2023\n{body}\nPage {n} of 40"
+
+
+def body_text(seed, words=80):
+    rng = random.Random(seed)
+    vocab = "revenue margin capacity dealer export brand cost tax cash debt asset board audit risk growth".split()
+    return " ".join(rng.choice(vocab) for _ in range(words))
+
+
+def test_normalize_line_folds_digits_of_page_numbers_only():
+    assert dedup.normalize_line("  Page 12   of 40 ") == "page # of #"
+    assert dedup.normalize_line("17") == "#"
+    assert dedup.normalize_line("Revenue  grew 12% to 1,234") == "Revenue grew 12% to 1,234"
+
+
+def test_boilerplate_candidates():
+    assert dedup.is_boilerplate_candidate("Page 3 of 40")
+    assert dedup.is_boilerplate_candidate("Annual Report 2023")
+    assert not dedup.is_boilerplate_candidate("1,234 5,678")
+    assert not dedup.is_boilerplate_candidate("Total")
+
+
+def test_find_boilerplate_needs_repeats():
+    pages = [report_page(n, f"Body line {n} about revenue") for n in range(1, 6)]
+    found = dedup.find_boilerplate(pages)
+    assert found == {"Varun Beverages Limited", "Annual Report 2023", "page # of #"}
+    assert dedup.find_boilerplate(pages[:2]) == set()
+
+
+def test_find_boilerplate_keeps_repeated_figures():
+    # A figure row repeated at the top of every page is content, not a header
+    pages = [f"1,234 5,678\nRevenue for segment {n}" for n in range(6)]
+    assert "1,234 5,678" not in dedup.find_boilerplate(pages)
+
+
+def test_strip_boilerplate_only_touches_page_edges():
+    boilerplate = {"Varun Beverages Limited", "page # of #"}
+    page = "Varun Beverages Limited\nRevenue\nVarun Beverages Limited\nmore text\nPage 7 of 40\n"
+    text, removed = dedup.strip_boilerplate(page, boilerplate)
+    assert removed == 2
+    assert text == "Revenue\nVarun Beverages Limited\nmore text"
+    assert dedup.strip_boilerplate("nothing to strip", boilerplate) == ("nothing to strip", 0)
+
+
+def test_minhash_similarity():
+    text = body_text(1)
+    assert dedup.minhash("too short") is None
+    assert (dedup.minhash(text) == dedup.minhash(text.upper())).all()
+    edited = text.split()
+    edited[40] = "dividend"
+    same = (dedup.minhash(text) == dedup.minhash(" ".join(edited))).mean()
+    other = (dedup.minhash(text) == dedup.minhash(body_text(2))).mean()
+    assert same > 0.7 > other
+
+
+def test_deduplicator_across_parts(tmp_path):
+    index = dedup.DedupIndex(str(tmp_path / "dedup.sqlite3"))
+    pages = [report_page(n, body_text(n)) for n in range(1, 6)]
+    result, stats = dedup.Deduplicator("VBL", index).process("doc", pages)
+    assert stats["pages_dropped"] == 0
+    assert all(page == body_text(n) for n, page in enumerate(result, start=1))
+
+    # Seen in one part only, so a short part does not get those lines stripped yet
+    short = [report_page(20, body_text(20)), report_page(21, body_text(21))]
+    assert dedup.Deduplicator("VBL", index).process("doc2", short)[0] == short
+
+    dedup.Deduplicator("VBL", index).process("doc3", [report_page(n, body_text(n)) for n in range(30, 35)])
+    # Now in two parts: stripped everywhere; a repeated page is dropped
+    again = [report_page(9, body_text(3)), report_page(10, body_text(99))]
+    result, stats = dedup.Deduplicator("VBL", index).process("doc4", again)
+    assert result == ["", body_text(99)]
+    assert stats["duplicates"] == {0: "doc:2"}
+    assert stats["chars_removed"] == stats["chars_before"] - stats["chars_after"]
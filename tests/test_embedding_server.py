@@ -0,0 +1,129 @@
+import sys
+import threading
+import types
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import embedding_server
+from embedding_server import EmbeddingCache, MicroBatcher, text_key
+
+
+class FakeSentenceTransformer:
+    """
+    Deterministic, deliberately unnormalized vectors; records every encode call.
+    """
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, show_progress_bar=False):
+        with self.lock:
+            self.calls.append((list(texts), batch_size))
+        return np.array([vector(text) for text in texts], dtype=np.float64)
+
+
+def vector(text):
+    return [float(len(text)), float(sum(map(ord, text)) % 97), 3.0]
+
+
+@pytest.fixture
+def batcher(monkeypatch):
+    module = types.ModuleType("sentence_transformers")
+    module.SentenceTransformer = FakeSentenceTransformer
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+    # Long enough that requests submitted back to back always share a batch
+    monkeypatch.setattr(embedding_server, "BATCH_WAIT", 0.2)
+    return MicroBatcher("fake-model", EmbeddingCache(max_entries=100))
+
+
+def test_cache_is_lru():
+    cache = EmbeddingCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats() == {"entries": 2, "max_entries": 2, "hits": 3, "misses": 1}
+
+
+def test_concurrent_requests_share_one_encode(batcher):
+    first = batcher.submit(["alpha", "beta"], batch_size=16)
+    second = batcher.submit(["gamma"], batch_size=8)
+
+    first_rows, second_rows = first.result(5), second.result(5)
+
+    assert batcher.model.calls == [(["alpha", "beta", "gamma"], 8)]
+    np.testing.assert_array_equal(first_rows, np.array([vector("alpha"), vector("beta")], dtype=np.float32))
+    np.testing.assert_array_equal(second_rows, np.array([vector("gamma")], dtype=np.float32))
+    assert batcher.stats()["batches"] == 1
+
+
+def test_repeated_texts_are_encoded_once(batcher):
+    first = batcher.submit(["same", "other", "same"])
+    second = batcher.submit(["other", "third"])
+
+    rows = first.result(5)
+    second.result(5)
+
+    assert batcher.model.calls[0][0] == ["same", "other", "third"]
+    assert rows.dtype == np.float32
+    np.testing.assert_array_equal(rows[0], rows[2])
+    np.testing.assert_array_equal(rows[1], np.array(vector("other"), dtype=np.float32))
+
+
+def test_cached_texts_keep_request_order(batcher):
+    batcher.submit(["b", "d"]).result(5)
+
+    # "b" and "d" come from the cache, the others from the model, in the order asked
+    rows = batcher.submit(["a", "b", "c", "d"]).result(5)
+
+    assert batcher.model.calls[-1][0] == ["a", "c"]
+    np.testing.assert_array_equal(rows, np.array([vector(t) for t in "abcd"], dtype=np.float32))
+
+
+def test_fully_cached_request_skips_the_model(batcher):
+    batcher.submit(["x", "y"]).result(5)
+    future = batcher.submit(["y", "x"])
+
+    assert future.done()
+    np.testing.assert_array_equal(future.result(), np.array([vector("y"), vector("x")], dtype=np.float32))
+    assert len(batcher.model.calls) == 1
+    assert batcher.cache.get(text_key("fake-model", "x")) is not None
+
+
+def test_encode_error_reaches_every_request(batcher, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("CUDA out of memory")
+
+    monkeypatch.setattr(batcher.model, "encode", fail)
+    futures = [batcher.submit(["one"]), batcher.submit(["two"])]
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="out of memory"):
+            future.result(5)
+
+
+def test_normalize_is_applied_per_request(batcher, monkeypatch):
+    monkeypatch.setitem(embedding_server.batchers, "fake-model", batcher)
+    client = TestClient(embedding_server.app)
+
+    def encode(**body):
+        response = client.post("/encode", json={"model": "fake-model", "texts": ["page one", "page two"], **body})
+        assert response.status_code == 200
+        shape = tuple(int(n) for n in response.headers["X-Embedding-Shape"].split(","))
+        return np.frombuffer(response.content, dtype=np.float32).reshape(shape)
+
+    raw = encode()
+    normalized = encode(normalize_embeddings=True)
+    raw_again = encode()
+
+    assert len(batcher.model.calls) == 1
+    np.testing.assert_allclose(np.linalg.norm(normalized, axis=1), 1.0, rtol=1e-6)
+    np.testing.assert_allclose(normalized, raw / np.linalg.norm(raw, axis=1, keepdims=True), rtol=1e-6)
+    # The cache keeps raw vectors, so a later request without normalization gets them back
+    np.testing.assert_array_equal(raw_again, raw)
+    assert not np.allclose(np.linalg.norm(raw, axis=1), 1.0)
@@ -0,0 +1,50 @@
+import itertools
+
+import extraction_cache
+from extraction_cache import ExtractionCache, file_sha256
+
+
+def test_put_get_and_versions(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"))
+    cache.put_range("doc", "v1", 10, ["ten", "eleven", "twelve"])
+    assert cache.get("doc", "v1", 11) == "eleven"
+    assert cache.get("doc", "v2", 11) is None
+    assert cache.get_range("doc", "v1", 9, 13) == {10: "ten", 11: "eleven", 12: "twelve"}
+    assert cache.stats()["hits"] == 4 and cache.stats()["misses"] == 2
+
+
+def test_split_part_alias_resolves_to_source_pages(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"))
+    cache.put_range("source", "v1", 0, [f"page {n}" for n in range(30)])
+    cache.add_alias("part2", "source", 10)
+    file_hash, offset = cache.resolve("part2")
+    assert (file_hash, offset) == ("source", 10)
+    assert cache.get(file_hash, "v1", offset + 3) == "page 13"
+    assert cache.resolve("unknown") == ("unknown", 0)
+
+
+def test_lru_eviction(tmp_path, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(extraction_cache.time, "time", lambda: next(clock))
+    cache = ExtractionCache(str(tmp_path / "cache.sqlite3"), max_bytes=100)
+    for page in range(4):
+        cache.put("doc", "v1", page, "x" * 20)
+    assert cache.get("doc", "v1", 0) == "x" * 20    # page 0 is now the most recently used
+
+    cache.put("doc", "v1", 4, "y" * 30)             # 110 bytes > 100: evict down to 90
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= 90
+    assert cache.get("doc", "v1", 1) is None
+    assert cache.get("doc", "v1", 0) == "x" * 20
+
+    # The byte count survives a restart
+    assert ExtractionCache(cache.path, max_bytes=100).total_bytes == cache.total_bytes
+
+
+def test_file_sha256_follows_content(tmp_path):
+    first, second = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    first.write_bytes(b"%PDF-1.4 same")
+    second.write_bytes(b"%PDF-1.4 same")
+    assert file_sha256(str(first)) == file_sha256(str(second))
+    second.write_bytes(b"%PDF-1.4 changed!")
+    assert file_sha256(str(first)) != file_sha256(str(second))
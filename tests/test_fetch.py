@@ -0,0 +1,148 @@
+import asyncio
+import json
+import os
+
+import httpx
+import pytest
+
+import fetch
+from fetch import FetchError, fetch_pdf
+
+URL = "https://reports.example.com/vbl-2023.pdf"
+PDF = b"%PDF-1.4\n" + b"x" * 5000 + b"\n%%EOF\n"
+
+
+class Server:
+    """
+    MockTransport handler serving one document with validators; records the request headers.
+    """
+    def __init__(self, body=PDF, etag='"v1"', last_modified="Tue, 01 Aug 2023 10:00:00 GMT"):
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.requests = []
+        self.chunked = False
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request.headers)
+        if request.headers.get("If-None-Match") == self.etag:
+            return httpx.Response(304)
+        headers = {"ETag": self.etag, "Last-Modified": self.last_modified}
+        if self.chunked:
+            return httpx.Response(200, headers=headers, content=self.chunks())
+        return httpx.Response(200, headers=headers, content=self.body)
+
+    async def chunks(self):
+        # No Content-Length: the cap has to be enforced while streaming
+        for start in range(0, len(self.body), 1000):
+            yield self.body[start:start + 1000]
+
+
+def get(server, url=URL):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(server)) as client:
+            return await fetch_pdf(url, client=client)
+    return asyncio.run(run())
+
+
+def part_files(cache_dir):
+    return [name for name in os.listdir(cache_dir) if name.endswith((".part", ".tmp"))]
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(fetch, "DOWNLOAD_CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_download_is_cached_with_validators(cache_dir):
+    server = Server()
+    path = get(server)
+
+    assert open(path, "rb").read() == PDF
+    meta = json.loads(open(fetch.cache_paths(URL)[1]).read())
+    assert meta["etag"] == '"v1"'
+    assert meta["last_modified"] == "Tue, 01 Aug 2023 10:00:00 GMT"
+    assert meta["size"] == len(PDF)
+    assert "If-None-Match" not in server.requests[0]
+
+
+def test_not_modified_reuses_cached_file(cache_dir):
+    server = Server()
+    path = get(server)
+    os.utime(path, (0, 0))
+
+    assert get(server) == path
+    assert server.requests[1]["If-None-Match"] == '"v1"'
+    assert server.requests[1]["If-Modified-Since"] == "Tue, 01 Aug 2023 10:00:00 GMT"
+    assert open(path, "rb").read() == PDF
+    # A revalidated download counts as used, so pruning keeps it
+    assert os.path.getmtime(path) > 0
+
+
+def test_changed_document_replaces_cached_copy(cache_dir):
+    server = Server()
+    path = get(server)
+    server.body, server.etag = PDF.replace(b"x", b"y"), '"v2"'
+
+    assert get(server) == path
+    assert open(path, "rb").read() == server.body
+    assert json.loads(open(fetch.cache_paths(URL)[1]).read())["etag"] == '"v2"'
+    assert part_files(cache_dir) == []
+
+
+def test_declared_size_over_cap(cache_dir, monkeypatch):
+    monkeypatch.setattr(fetch, "FETCH_MAX_BYTES", 1000)
+
+    with pytest.raises(FetchError) as excinfo:
+        get(Server())
+    assert excinfo.value.status_code == 413
+    assert os.listdir(cache_dir) == []
+
+
+def test_streamed_size_over_cap_keeps_previous_copy(cache_dir, monkeypatch):
+    server = Server()
+    path = get(server)
+    monkeypatch.setattr(fetch, "FETCH_MAX_BYTES", len(PDF))
+    server.body, server.etag, server.chunked = PDF * 2, '"v2"', True
+
+    with pytest.raises(FetchError) as excinfo:
+        get(server)
+    assert excinfo.value.status_code == 413
+    assert part_files(cache_dir) == []
+    assert open(path, "rb").read() == PDF
+    assert json.loads(open(fetch.cache_paths(URL)[1]).read())["etag"] == '"v1"'
+
+
+def test_crash_after_swap_never_pairs_new_body_with_old_validators(cache_dir, monkeypatch):
+    server = Server()
+    path = get(server)
+    server.body, server.etag = PDF.replace(b"x", b"y"), '"v2"'
+
+    def crash(meta_path, meta):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(fetch, "write_meta", crash)
+        with pytest.raises(OSError):
+            get(server)
+
+    # The new body is in place and the old meta is gone, so the next request downloads again
+    assert open(path, "rb").read() == server.body
+    assert not os.path.exists(fetch.cache_paths(URL)[1])
+    get(server)
+    assert "If-None-Match" not in server.requests[-1]
+
+
+def test_http_errors(cache_dir):
+    with pytest.raises(FetchError) as excinfo:
+        get(lambda request: httpx.Response(404))
+    assert excinfo.value.status_code == 400
+
+    def refuse(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    with pytest.raises(FetchError) as excinfo:
+        get(refuse)
+    assert excinfo.value.status_code == 400
+    assert part_files(cache_dir) == []
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from PIL import Image, ImageEnhance, ImageFilter
+
+import image_preprocess
+
+
+def legacy_preprocess(img):
+    # The PIL pipeline image_preprocess replaced (also the baseline in benchmarks/bench_preprocess.py)
+    img = img.convert("L")
+    img = ImageEnhance.Contrast(img).enhance(2.0)
+    img = img.point(lambda x: 0 if x < 140 else 255, "1")
+    return img.filter(ImageFilter.MedianFilter(size=3))
+
+
+def scan(seed, size=(240, 180)):
+    rng = np.random.default_rng(seed)
+    page = rng.normal(210, 25, size=size[::-1])
+    for _ in range(40):
+        y, x = rng.integers(0, size[1] - 10), rng.integers(0, size[0] - 60)
+        page[y:y + 8, x:x + rng.integers(10, 60)] -= rng.integers(60, 180)
+    return Image.fromarray(page.clip(0, 255).astype(np.uint8))
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_fixed_threshold_matches_pil(seed):
+    img = scan(seed)
+    expected = np.asarray(legacy_preprocess(img))
+    assert np.array_equal(np.asarray(image_preprocess.preprocess_image(img)), expected)
+
+
+def test_batch_matches_single_images():
+    images = [scan(1), scan(2, size=(200, 100)), scan(3)]
+    batch = image_preprocess.preprocess_images(images)
+    for img, result in zip(images, batch):
+        assert result.size == img.size
+        assert np.array_equal(np.asarray(result), np.asarray(legacy_preprocess(img)))
+
+
+def test_rgb_input_and_downscale():
+    img = scan(5).convert("RGB")
+    assert np.array_equal(np.asarray(image_preprocess.preprocess_image(img)), np.asarray(legacy_preprocess(img)))
+    img.info["dpi"] = (600, 600)
+    assert image_preprocess.preprocess_image(img, target_dpi=300).size == (120, 90)
+
+
+def test_otsu_splits_two_levels():
+    gray = np.array([[30] * 50 + [200] * 50] * 4, dtype=np.uint8)
+    threshold = image_preprocess.otsu_threshold(gray)
+    assert 30 < threshold <= 200
+    assert image_preprocess.binarize(gray, "otsu").sum() == 200
+
+
+def test_box_sum_matches_naive():
+    values = np.random.default_rng(0).integers(0, 256, size=(9, 11)).astype(np.int32)
+    padded = np.pad(values, 2, mode="edge")
+    naive = np.array([[padded[y:y + 5, x:x + 5].sum() for x in range(11)] for y in range(9)])
+    assert np.array_equal(image_preprocess.box_sum(values, 5), naive)
+
+
+def test_unknown_threshold():
+    with pytest.raises(ValueError):
+        image_preprocess.preprocess_image(scan(0), threshold="sauvola")
@@ -0,0 +1,122 @@
+import threading
+
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("pgvector")
+import ingest_pipeline  # noqa: E402
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def conn():
+    return FakeConnection()
+
+
+@pytest.fixture
+def pipeline(monkeypatch, conn):
+    monkeypatch.setattr(ingest_pipeline.psycopg2, "connect", lambda **kwargs: conn)
+    monkeypatch.setattr(ingest_pipeline.chunking, "ensure_schema", lambda conn: None)
+    monkeypatch.setattr(ingest_pipeline.loader, "ensure_schema", lambda conn, table: None)
+    monkeypatch.setattr(ingest_pipeline, "register_vector", lambda conn: None)
+    # One chunk per page, one "vector" per chunk
+    monkeypatch.setattr(ingest_pipeline.chunking, "chunk_texts",
+                        lambda texts, tokenizer, max_tokens, overlap: [[text] for text in texts])
+    monkeypatch.setattr(ingest_pipeline, "embed_passages", lambda model, texts, batch_size: [[0.0]] * len(texts))
+    monkeypatch.setattr(ingest_pipeline, "PAGE_BATCH", 2)
+
+    pipeline = ingest_pipeline.IngestPipeline.__new__(ingest_pipeline.IngestPipeline)
+    pipeline.model = pipeline.tokenizer = None
+    pipeline.max_tokens, pipeline.overlap, pipeline.embed_batch_size = 100, 10, 8
+    pipeline.chunker = "test:100/10/v1"
+    return pipeline
+
+
+def pages(count, filenames=("VBL1.txt",)):
+    for n in range(count):
+        yield filenames[n % len(filenames)], f"page {n}"
+
+
+def run(pipeline, pages, **kwargs):
+    # A stage that fails must not leave run() blocked on a queue
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(value=_run(pipeline, pages, **kwargs)), daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive(), "pipeline hung"
+    if isinstance(result["value"], Exception):
+        raise result["value"]
+    return result["value"]
+
+
+def _run(pipeline, pages, **kwargs):
+    try:
+        return pipeline.run("VBL", pages, **kwargs)
+    except Exception as e:
+        return e
+
+
+def test_pages_are_keyed_and_counted(pipeline, conn, monkeypatch):
+    written = []
+
+    def write_pages(conn, company, batch, chunker):
+        written.extend((company, filename, index, text) for filename, index, text, _, _ in batch)
+        # The second batch is already stored
+        stored = 0 if len(written) > 2 and len(written) <= 4 else len(batch)
+        return stored, stored
+
+    monkeypatch.setattr(ingest_pipeline, "write_pages", write_pages)
+    source = [("VBL1.txt", "a"), ("VBL1.txt", "  "), ("VBL1.txt", "b"), ("VBL2.txt", "c"), ("VBL1.txt", "d")]
+    progress = []
+
+    result = run(pipeline, iter(source), total_pages=5, progress=lambda done, total: progress.append(done))
+
+    assert written == [("VBL", "VBL1.txt", 0, "a"), ("VBL", "VBL1.txt", 1, "b"),
+                       ("VBL", "VBL2.txt", 0, "c"), ("VBL", "VBL1.txt", 2, "d")]
+    assert progress[-1] == 5
+    assert result["pages"] == 5
+    assert result["pages_stored"] == 2
+    assert conn.closed
+
+
+def test_extract_error_propagates(pipeline, conn, monkeypatch):
+    monkeypatch.setattr(ingest_pipeline, "write_pages", lambda conn, company, batch, chunker: (len(batch), len(batch)))
+
+    def failing_pages():
+        yield from pages(3)
+        raise RuntimeError("extractor crashed")
+
+    with pytest.raises(RuntimeError, match="extractor crashed"):
+        run(pipeline, failing_pages())
+    assert conn.closed
+
+
+def test_embed_error_propagates(pipeline, monkeypatch):
+    monkeypatch.setattr(ingest_pipeline, "write_pages", lambda conn, company, batch, chunker: (len(batch), len(batch)))
+
+    def embed_passages(model, texts, batch_size):
+        raise ConnectionError("embedding server went away")
+
+    monkeypatch.setattr(ingest_pipeline, "embed_passages", embed_passages)
+
+    # More pages than the queues hold, so the extract stage is blocked when embedding fails
+    with pytest.raises(ConnectionError, match="went away"):
+        run(pipeline, pages(ingest_pipeline.QUEUE_SIZE * 10))
+
+
+def test_write_error_stops_the_stages(pipeline, conn, monkeypatch):
+    def write_pages(conn, company, batch, chunker):
+        raise ValueError("constraint violated")
+
+    monkeypatch.setattr(ingest_pipeline, "write_pages", write_pages)
+
+    with pytest.raises(ValueError, match="constraint violated"):
+        run(pipeline, pages(ingest_pipeline.QUEUE_SIZE * 10))
+    assert conn.closed
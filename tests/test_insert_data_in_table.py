@@ -0,0 +1,55 @@
+import re
+
+import pytest
+
+pytest.importorskip("psycopg2")
+import insert_data_in_table as loader  # noqa: E402
+
+
+def copy_unescape(field):
+    # How Postgres reads a COPY text-format field back
+    escapes = {"\\": "\\", "t": "\t", "n": "\n", "r": "\r"}
+    return re.sub(r"\\(.)", lambda m: escapes[m.group(1)], field)
+
+
+@pytest.mark.parametrize("value", [
+    "plain text",
+    "tab\there, newline\nthere, CR\r\nend",
+    "back\\slash \\n literal and \\t",
+    "₹ 1,234 crore – “quoted”",
+    "",
+])
+def test_copy_escape_round_trips(value):
+    escaped = loader.copy_escape(value)
+    assert not set("\t\n\r") & set(escaped)
+    assert copy_unescape(escaped) == value
+
+
+def test_copy_escape_drops_nul():
+    assert loader.copy_escape("a\x00b") == "ab"
+
+
+def test_copy_stream_reads_in_chunks():
+    rows = [f"row {n}\t₹\n" for n in range(100)]
+    stream = loader.CopyStream(iter(rows))
+    chunks = []
+    while chunk := stream.read(7):
+        assert len(chunk) <= 7
+        chunks.append(chunk)
+    assert b"".join(chunks).decode("utf-8") == "".join(rows)
+    assert loader.CopyStream(iter(rows)).read() == "".join(rows).encode("utf-8")
+
+
+def test_iter_excerpts_matches_split(tmp_path):
+    content = f"\n{loader.DELIMITER}\nfirst\nexcerpt\n{loader.DELIMITER}\n\n{loader.DELIMITER}second{loader.DELIMITER}third\n"
+    path = tmp_path / "VBL-20231.txt"
+    path.write_text(content, encoding="utf-8")
+    expected = [part.strip() for part in content.split(loader.DELIMITER) if part.strip()]
+    assert list(loader.iter_excerpts(str(path))) == expected == ["first\nexcerpt", "second", "third"]
+
+
+def test_company_filename_pattern_is_anchored():
+    pattern = re.compile(loader.company_filename_pattern("VBL"))
+    assert pattern.match("VBL12.txt")
+    assert not pattern.match("VBL-20231.txt")
+    assert not re.match(loader.company_filename_pattern("a_b"), "axb1.txt")
@@ -0,0 +1,156 @@
+import threading
+import time
+
+import pytest
+
+import jobs
+from jobs import JobManager
+
+
+def wait_for(manager, job_id, *statuses, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.status(job_id)
+        if job["status"] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {manager.status(job_id)['status']}")
+
+
+@pytest.fixture(autouse=True)
+def save_every_progress(monkeypatch):
+    monkeypatch.setattr(jobs, "PROGRESS_SAVE_INTERVAL", 0.0)
+
+
+def test_finished_job_survives_restart(tmp_path):
+    def runner(pages, progress):
+        for done in range(1, pages + 1):
+            progress(done, pages)
+        return {"pages": pages}
+
+    manager = JobManager(jobs_dir=str(tmp_path))
+    manager.register("scan", runner)
+    job_id = manager.submit("scan", {"pages": 3})["id"]
+    wait_for(manager, job_id, "done")
+
+    job = JobManager(jobs_dir=str(tmp_path)).status(job_id)
+    assert job["status"] == "done"
+    assert job["params"] == {"pages": 3}
+    assert job["result"] == {"pages": 3}
+    assert job["progress"]["done"] == job["progress"]["total"] == 3
+    assert job["progress"]["eta_seconds"] is None
+
+
+def test_failed_job_is_persisted(tmp_path):
+    def runner(progress):
+        raise ValueError("no PDF files found")
+
+    manager = JobManager(jobs_dir=str(tmp_path))
+    manager.register("scan", runner)
+    job_id = manager.submit("scan", {})["id"]
+    wait_for(manager, job_id, "failed")
+
+    job = JobManager(jobs_dir=str(tmp_path)).get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "no PDF files found"
+    assert job["finished_at"] is not None
+
+
+def test_interrupted_job_is_resumed(tmp_path):
+    started, release = threading.Event(), threading.Event()
+
+    def stuck(pages, progress):
+        progress(2, pages)
+        started.set()
+        release.wait(5)
+
+    old = JobManager(jobs_dir=str(tmp_path))
+    old.register("scan", stuck)
+    job_id = old.submit("scan", {"pages": 5})["id"]
+    assert started.wait(5)
+
+    try:
+        # A new process sees the job as it was last saved
+        new = JobManager(jobs_dir=str(tmp_path))
+        job = new.get(job_id)
+        assert job["status"] == "running"
+        assert job["progress"] == {"done": 2, "total": 5}
+
+        calls = []
+
+        def runner(pages, progress):
+            calls.append(pages)
+            progress(pages, pages)
+            return "resumed"
+
+        new.register("scan", runner)
+        new.resume()
+        job = wait_for(new, job_id, "done")
+    finally:
+        release.set()
+
+    assert calls == [5]
+    assert job["result"] == "resumed"
+    assert job["progress"]["done"] == 5
+    assert JobManager(jobs_dir=str(tmp_path)).get(job_id)["status"] == "done"
+
+
+def test_resume_skips_finished_and_unknown_jobs(tmp_path):
+    manager = JobManager(jobs_dir=str(tmp_path))
+    manager.register("scan", lambda progress: "ok")
+    done_id = manager.submit("scan", {})["id"]
+    wait_for(manager, done_id, "done")
+    (tmp_path / "notes.json").write_text("{}")
+
+    calls = []
+    restarted = JobManager(jobs_dir=str(tmp_path))
+    restarted.register("scan", lambda progress: calls.append(1))
+    restarted.resume()
+
+    assert calls == []
+    assert restarted.get("notes") is None
+
+
+def test_job_types_have_their_own_pools(tmp_path):
+    # Two "ocr" jobs must run together (concurrency 2); "ingest" jobs one at a time (default 1)
+    both_running = threading.Barrier(2, timeout=5)
+    ingest_release = threading.Event()
+    active = {"ingest": 0, "max_ingest": 0}
+    lock = threading.Lock()
+
+    def ocr(progress):
+        both_running.wait()
+        return "ocr"
+
+    def ingest(progress):
+        with lock:
+            active["ingest"] += 1
+            active["max_ingest"] = max(active["max_ingest"], active["ingest"])
+        ingest_release.wait(5)
+        with lock:
+            active["ingest"] -= 1
+        return "ingest"
+
+    manager = JobManager(jobs_dir=str(tmp_path), concurrency={"ocr": 2})
+    manager.register("ocr", ocr)
+    manager.register("ingest", ingest)
+
+    try:
+        ingest_ids = [manager.submit("ingest", {})["id"] for _ in range(2)]
+        wait_for(manager, ingest_ids[0], "running")
+        # The ingest pool is busy; ocr jobs still start, and run side by side
+        ocr_ids = [manager.submit("ocr", {})["id"] for _ in range(2)]
+        for job_id in ocr_ids:
+            assert wait_for(manager, job_id, "done", "failed")["status"] == "done"
+        assert manager.status(ingest_ids[1])["status"] == "queued"
+    finally:
+        ingest_release.set()
+
+    for job_id in ingest_ids:
+        wait_for(manager, job_id, "done")
+    assert active["max_ingest"] == 1
+
+
+def test_unknown_job_type(tmp_path):
+    with pytest.raises(ValueError):
+        JobManager(jobs_dir=str(tmp_path)).submit("nope", {})
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+import ocr_routing
+
+
+def page(ink_ratio: float = 0.1, size: int = 100):
+    pixels = np.full((size, size), 255, dtype=np.uint8)
+    pixels.flat[:int(size * size * ink_ratio)] = 0
+    return Image.fromarray(pixels)
+
+
+def tesseract_data(*words):
+    """
+    image_to_data's DICT output for (block, par, line, text, conf) tuples.
+    """
+    keys = ("block_num", "par_num", "line_num", "text", "conf")
+    return {key: [word[i] for word in words] for i, key in enumerate(keys)}
+
+
+@pytest.fixture
+def installed(monkeypatch):
+    languages = {"eng", "hin"}
+    monkeypatch.setattr(ocr_routing, "installed_languages", lambda: frozenset(languages))
+    return languages
+
+
+@pytest.mark.parametrize("detection, expected", [
+    ({"script": "Devanagari", "script_confidence": 5.0, "rotate": 0}, "hin+eng"),
+    ({"script": "Latin", "script_confidence": 5.0, "rotate": 0}, "eng"),
+    ({"script": "Devanagari", "script_confidence": 0.5, "rotate": 0}, ocr_routing.OCR_DEFAULT_LANG),
+    ({"script": "Cyrillic", "script_confidence": 5.0, "rotate": 0}, ocr_routing.OCR_DEFAULT_LANG),
+    ({"script": None, "script_confidence": 0.0, "rotate": 0}, ocr_routing.OCR_DEFAULT_LANG),
+])
+def test_route_language(installed, detection, expected):
+    assert ocr_routing.route(page(), detection)[0] == expected
+
+
+def test_route_drops_missing_language_packs(installed):
+    installed.discard("hin")
+    detection = {"script": "Devanagari", "script_confidence": 5.0, "rotate": 0}
+    assert ocr_routing.route(page(), detection)[0] == "eng"
+
+
+def test_route_sparse_pages(installed):
+    detection = {"script": "Latin", "script_confidence": 5.0, "rotate": 0}
+    assert ocr_routing.route(page(ink_ratio=0.005), detection)[1] == ocr_routing.PSM_SPARSE
+    assert ocr_routing.route(page(ink_ratio=0.2), detection)[1] == ocr_routing.PSM_BLOCK
+
+
+def test_ocr_with_confidence_layout(monkeypatch):
+    data = tesseract_data(
+        (1, 1, 1, "Annual", 90), (1, 1, 1, "Report", 80),
+        (1, 1, 2, "2023", 70),
+        (1, 1, 2, " ", -1),
+        (1, 2, 1, "Revenue", 60),
+        (2, 1, 1, "Notes", 50), (2, 1, 1, "", -1),
+    )
+    monkeypatch.setattr(ocr_routing.pytesseract, "image_to_data", lambda *args, **kwargs: data)
+
+    text, confidence = ocr_routing.ocr_with_confidence(page(), "eng", ocr_routing.PSM_BLOCK)
+
+    assert text == "Annual Report\n2023\n\nRevenue\n\nNotes"
+    assert confidence == 70.0
+
+
+def test_ocr_with_confidence_blank_page(monkeypatch):
+    data = tesseract_data((1, 0, 0, "", -1), (1, 1, 1, " ", -1))
+    monkeypatch.setattr(ocr_routing.pytesseract, "image_to_data", lambda *args, **kwargs: data)
+
+    assert ocr_routing.ocr_with_confidence(page(ink_ratio=0), "eng", ocr_routing.PSM_SPARSE) == ("", None)
+
+
+def test_low_confidence_gating(monkeypatch):
+    main = pytest.importorskip("main")
+    results = {
+        "good.png": {"error": None, "lang": "eng", "confidence": 85.0},
+        "poor.png": {"error": None, "lang": "eng", "confidence": 12.5},
+        "blank.png": {"error": None, "lang": "eng", "confidence": None},
+    }
+    monkeypatch.setattr(main, "ocr_image_routed", lambda path, **kwargs: dict(results[path]))
+
+    routed = list(main.ocr_images_routed(list(results), lang="auto", min_confidence=40, low_confidence="skip"))
+
+    assert [result.get("low_confidence", False) for result in routed] == [False, True, False]
+    assert routed[1]["skipped"] is True
@@ -0,0 +1,59 @@
+import gzip
+import json
+
+import pytest
+from fastapi.responses import JSONResponse
+
+from report_cache import ReportCache, accepts_gzip, etag_matches, render_json
+
+ETAG = '"0123abcd"'
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, False),
+    ("gzip", True),
+    ("gzip, deflate, br", True),
+    ("br;q=1.0, gzip;q=0.8", True),
+    ("gzip;q=0", False),
+    ("gzip; q=0.000, deflate", False),
+    ("*", True),
+    ("*;q=0", False),
+    ("deflate, *;q=0.1", True),
+    ("gzip;q=0, *", False),
+    ("identity", False),
+    ("x-gzip", True),
+])
+def test_accepts_gzip(header, expected):
+    assert accepts_gzip(header) is expected
+
+
+def test_weak_comparison_for_if_none_match():
+    assert etag_matches(ETAG, ETAG, weak=True)
+    assert etag_matches('W/"0123abcd"', ETAG, weak=True)
+    assert etag_matches('"other", W/"0123abcd"', ETAG, weak=True)
+    assert etag_matches("*", ETAG, weak=True)
+    assert not etag_matches('"0123abce"', ETAG, weak=True)
+    assert not etag_matches(None, ETAG, weak=True)
+
+
+def test_strong_comparison_by_default():
+    assert etag_matches(ETAG, ETAG)
+    assert not etag_matches('W/"0123abcd"', ETAG)
+    assert not etag_matches(ETAG, 'W/"0123abcd"')
+
+
+def test_report_cache_revalidates(tmp_path):
+    path = tmp_path / "vbl.json"
+    data = {"company_name": "VBL", "revenue": "₹ 10,656 crore", "ratio": 0.5}
+    path.write_text(json.dumps(data, indent=4), encoding="utf-8")
+    cache = ReportCache()
+
+    entry = cache.get(str(path))
+    assert entry.body == render_json(data) == JSONResponse(content=data).body
+    assert gzip.decompress(entry.gzip_body) == entry.body
+    assert cache.get(str(path)) is entry
+
+    path.write_text(json.dumps(dict(data, ratio=0.6)), encoding="utf-8")
+    changed = cache.get(str(path))
+    assert changed.etag != entry.etag
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
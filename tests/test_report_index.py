@@ -0,0 +1,46 @@
+import json
+import os
+
+import report_index
+
+REPORT = {
+    "company_name": "Varun Beverages Limited",
+    "financial_metrics": {
+        "revenue_growth": "12.5% YoY",
+        "margins": {"ebitda": 21.3, "net": None},
+        "segments": [{"name": "India", "share": 0.72}, {"name": "International", "share": 0.28}],
+        "empty": {},
+    },
+    "risk_factors": ["Monsoon dependence", "Sugar prices ₹ and “quotes”", []],
+    "notes": "multi\nline \"text\"",
+    "ratios": {"debt/equity": 0.4, "flag": True},
+}
+
+
+def test_encode_report_matches_json_dump():
+    body, _ = report_index.encode_report(REPORT)
+    assert body == json.dumps(REPORT, indent=4, ensure_ascii=False).encode("utf-8")
+
+
+def test_offsets_point_at_values():
+    body, offsets = report_index.encode_report(REPORT)
+    for path in ("financial_metrics.margins", "financial_metrics.segments", "risk_factors", "notes",
+                 "financial_metrics.empty", "ratios.debt/equity"):
+        start, length = offsets[path]
+        assert json.loads(body[start:start + length]) == report_index.walk(REPORT, path.split("."))
+
+
+def test_project_with_and_without_index(tmp_path):
+    report_path = str(tmp_path / "vbl.json")
+    report_index.write_report(report_path, REPORT)
+    fields = ["financial_metrics.revenue_growth", "risk_factors.1", "financial_metrics.nope"]
+    expected = ({"financial_metrics.revenue_growth": "12.5% YoY", "risk_factors.1": "Sugar prices ₹ and “quotes”"},
+                ["financial_metrics.nope"])
+    assert report_index.project(report_path, fields) == expected
+
+    # A report rewritten without its index falls back to a full read
+    with open(report_path, "a", encoding="utf-8") as f:
+        f.write("\n")
+    assert report_index.load_index(report_path) is None
+    assert report_index.project(report_path, fields) == expected
+    assert os.path.exists(report_index.index_path(report_path))
@@ -0,0 +1,101 @@
+import json
+import os
+
+import pytest
+
+canvas = pytest.importorskip("reportlab.pdfgen.canvas")
+main = pytest.importorskip("main")
+
+
+def write_pdf(path, pages):
+    pdf = canvas.Canvas(str(path))
+    for text in pages:
+        pdf.drawString(72, 720, text)
+        pdf.showPage()
+    pdf.save()
+
+
+def scan(source, content_dir, **kwargs):
+    return main.scan_pdf_directory(str(source), "acme", workers=1, content_dir=str(content_dir), **kwargs)
+
+
+def read_manifest(content_dir):
+    with open(content_dir / "acme" / main.SCAN_MANIFEST, encoding="utf-8") as f:
+        return json.load(f)["parts"]
+
+
+@pytest.fixture
+def source(tmp_path):
+    directory = tmp_path / "pdfs"
+    directory.mkdir()
+    write_pdf(directory / "a.pdf", ["Alpha one", "Alpha two"])
+    write_pdf(directory / "b.pdf", ["Bravo one"])
+    return directory
+
+
+@pytest.fixture
+def content_dir(tmp_path):
+    return tmp_path / "content"
+
+
+def test_rescan_skips_unchanged_parts(source, content_dir):
+    first = scan(source, content_dir)
+    assert sorted(first["files_added"]) == ["a.pdf", "b.pdf"]
+    entries = read_manifest(content_dir)
+    assert entries["a.pdf"]["pages"] == 2
+    text = open(entries["a.pdf"]["text_file"], encoding="utf-8").read()
+    assert "Alpha one" in text and "Alpha two" in text
+    assert os.path.dirname(entries["a.pdf"]["text_file"]) == str(content_dir / "acme")
+
+    second = scan(source, content_dir)
+    assert second["files_added"] == []
+    assert sorted(second["files_skipped"]) == ["a.pdf", "b.pdf"]
+
+    forced = scan(source, content_dir, force=True)
+    assert sorted(forced["files_added"]) == ["a.pdf", "b.pdf"]
+
+
+def test_changed_part_keeps_its_file_number(source, content_dir):
+    scan(source, content_dir)
+    numbers = {name: entry["number"] for name, entry in read_manifest(content_dir).items()}
+
+    write_pdf(source / "b.pdf", ["Bravo revised", "Bravo appendix"])
+    result = scan(source, content_dir)
+
+    assert result["files_added"] == ["b.pdf"]
+    entries = read_manifest(content_dir)
+    assert {name: entry["number"] for name, entry in entries.items()} == numbers
+    assert "Bravo revised" in open(entries["b.pdf"]["text_file"], encoding="utf-8").read()
+
+
+def test_removed_part_loses_its_text(source, content_dir):
+    scan(source, content_dir)
+    stale = read_manifest(content_dir)["b.pdf"]["text_file"]
+
+    os.remove(source / "b.pdf")
+    scan(source, content_dir)
+
+    assert "b.pdf" not in read_manifest(content_dir)
+    assert not os.path.exists(stale)
+
+
+def test_interrupted_scan_resumes_after_last_finished_part(source, content_dir, monkeypatch):
+    iter_parts_pages = main.iter_parts_pages
+
+    def crash_after_first_part(*args, **kwargs):
+        parts = iter_parts_pages(*args, **kwargs)
+        yield next(parts)
+        raise RuntimeError("worker died")
+
+    monkeypatch.setattr(main, "iter_parts_pages", crash_after_first_part)
+    with pytest.raises(RuntimeError):
+        scan(source, content_dir)
+    # The finished part was recorded before the crash; the other only has its file number
+    finished = [name for name, entry in read_manifest(content_dir).items() if "text_file" in entry]
+    assert len(finished) == 1
+
+    monkeypatch.setattr(main, "iter_parts_pages", iter_parts_pages)
+    result = scan(source, content_dir)
+
+    assert result["files_skipped"] == finished
+    assert result["files_added"] == sorted({"a.pdf", "b.pdf"} - set(finished))
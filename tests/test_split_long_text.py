@@ -0,0 +1,59 @@
+import re
+
+import pytest
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("transformers")
+import split_long_text as chunking  # noqa: E402
+
+
+class WordTokenizer:
+    # One token per whitespace-separated word, with character offsets like a fast tokenizer
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=False):
+        if isinstance(text, list):
+            return {"input_ids": [t.split() for t in text]}
+        spans = [m.span() for m in re.finditer(r"\S+", text)]
+        return {"input_ids": list(range(len(spans))), "offset_mapping": spans}
+
+
+def words(text):
+    return len(text.split())
+
+
+def test_pack_chunks_respects_limit_and_overlap():
+    pieces = [(f"s{n} " + "w " * 3, 4) for n in range(10)]
+    chunks = chunking.pack_chunks([(text.strip(), tokens) for text, tokens in pieces], max_tokens=10, overlap=4)
+    assert all(words(chunk) <= 10 for chunk in chunks)
+    # The last sentence of a chunk opens the next one
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current.split()[0] == previous.split()[-4]
+    assert chunks[-1].endswith("s9 w w w")
+
+
+def test_pack_chunks_skips_overlap_that_would_not_fit():
+    chunks = chunking.pack_chunks([("a b", 2), ("c d e f g h i j", 8)], max_tokens=9, overlap=2)
+    assert chunks == ["a b", "c d e f g h i j"]
+
+
+def test_split_long_sentence_windows():
+    sentence = " ".join(f"t{n}" for n in range(25))
+    pieces = chunking.split_long_sentence(sentence, WordTokenizer(), max_tokens=10, overlap=3)
+    assert [tokens for _, tokens in pieces] == [10, 10, 10, 4]
+    assert pieces[0][0] == " ".join(f"t{n}" for n in range(10))
+    assert pieces[1][0].startswith("t7 ")
+    assert pieces[-1][0].endswith("t24")
+
+
+def test_chunk_texts_short_and_long():
+    long_text = "First sentence here. " + " ".join(f"w{n}" for n in range(30)) + ".\nLast line"
+    short, long = chunking.chunk_texts(["Fits in one. Easily", long_text], WordTokenizer(), max_tokens=12, overlap=2)
+    assert short == ["Fits in one. Easily"]
+    assert len(long) > 1 and all(words(chunk) <= 12 for chunk in long)
+    assert long[0].startswith("First sentence here.") and long[-1].endswith("Last line")
+
+
+def test_company_filename_pattern():
+    pattern = chunking.company_filename_pattern("VBL")
+    assert re.match(pattern, "VBL3.txt")
+    assert not re.match(pattern, "VBL-20233.txt")
+    assert not re.match(chunking.company_filename_pattern("Lg_el"), "Lg-el1.txt")
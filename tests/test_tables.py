@@ -0,0 +1,57 @@
+import pytest
+from PyPDF2 import PdfReader
+
+import tables
+
+
+@pytest.mark.parametrize("cell, number", [
+    ("1,23,456.70", 123456.7),
+    ("(230.06)", -230.06),
+    ("−12", -12.0),
+    ("-4.5", -4.5),
+    ("12.5%", 12.5),
+    ("₹ 1,000", 1000.0),
+    (" 42 ", 42.0),
+])
+def test_parse_number(cell, number):
+    assert tables.parse_number(cell) == number
+
+
+@pytest.mark.parametrize("cell", ["", "FY 2024", "Note 3", "1.2.3", "-", "n/a"])
+def test_parse_number_rejects_text(cell):
+    assert tables.parse_number(cell) is None
+
+
+def test_row_values_and_csv():
+    found = [
+        {"page": 0, "rows": [["Particulars", "Note", "FY 2024"], ["Other income", "", "12.40"]]},
+        {"page": 1, "rows": [["Revenue from operations", "24", "10,656.70"], ["Revenue from operations", "", "1"]]},
+    ]
+    assert tables.row_values(found, "revenue FROM operations") == [24.0, 10656.7]
+    assert tables.row_values(found, "other income") == [None, 12.4]
+    assert tables.row_values(found, "dividend") is None
+    assert tables.table_csv([["Total, net", "1,234"], ["Tax", ""]]) == '"Total, net","1,234"\nTax,\n'
+
+
+def test_extract_page_tables_from_statement(tmp_path):
+    canvas = pytest.importorskip("reportlab.pdfgen.canvas")
+    path = str(tmp_path / "statement.pdf")
+    pdf = canvas.Canvas(path)
+    pdf.drawString(50, 800, "Standalone Statement of Profit and Loss")
+    rows = [("Particulars", "Note", "FY 2024", "FY 2023"),
+            ("Revenue from operations", "24", "10,656.70", "7,084.08"),
+            ("Other income", "25", "(12.40)", "9.10"),
+            ("Total income", "", "10,644.30", "7,093.18")]
+    y = 760
+    for label, *figures in rows:
+        pdf.drawString(50, y, label)
+        for text, x in zip(figures, (330, 430, 530)):
+            if text:
+                pdf.drawRightString(x, y, text)
+        y -= 16
+    pdf.drawString(50, y - 40, "The company continued to invest in capacity expansion during the year.")
+    pdf.save()
+
+    found = tables.extract_page_tables(PdfReader(path).pages[0])
+    assert found == [[list(row) for row in rows]]
+    assert tables.row_values([{"page": 0, "rows": found[0]}], "other income") == [25.0, -12.4, 9.1]
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+import uploads
+from uploads import UploadError, iter_multipart_uploads, prune_uploads, save_upload
+
+BOUNDARY = "----pdfreaderboundary"
+CONTENT_TYPE = f"multipart/form-data; boundary={BOUNDARY}"
+PDF = b"%PDF-1.4\n" + b"x" * 2000 + b"\n%%EOF\n"
+
+
+def multipart_body(*parts):
+    """
+    parts are (field name, file name or None, payload) tuples.
+    """
+    body = b""
+    for name, filename, payload in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        body += (f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n"
+                 f"Content-Type: application/octet-stream\r\n\r\n").encode() + payload + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+async def stream(body: bytes, size: int = 256):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def collect(body: bytes, content_type: str = CONTENT_TYPE):
+    async def run():
+        return [item async for item in iter_multipart_uploads(stream(body), content_type)]
+    return asyncio.run(run())
+
+
+def leftover_parts(upload_dir):
+    return [name for name in os.listdir(upload_dir) if name.endswith(".part")]
+
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_multipart_stores_every_file_of_the_field(upload_dir):
+    other = PDF.replace(b"x", b"y")
+    stored = collect(multipart_body(("files", "a.pdf", PDF), ("note", None, b"ignored"),
+                                    ("files", "b", other)))
+
+    assert [name for name, _ in stored] == ["a.pdf", "b"]
+    assert open(stored[0][1], "rb").read() == PDF
+    assert open(stored[1][1], "rb").read() == other
+    assert os.path.basename(stored[1][1]) == "b.pdf"
+    assert leftover_parts(upload_dir) == []
+
+
+def test_multipart_batch_cap_hit_mid_stream(upload_dir, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_BATCH_MAX_BYTES", len(PDF) + 500)
+    body = multipart_body(("files", "a.pdf", PDF), ("files", "b.pdf", PDF))
+
+    with pytest.raises(UploadError) as excinfo:
+        collect(body)
+    assert excinfo.value.status_code == 413
+    assert leftover_parts(upload_dir) == []
+
+
+def test_multipart_file_cap(upload_dir, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_MAX_BYTES", 1000)
+
+    with pytest.raises(UploadError) as excinfo:
+        collect(multipart_body(("files", "a.pdf", PDF)))
+    assert excinfo.value.status_code == 413
+    assert leftover_parts(upload_dir) == []
+
+
+@pytest.mark.parametrize("cut", [40, 120, -20])
+def test_multipart_truncated_body(upload_dir, cut):
+    body = multipart_body(("files", "a.pdf", PDF))
+
+    with pytest.raises(UploadError) as excinfo:
+        collect(body[:cut])
+    assert excinfo.value.status_code == 400
+    assert leftover_parts(upload_dir) == []
+
+
+def test_multipart_malformed_body(upload_dir):
+    with pytest.raises(UploadError) as excinfo:
+        collect(b"--not-the-boundary\r\ngarbage\r\n")
+    assert excinfo.value.status_code == 400
+
+
+def test_multipart_requires_boundary():
+    with pytest.raises(UploadError) as excinfo:
+        collect(b"", content_type="multipart/form-data")
+    assert excinfo.value.status_code == 400
+
+
+def test_multipart_rejects_non_pdf(upload_dir):
+    with pytest.raises(UploadError) as excinfo:
+        collect(multipart_body(("files", "a.pdf", b"PK\x03\x04 not a pdf")))
+    assert excinfo.value.status_code == 415
+    assert leftover_parts(upload_dir) == []
+
+
+def test_save_upload_reuses_path_for_same_content(upload_dir):
+    first = asyncio.run(save_upload(stream(PDF), "report.pdf"))
+    second = asyncio.run(save_upload(stream(PDF, size=97), "report.pdf"))
+
+    assert first == second
+    assert os.path.dirname(first) != str(upload_dir)
+    assert leftover_parts(upload_dir) == []
+
+
+def test_save_upload_rejects_empty_body(upload_dir):
+    with pytest.raises(UploadError) as excinfo:
+        asyncio.run(save_upload(stream(b""), "empty.pdf"))
+    assert excinfo.value.status_code == 400
+    assert leftover_parts(upload_dir) == []
+
+
+def test_prune_keeps_recent_uploads(upload_dir, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_CACHE_MAX_BYTES", len(PDF))
+    old = asyncio.run(save_upload(stream(PDF), "old.pdf"))
+    new = asyncio.run(save_upload(stream(PDF.replace(b"x", b"z")), "new.pdf"))
+    stale = time.time() - uploads.PRUNE_GRACE_SECONDS - 60
+    os.utime(old, (stale, stale))
+
+    prune_uploads()
+
+    assert not os.path.exists(old)
+    assert os.path.exists(new)
@@ -0,0 +1,246 @@
+"""
+Uploaded PDFs for the /upload-pdf/ and /upload-pdfs/ endpoints.
+
+- The body is consumed chunk by chunk and written straight to disk, never held in memory, with a size cap
+- Multipart batches are parsed incrementally from the request stream (no spooling by the framework),
+  and each file is handed over as soon as its part is complete, while later files are still arriving
+- A Content-Length over the limit is rejected before any of the body is read
+- Files are stored as cache/uploads/<sha256>/<file name>, so re-uploading a report reuses the same
+  path (and its extraction cache entries) while split parts keep the original file name
+- Disk I/O (temp file, writes, the final rename) runs in worker threads, never on the event loop
+- The least recently uploaded files are pruned once UPLOAD_CACHE_MAX_MB is exceeded, by a periodic
+  background task (prune_uploads_periodically), not by the request that finished an upload
+"""
+
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+from python_multipart import MultipartParser
+from python_multipart.multipart import MultipartState, parse_options_header
+
+import metrics
+from extraction_cache import remember_sha256
+
+UPLOAD_DIR = os.path.join("cache", "uploads")
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_MB", "200")) * 1024 * 1024
+# Whole multipart request of /upload-pdfs/ (every file is still capped at UPLOAD_MAX_MB)
+UPLOAD_BATCH_MAX_BYTES = int(os.getenv("UPLOAD_BATCH_MAX_MB", "1024")) * 1024 * 1024
+UPLOAD_CACHE_MAX_BYTES = int(os.getenv("UPLOAD_CACHE_MAX_MB", "2048")) * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+UPLOAD_PRUNE_INTERVAL_SECONDS = float(os.getenv("UPLOAD_PRUNE_INTERVAL_SECONDS", "60"))
+# Uploads stored this recently are never pruned; a request may still be extracting them
+PRUNE_GRACE_SECONDS = 300
+PDF_MAGIC = b"%PDF-"
+
+
+class UploadError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def check_content_length(headers, limit: int):
+    """
+    Reject a declared body size over the limit before reading any of it.
+    Chunked requests have no Content-Length; their size is checked as the body arrives.
+    """
+    declared = headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise UploadError(413, f"Request body is larger than {limit} bytes")
+
+
+class UploadWriter:
+    """
+    One upload being written to the store, chunk by chunk.
+    Every method blocks on disk; async callers run them with asyncio.to_thread.
+    """
+    def __init__(self, filename: str):
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        self.filename = filename
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.tmp = tempfile.NamedTemporaryFile(dir=UPLOAD_DIR, suffix=".part", delete=False)
+
+    def write(self, chunk: bytes):
+        if not chunk:
+            return
+        if self.size == 0 and not chunk.startswith(PDF_MAGIC):
+            raise UploadError(415, f"{self.filename} is not a PDF")
+        self.size += len(chunk)
+        if self.size > UPLOAD_MAX_BYTES:
+            raise UploadError(413, f"{self.filename} is larger than {UPLOAD_MAX_BYTES} bytes")
+        self.digest.update(chunk)
+        self.tmp.write(chunk)
+
+    def finish(self) -> str:
+        """
+        Move the upload into place and return the stored path.
+        """
+        self.tmp.close()
+        if self.size == 0:
+            raise UploadError(400, f"{self.filename} is empty")
+        name = os.path.basename(self.filename or "") or "upload.pdf"
+        if not name.lower().endswith(".pdf"):
+            name += ".pdf"
+        hexdigest = self.digest.hexdigest()
+        os.makedirs(os.path.join(UPLOAD_DIR, hexdigest), exist_ok=True)
+        body_path = os.path.join(UPLOAD_DIR, hexdigest, name)
+        os.replace(self.tmp.name, body_path)
+
+        metrics.BYTES_READ.inc(self.size, source="upload")
+        # The extraction cache hashes its input; hand it the digest we already have
+        remember_sha256(body_path, hexdigest)
+        return body_path
+
+    def abort(self):
+        self.tmp.close()
+        if os.path.exists(self.tmp.name):
+            os.remove(self.tmp.name)
+
+
+async def save_upload(chunks, filename: str) -> str:
+    """
+    Write an async iterator of byte chunks to the upload store and return the stored path.
+    Raises UploadError with an HTTP status code for empty, oversized or non-PDF bodies.
+    """
+    writer = await asyncio.to_thread(UploadWriter, filename)
+    try:
+        with metrics.stage("upload"):
+            async for chunk in chunks:
+                await asyncio.to_thread(writer.write, chunk)
+            return await asyncio.to_thread(writer.finish)
+    except BaseException:
+        await asyncio.to_thread(writer.abort)
+        raise
+
+
+async def iter_multipart_uploads(chunks, content_type: str, field_name: str = "files"):
+    """
+    Parse a multipart/form-data body from an async iterator of byte chunks and store every file
+    of field_name, yielding (filename, stored path) as soon as each file's part has ended.
+    Other fields are ignored. Raises UploadError for malformed, oversized or non-PDF uploads.
+    The parser's callbacks create, write and finish files, so every parser.write runs in a worker thread.
+    """
+    _, params = parse_options_header(content_type or "")
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise UploadError(400, "Expected multipart/form-data with a boundary")
+
+    part = {}
+    completed = []
+    writer = None
+
+    def on_part_begin():
+        part.clear()
+        part.update(name=b"", value=b"", disposition=b"")
+
+    def on_header_field(data, start, end):
+        part["name"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        if part["name"].lower() == b"content-disposition":
+            part["disposition"] = part["value"]
+        part["name"], part["value"] = b"", b""
+
+    def on_headers_finished():
+        nonlocal writer
+        _, options = parse_options_header(part["disposition"])
+        if b"filename" in options and options.get(b"name", b"").decode("utf-8", "replace") == field_name:
+            writer = UploadWriter(options[b"filename"].decode("utf-8", "replace"))
+
+    def on_part_data(data, start, end):
+        if writer is not None:
+            writer.write(data[start:end])
+
+    def on_part_end():
+        nonlocal writer
+        if writer is not None:
+            current, writer = writer, None
+            try:
+                completed.append((current.filename, current.finish()))
+            except BaseException:
+                current.abort()
+                raise
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    total = 0
+    try:
+        with metrics.stage("upload"):
+            async for chunk in chunks:
+                total += len(chunk)
+                if total > UPLOAD_BATCH_MAX_BYTES:
+                    raise UploadError(413, f"Request body is larger than {UPLOAD_BATCH_MAX_BYTES} bytes")
+                try:
+                    await asyncio.to_thread(parser.write, chunk)
+                except UploadError:
+                    raise
+                except Exception as e:
+                    raise UploadError(400, f"Malformed multipart body: {e}")
+                while completed:
+                    yield completed.pop(0)
+            await asyncio.to_thread(parser.finalize)
+            # finalize() does not check that the closing boundary arrived; a cut-off body must not
+            # look like a complete batch
+            if parser.state != MultipartState.END:
+                raise UploadError(400, "Malformed multipart body: ended before the closing boundary")
+        while completed:
+            yield completed.pop(0)
+    finally:
+        if writer is not None:
+            await asyncio.to_thread(writer.abort)
+
+
+def prune_uploads():
+    """
+    Remove the least recently uploaded documents once the store is over UPLOAD_CACHE_MAX_BYTES.
+    Documents stored within PRUNE_GRACE_SECONDS are kept, so a path just handed to a request stays valid.
+    """
+    if not os.path.isdir(UPLOAD_DIR):
+        return
+    entries = []
+    for dir_name in os.listdir(UPLOAD_DIR):
+        path = os.path.join(UPLOAD_DIR, dir_name)
+        if os.path.isdir(path):
+            stats = []
+            for file_name in os.listdir(path):
+                try:
+                    stats.append(os.stat(os.path.join(path, file_name)))
+                except FileNotFoundError:
+                    continue
+            entries.append((max((st.st_mtime for st in stats), default=0), sum(st.st_size for st in stats), path))
+
+    total = sum(size for _, size, _ in entries)
+    recent = time.time() - PRUNE_GRACE_SECONDS
+    for mtime, size, path in sorted(entries):
+        if total <= UPLOAD_CACHE_MAX_BYTES or mtime >= recent:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+async def prune_uploads_periodically(interval: float = UPLOAD_PRUNE_INTERVAL_SECONDS):
+    """
+    Background task for the server's lifespan: prune the upload store every `interval` seconds.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(prune_uploads)
+        except OSError as e:
+            print(f"⚠️ Pruning {UPLOAD_DIR} failed: {e}")